@@ -0,0 +1,81 @@
+'''
+    BENCHMARK FEATURE ENGINEERING: IMPLEMENTASI LAMA (PER BARIS) VS build_features (VEKTORISASI)
+    Jalankan dari root repo: python -m benchmarks.bench_features
+'''
+import time
+import numpy as np
+import pandas as pd
+from modules import prophet_model
+
+YEARS = [1, 3, 5, 10]
+REPEAT = 3
+
+
+def _events(start, end):
+    days = pd.date_range(start, end, freq='D')
+    rng = np.random.default_rng(0)
+    holidays = set(d.date() for d in days[rng.choice(len(days), size=max(len(days) // 25, 1), replace=False)])
+    ramadan = set()
+    ujian = set()
+    for year in sorted(set(days.year)):
+        ramadan.update(d.date() for d in pd.date_range(f"{year}-03-01", periods=30, freq='D'))
+        ujian.update(d.date() for d in pd.date_range(f"{year}-06-10", periods=5, freq='D'))
+    return holidays, ramadan, ujian
+
+
+def _legacy_prepare(df, holidays, ramadan, ujian):
+    df['IsHoliday'] = df.index.map(lambda x: 1 if x.date() in holidays else 0)
+    df['IsRamadan'] = df.index.map(lambda x: 1 if x.date() in ramadan else 0)
+    df['IsUjian'] = df.index.map(lambda x: 1 if x.date() in ujian else 0)
+    df['day_of_week'] = df.index.dayofweek
+    df['month'] = df.index.month
+    df['year'] = df.index.year
+    df['weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
+    df['libur'] = df['IsHoliday'] | df['weekend']
+    df['y'] = df['Sales'].apply(lambda x: np.clip(x, df['Sales'].quantile(0.01), df['Sales'].quantile(0.99)))
+    return df
+
+
+def _vectorized_prepare(df, holidays, ramadan, ujian):
+    features = prophet_model.build_features(df.index, holidays, ramadan, ujian)
+    for col in features.columns:
+        df[col] = features[col].to_numpy()
+    df['y'] = df['Sales'].clip(df['Sales'].quantile(0.01), df['Sales'].quantile(0.99))
+    return df
+
+
+def _legacy_round(values):
+    values = pd.Series(values).apply(lambda x: int(round(x)) if pd.notna(x) else np.nan)
+    return values.apply(lambda x: max(x, 0))
+
+
+def _best_of(func, *args):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'tahun':>5} {'baris':>6} {'lama (s)':>10} {'baru (s)':>10} {'speedup':>8}")
+    for years in YEARS:
+        end = pd.Timestamp("2025-07-31")
+        start = end - pd.DateOffset(years=years) + pd.Timedelta(days=1)
+        index = pd.date_range(start, end, freq='D', name='Date')
+        sales = pd.DataFrame({'Sales': np.random.default_rng(1).gamma(5, 20, len(index))}, index=index)
+        holidays, ramadan, ujian = _events(start, end)
+
+        legacy = _legacy_prepare(sales.copy(), holidays, ramadan, ujian)
+        vectorized = _vectorized_prepare(sales.copy(), holidays, ramadan, ujian)
+        assert np.array_equal(legacy[vectorized.columns].to_numpy(), vectorized.to_numpy()), "hasil fitur berbeda"
+        assert np.array_equal(_legacy_round(sales['Sales'] - 100).to_numpy(), prophet_model.round_forecast(sales['Sales'] - 100, clip_zero=True))
+
+        t_legacy = _best_of(lambda: (_legacy_prepare(sales.copy(), holidays, ramadan, ujian), _legacy_round(sales['Sales'])))
+        t_new = _best_of(lambda: (_vectorized_prepare(sales.copy(), holidays, ramadan, ujian), prophet_model.round_forecast(sales['Sales'], clip_zero=True)))
+        print(f"{years:>5} {len(index):>6} {t_legacy:>10.4f} {t_new:>10.4f} {t_legacy / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
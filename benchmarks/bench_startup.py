@@ -0,0 +1,80 @@
+'''
+    BENCHMARK COLD START: WAKTU IMPORT PER MODUL APLIKASI, SETIAP MODUL DI PROSES PYTHON BARU (python -X importtime)
+    Jalankan dari root repo: python -m benchmarks.bench_startup [--budget-ms 1500] [--top 5]
+    Keluar dengan kode 1 jika import main (start aplikasi) melebihi anggaran atau ikut memuat dependensi berat
+'''
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGETS = ["main", "modules.event_manager", "modules.prophet_app", "modules.prophet_model", "modules.db_utils", "modules.batch"]
+# Dependensi yang seharusnya baru dimuat saat mode / fungsi yang membutuhkannya dipakai
+HEAVY = ["prophet", "cmdstanpy", "sklearn", "pyodbc", "psycopg2", "requests", "bs4"]
+REPEAT = 3
+BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", 1500))
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def _import_times(module):
+    '''
+        O.S. {NAMA MODUL: WAKTU KUMULATIF (ms)} DARI SATU PROSES BARU YANG MENG-IMPORT module
+    '''
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Import {module} gagal: {result.stderr.strip().splitlines()[-1:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2)) / 1000
+    return times
+
+
+def measure(module):
+    '''
+        O.S. (WAKTU TERBAIK ms, {MODUL: ms} DARI RUN TERBAIK)
+    '''
+    best = None
+    for _ in range(REPEAT):
+        times = _import_times(module)
+        if best is None or times[module] < best[module]:
+            best = times
+    return best[module], best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Waktu import cold start per modul aplikasi")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS, help="anggaran import main (ms), default STARTUP_BUDGET_MS atau 1500")
+    parser.add_argument("--top", type=int, default=5, help="jumlah paket termahal yang ditampilkan per modul")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'modul':<24} {'import (ms)':>11}  {'dependensi berat':<28} paket termahal")
+    for module in TARGETS:
+        total, times = measure(module)
+        results[module] = (total, times)
+        heavy = [name for name in HEAVY if name in times]
+        packages = sorted(((ms, name) for name, ms in times.items() if "." not in name and name not in (module, "site")), reverse=True)
+        top = ", ".join(f"{name} {ms:.0f}" for ms, name in packages[:args.top])
+        print(f"{module:<24} {total:>11.0f}  {', '.join(heavy) or '-':<28} {top}")
+
+    total, times = results["main"]
+    heavy = [name for name in HEAVY if name in times]
+    failed = False
+    if total > args.budget_ms:
+        print(f"GAGAL: import main {total:.0f} ms melebihi anggaran {args.budget_ms:.0f} ms")
+        failed = True
+    if heavy:
+        print(f"GAGAL: import main ikut memuat {', '.join(heavy)}")
+        failed = True
+    if not failed:
+        print(f"OK: import main {total:.0f} ms (anggaran {args.budget_ms:.0f} ms)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
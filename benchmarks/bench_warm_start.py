@@ -0,0 +1,55 @@
+'''
+    BENCHMARK REFIT HARIAN: COLD FIT VS WARM START DARI PARAMETER FIT KEMARIN
+    Jalankan dari root repo: python -m benchmarks.bench_warm_start
+'''
+import tempfile
+import numpy as np
+import pandas as pd
+from modules import prophet_model, model_cache
+
+YEARS = 3
+NIGHTS = 5
+SPLIT_DAYS = 120
+
+
+def _series(end):
+    index = pd.date_range(end - pd.DateOffset(years=YEARS) + pd.Timedelta(days=1), end, freq='D', name='Date')
+    t = np.arange(len(index))
+    rng = np.random.default_rng(0)
+    sales = 200 + 0.05 * t + 30 * np.sin(2 * np.pi * t / 7) + 40 * np.sin(2 * np.pi * t / 365.25) + rng.normal(0, 10, len(index))
+    return pd.DataFrame({'Sales': sales}, index=index)
+
+
+def _fit(df, split, key, warm_start):
+    prophet_df, holidays_df = prophet_model.prepare_data(df.copy())[:2]
+    model, _, _, _, _ = prophet_model.train_and_evaluate(prophet_df, holidays_df, split, verbose=False, use_cache=False, series_key=key, warm_start=warm_start, report_iterations=True)
+    return model, prophet_df
+
+
+def main():
+    model_cache.MODEL_CACHE_DIR = tempfile.mkdtemp()
+    first_end = pd.Timestamp("2025-07-31")
+    full = _series(first_end + pd.Timedelta(days=NIGHTS))
+    key = model_cache.series_key("bench", "warm-start")
+
+    # Fit awal (malam sebelumnya) untuk mengisi parameter warm start
+    _fit(full.loc[:first_end], (first_end - pd.Timedelta(days=SPLIT_DAYS)).strftime("%Y-%m-%d"), key, warm_start=False)
+
+    print(f"{'malam':>5} {'cold (s)':>9} {'iter':>6} {'warm (s)':>9} {'iter':>6} {'max |dyhat|':>12}  (selisih prediksi warm vs cold)")
+    totals = np.zeros(4)
+    for night in range(1, NIGHTS + 1):
+        end = first_end + pd.Timedelta(days=night)
+        df = full.loc[:end]
+        split = (end - pd.Timedelta(days=SPLIT_DAYS)).strftime("%Y-%m-%d")
+        cold, prophet_df = _fit(df, split, None, warm_start=False)
+        warm, _ = _fit(df, split, key, warm_start=True)
+        history = prophet_df[['ds'] + prophet_model.REGRESSORS]
+        diff = np.abs(cold.predict(history)['yhat'].to_numpy() - warm.predict(history)['yhat'].to_numpy()).max()
+        c, w = cold.fit_stats, warm.fit_stats
+        totals += [c['seconds'], c['iterations'] or 0, w['seconds'], w['iterations'] or 0]
+        print(f"{night:>5} {c['seconds']:>9.3f} {c['iterations']!s:>6} {w['seconds']:>9.3f} {w['iterations']!s:>6} {diff:>12.4f}")
+    print(f"total cold {totals[0]:.2f} dtk / {totals[1]:.0f} iterasi, warm {totals[2]:.2f} dtk / {totals[3]:.0f} iterasi")
+
+
+if __name__ == "__main__":
+    main()
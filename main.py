@@ -1,6 +1,5 @@
 import streamlit as st
-import modules.event_manager as event_manager
-import modules.prophet_app as prophet_app
+import modules.app_cache as app_cache
 from modules.utils import inject_css
 
 def main_app():
@@ -9,10 +8,15 @@ def main_app():
     st.sidebar.title("Navigasi Aplikasi")
     app_mode = st.sidebar.selectbox("Pilih Mode:", ["Pengelola Events", "Prediksi Penjualan"])
     
+    # Modul tiap mode diimpor saat mode dipilih: prophet, sklearn & driver database
+    # tidak dimuat jika pengguna hanya membuka Pengelola Events
     if app_mode == "Pengelola Events":
+        import modules.event_manager as event_manager
         event_manager.run()
     elif app_mode == "Prediksi Penjualan":
+        import modules.prophet_app as prophet_app
         prophet_app.run()
+    app_cache.show_stats()
 
 if __name__ == "__main__":
     main_app()
\ No newline at end of file
@@ -0,0 +1,245 @@
+import os
+import copy
+import uuid
+import functools
+import threading
+import streamlit as st
+from . import runtime
+from . import db_pool
+
+'''
+    LAPISAN CACHE APLIKASI STREAMLIT: SETIAP JENIS FUNGSI PUNYA TTL & BATAS ENTRI SENDIRI,
+    st.cache_data UNTUK DATA (BRANCH, KATEGORI, PENJUALAN, EVENT), st.cache_resource UNTUK POOL KONEKSI & MODEL TER-FIT.
+    CACHE YANG BERGANTUNG PADA DATA EVENT DIBERSIHKAN OTOMATIS SAAT FILE BERUBAH, CACHE BERKUNCI RENTANG TANGGAL
+    DIBUANG SAAT RENTANG TERSEBUT TIDAK LAGI DIPAKAI SESSION MANAPUN. DI LUAR STREAMLIT (BATCH CLI / WORKER) FUNGSI DIPANGGIL LANGSUNG
+'''
+
+# Jenis -> (TTL detik, jumlah entri maksimum); None = tanpa batas.
+# Override lewat environment APP_CACHE_<JENIS>_TTL / APP_CACHE_<JENIS>_MAX_ENTRIES, misal APP_CACHE_SALES_TTL=600
+CACHE_KINDS = {
+    "branches": (3600, 16),
+    "categories": (900, 64),
+    "sales": (900, 256),
+    "events": (3600, 16),
+    "connections": (None, 8),
+    "models": (3600, 32),
+}
+CACHE_LABELS = {
+    "branches": "Daftar branch",
+    "categories": "Daftar kategori",
+    "sales": "Penjualan per kategori",
+    "events": "Data events",
+    "connections": "Pool koneksi",
+    "models": "Model ter-fit",
+}
+# Jenis yang kuncinya memuat rentang tanggal data aktual
+DATE_RANGE_KINDS = ["categories", "sales"]
+# Jenis yang isinya berasal dari store event
+EVENTS_KINDS = ["events", "models"]
+
+_functions = {kind: [] for kind in CACHE_KINDS}
+_stats = {kind: {"hits": 0, "misses": 0} for kind in CACHE_KINDS}
+_lock = threading.Lock()
+_local = threading.local()
+_events_signature = None
+# Rentang tanggal -> {"sessions": SESSION YANG SEDANG MEMAKAI, "calls": {KUNCI: (FUNGSI CACHE, args, kwargs)}}
+_date_ranges = {}
+
+
+def _setting(kind, name, default):
+    value = os.environ.get(f"APP_CACHE_{kind.upper()}_{name}")
+    if value is None:
+        return default
+    return float(value) if value.strip() else None
+
+
+def settings(kind):
+    '''
+        O.S. (ttl, max_entries) UNTUK JENIS kind
+    '''
+    ttl, max_entries = CACHE_KINDS[kind]
+    max_entries = _setting(kind, "MAX_ENTRIES", max_entries)
+    return _setting(kind, "TTL", ttl), None if max_entries is None else int(max_entries)
+
+
+def events_signature():
+    '''
+        PENANDA VERSI STORE EVENT (event_store), None JIKA BELUM ADA
+    '''
+    # event_store memuat pandas; diimpor saat dipakai agar import main tetap ringan
+    from . import event_store
+    return event_store.get_store().signature()
+
+
+def _check_events():
+    global _events_signature
+    signature = events_signature()
+    with _lock:
+        changed = signature != _events_signature
+        _events_signature = signature
+    if changed:
+        invalidate(*EVENTS_KINDS)
+
+
+def _remember_call(cached, args, kwargs):
+    '''
+        MENCATAT PANGGILAN FUNGSI BERKUNCI RENTANG TANGGAL DI BAWAH RENTANG SESSION INI, AGAR BISA DIBUANG PER ENTRI
+    '''
+    date_range = st.session_state.get("app_cache_date_range")
+    if date_range is None:
+        return
+    key = (id(cached), repr(args), repr(sorted(kwargs.items())))
+    with _lock:
+        _date_ranges.setdefault(date_range, {"sessions": set(), "calls": {}})["calls"][key] = (cached, args, kwargs)
+
+
+def _count(kind, computed):
+    with _lock:
+        _stats[kind]["misses" if computed else "hits"] += 1
+
+
+def _wrap(kind, func, make_cached):
+    '''
+        MISS DIHITUNG SAAT BADAN FUNGSI BENAR-BENAR DIJALANKAN OLEH CACHE STREAMLIT, SELAIN ITU HIT
+    '''
+    # functools.wraps: Streamlit menghitung kunci dari source & nama argumen fungsi asli
+    @functools.wraps(func)
+    def compute(*args, **kwargs):
+        _local.computed = getattr(_local, "computed", 0) + 1
+        return func(*args, **kwargs)
+
+    cached = make_cached(compute)
+    with _lock:
+        _functions[kind].append(cached)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not runtime.in_streamlit():
+            return func(*args, **kwargs)
+        if kind in EVENTS_KINDS:
+            _check_events()
+        before = getattr(_local, "computed", 0)
+        result = cached(*args, **kwargs)
+        _count(kind, getattr(_local, "computed", 0) != before)
+        if kind in DATE_RANGE_KINDS:
+            _remember_call(cached, args, kwargs)
+        return result
+
+    wrapper.clear = cached.clear
+    return wrapper
+
+
+def cache_data(kind):
+    '''
+        DEKORATOR st.cache_data DENGAN TTL & BATAS ENTRI JENIS kind
+    '''
+    ttl, max_entries = settings(kind)
+    return lambda func: _wrap(kind, func, st.cache_data(ttl=ttl, max_entries=max_entries))
+
+
+def cache_resource(kind, on_release=None):
+    '''
+        DEKORATOR st.cache_resource (OBJEK DIPAKAI BERSAMA, TIDAK DI-COPY) DENGAN TTL & BATAS ENTRI JENIS kind
+    '''
+    ttl, max_entries = settings(kind)
+    options = {"on_release": on_release} if on_release else {}
+    return lambda func: _wrap(kind, func, st.cache_resource(ttl=ttl, max_entries=max_entries, show_spinner=False, **options))
+
+
+@cache_resource("connections", on_release=lambda pool: pool.close_all())
+def _connection_pool(key, _factory):
+    return db_pool.ConnectionPool(_factory)
+
+
+def connection_pool(key, factory):
+    '''
+        POOL KONEKSI UNTUK key: DI STREAMLIT DIPEGANG st.cache_resource (DITUTUP SAAT KELUAR DARI CACHE),
+        DI LUAR STREAMLIT POOL PER PROSES DARI db_pool
+    '''
+    if not runtime.in_streamlit():
+        return db_pool.get_pool(key, factory)
+    return _connection_pool(key, factory)
+
+
+class _NotCached(Exception):
+    pass
+
+
+@cache_resource("models")
+def _load_model(key):
+    # model_cache mengimpor prophet; dimuat hanya saat model dibutuhkan
+    from . import model_cache
+    model = model_cache.load(key)
+    if model is None:
+        # Exception agar "tidak ada model" tidak ikut disimpan di cache
+        raise _NotCached(key)
+    return model
+
+
+def load_model(key):
+    '''
+        MODEL TER-FIT DARI CACHE DISK model_cache, DI STREAMLIT DISIMPAN SEKALIGUS SEBAGAI OBJEK DI MEMORI
+        (TANPA DESERIALISASI JSON ULANG SETIAP RERUN); None JIKA BELUM ADA.
+        YANG DIKEMBALIKAN SALINAN DANGKAL: ATRIBUT PER PANGGILAN (uncertainty_samples, eval_forecast, from_cache)
+        DITULIS KE SALINAN, BUKAN KE OBJEK YANG DIPAKAI BERSAMA SEMUA SESSION
+    '''
+    try:
+        return copy.copy(_load_model(key))
+    except _NotCached:
+        return None
+
+
+def invalidate(*kinds):
+    '''
+        MENGHAPUS ISI CACHE JENIS kinds (SEMUA JENIS JIKA KOSONG)
+    '''
+    with _lock:
+        functions = [func for kind in (kinds or CACHE_KINDS) for func in _functions[kind]]
+    for func in functions:
+        func.clear()
+
+
+def track_date_range(start_date, end_date):
+    '''
+        DIPANGGIL SETIAP RERUN DENGAN RENTANG TANGGAL DI UI; JIKA BERUBAH DAN RENTANG LAMA TIDAK DIPAKAI SESSION LAIN,
+        HANYA ENTRI YANG DIAMBIL DENGAN RENTANG LAMA YANG DIBUANG (CACHE SESSION LAIN TETAP UTUH)
+    '''
+    session = st.session_state.setdefault("app_cache_session", uuid.uuid4().hex)
+    date_range = (str(start_date), str(end_date))
+    previous = st.session_state.get("app_cache_date_range")
+    st.session_state["app_cache_date_range"] = date_range
+    calls = []
+    with _lock:
+        _date_ranges.setdefault(date_range, {"sessions": set(), "calls": {}})["sessions"].add(session)
+        if previous is not None and previous != date_range and previous in _date_ranges:
+            _date_ranges[previous]["sessions"].discard(session)
+            if not _date_ranges[previous]["sessions"]:
+                calls = list(_date_ranges.pop(previous)["calls"].values())
+    for cached, args, kwargs in calls:
+        cached.clear(*args, **kwargs)
+
+
+def stats():
+    '''
+        O.S. {kind: {"hits", "misses"}} SEJAK PROSES DIMULAI
+    '''
+    with _lock:
+        return {kind: dict(entry) for kind, entry in _stats.items()}
+
+
+def show_stats():
+    '''
+        HIT / MISS PER JENIS CACHE DI SIDEBAR
+    '''
+    rows = [{"Cache": CACHE_LABELS[kind], "Hit": entry["hits"], "Miss": entry["misses"]} for kind, entry in stats().items()]
+    with st.sidebar.expander("Statistik Cache"):
+        st.dataframe(rows, hide_index=True)
+        if st.button("Reset Statistik Cache"):
+            reset_stats()
+            st.rerun()
+
+
+def reset_stats():
+    with _lock:
+        for entry in _stats.values():
+            entry["hits"] = entry["misses"] = 0
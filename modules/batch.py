@@ -0,0 +1,191 @@
+'''
+    ENTRY POINT BATCH TANPA STREAMLIT (UNTUK CRON / NODE KOMPUTASI)
+
+    Contoh:
+        python -m modules.batch run --dbms SSMS --branches BD32008,BD32009 \\
+            --start 2022-01-01 --end 2025-07-31 --split 2025-01-01 --horizon 212 --workers 8
+        python -m modules.batch run --dbms SSMS --branches all --db-concurrency 2 \\
+            --start 2022-01-01 --end 2025-07-31 --split 2025-01-01 --horizon 212 --workers 8
+
+    Beberapa mesin tanpa koordinator: tiap node menjalankan --shard k/N ke folder sendiri, lalu
+        python -m modules.batch merge shard1/ shard2/ ... --output-dir hasil/
+
+    Agregat penjualan harian (load awal dengan --start, selanjutnya inkremental dari watermark, misal tiap malam):
+        python -m modules.batch etl --dbms SSMS --start 2022-01-01
+        python -m modules.batch run --sales-source daily ...
+
+    Data event (store default events.db, lihat EVENTS_STORE) dari / ke layout events.xlsx:
+        python -m modules.batch events export events.xlsx
+        python -m modules.batch events import events.xlsx
+
+    Kredensial dibaca dari --config / FORECAST_CONFIG (format .streamlit/secrets.toml)
+    atau environment FORECAST_SSMS_<KUNCI> / FORECAST_POSTGRES_<KUNCI>.
+'''
+import os
+import sys
+import argparse
+import logging
+from . import runtime
+from . import sharding
+from . import exporters
+
+logger = logging.getLogger("forecast.batch")
+
+
+def _split_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()] if value else []
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m modules.batch", description="Prediksi penjualan batch tanpa UI.")
+    parser.add_argument("--config", help="File kredensial TOML (default .streamlit/secrets.toml)")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--log-format", default="text", choices=["text", "json"])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Menjalankan prediksi batch per branch")
+    run.add_argument("--dbms", default="SSMS", choices=["SSMS", "POSTGRES"])
+    run.add_argument("--database", help="Nama database (default: dbname di kredensial)")
+    run.add_argument("--branches", required=True, help="Daftar BranchId dipisah koma, atau 'all' untuk semua branch aktif")
+    run.add_argument("--categories", help="Daftar kategori dipisah koma (default: semua kategori dengan data penuh)")
+    run.add_argument("--start", required=True, help="Tanggal mulai data aktual (YYYY-MM-DD)")
+    run.add_argument("--end", required=True, help="Tanggal akhir data aktual (YYYY-MM-DD)")
+    run.add_argument("--split", required=True, help="Tanggal pemisah train/test (YYYY-MM-DD)")
+    run.add_argument("--horizon", type=int, default=212, help="Jumlah hari yang diprediksi")
+    run.add_argument("--workers", type=int, default=None, help="Jumlah proses paralel")
+    run.add_argument("--stan-threads", type=int, default=None, help="Batas thread Stan/BLAS per worker")
+    run.add_argument("--db-concurrency", type=int, default=None, help="Batas query database bersamaan (default DB_QUERY_CONCURRENCY)")
+    run.add_argument("--warm-start", action="store_true", help="Mulai fit dari parameter fit sebelumnya")
+    run.add_argument("--interval-mode", default=None, help="full / reduced / none")
+    run.add_argument("--force", action="store_true", help="Hitung ulang kategori yang sudah selesai di manifest")
+    run.add_argument("--output-dir", default=None, help="Folder output (default: folder kerja)")
+    run.add_argument("--events-file", default=None, help="Store event: .db (SQLite) atau .xlsx (default EVENTS_STORE / events.db)")
+    run.add_argument("--export", default="file", choices=exporters.EXPORTERS, help="Format output (default: 1 Excel per kategori)")
+    run.add_argument("--sink-table", nargs="?", const=True, default=None, help="Upsert prediksi ke tabel database (default FORECAST_SINK_TABLE)")
+    run.add_argument("--run-id", default=None, help="Id run di tabel sink; pakai id yang sama di semua shard / saat run diulang")
+    run.add_argument("--shard", default=None, help="Hanya proses shard k/N dari work set (misal 2/4), untuk dibagi ke beberapa mesin")
+    run.add_argument("--sales-source", default=None, choices=["detail", "daily"],
+                     help="Baca penjualan dari tabel detail POS atau agregat daily_category_sales (default SALES_SOURCE)")
+
+    merge = commands.add_parser("merge", help="Menggabung hasil & manifest beberapa shard")
+    merge.add_argument("shard_dirs", nargs="+", help="Folder --output-dir dari tiap shard")
+    merge.add_argument("--output-dir", required=True, help="Folder hasil gabungan")
+
+    etl = commands.add_parser("etl", help="Membuat / memperbarui agregat penjualan harian (daily_category_sales)")
+    etl.add_argument("--dbms", default="SSMS", choices=["SSMS", "POSTGRES"])
+    etl.add_argument("--database", help="Nama database (default: dbname di kredensial)")
+    etl.add_argument("--start", default=None, help="Hitung ulang mulai tanggal ini (wajib saat load awal; default watermark - lookback)")
+    etl.add_argument("--through", default=None, help="Tanggal terakhir yang dihitung (default kemarin)")
+    etl.add_argument("--lookback", type=int, default=None, help="Jumlah hari sebelum watermark yang dihitung ulang (default DAILY_SALES_LOOKBACK_DAYS)")
+
+    events = commands.add_parser("events", help="Impor / ekspor data event dari / ke layout events.xlsx")
+    events.add_argument("action", choices=["import", "export"])
+    events.add_argument("file", help="File Excel berlayout events.xlsx (sheet Holidays, Ramadan, Ujian)")
+    events.add_argument("--store", default=None, help="Store event (default EVENTS_STORE / events.db)")
+    return parser
+
+
+def _database_name(args):
+    section = "ssms" if args.dbms == "SSMS" else "postgres"
+    return args.database or runtime.get_secrets(section)["dbname"]
+
+
+def resolve_branches(dbms, db_name, value):
+    '''
+        [(BRANCH_ID, BRANCH_NAME), ...] DARI --branches ('all' = SEMUA BRANCH AKTIF DI DATABASE)
+    '''
+    from . import db_utils
+    if dbms == "SSMS":
+        known = [(branch_id, name) for branch_id, name in db_utils.get_branch_list_ssms(db_name)]
+    else:
+        known = [(row[0], row[0]) for row in db_utils.get_branch_list_postgres()]
+    if value.strip().lower() == "all":
+        return known
+    names = dict(known)
+    return [(branch_id, names.get(branch_id, branch_id)) for branch_id in _split_list(value)]
+
+
+def run(args):
+    from . import prophet_model, event_store, forecast_sink, db_utils
+    if args.events_file:
+        event_store.configure(args.events_file)
+    if args.sales_source:
+        db_utils.set_sales_source(args.sales_source)
+    db_name = _database_name(args)
+    interval_mode = args.interval_mode or prophet_model.INTERVAL_MODE_DEFAULT
+    if interval_mode not in prophet_model.INTERVAL_MODES:
+        raise SystemExit(f"--interval-mode harus salah satu dari {list(prophet_model.INTERVAL_MODES)}")
+    try:
+        shard = sharding.parse_shard(args.shard) if args.shard else None
+        if isinstance(args.sink_table, str):
+            forecast_sink.check_table(args.sink_table)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    branches = resolve_branches(args.dbms, db_name, args.branches)
+    logger.info("Mulai batch", extra={"fields": {"database": db_name, "branches": len(branches)}})
+    totals = prophet_model.batch_predict_all_branches(
+        db_name, branches, args.start, args.end, args.horizon, args.split, args.dbms,
+        n_workers=args.workers or prophet_model.BATCH_WORKERS_DEFAULT,
+        stan_threads=args.stan_threads or prophet_model.STAN_THREADS_PER_WORKER,
+        warm_start=args.warm_start, interval_mode=interval_mode,
+        categories=_split_list(args.categories) or None, output_root=args.output_dir,
+        force=args.force, db_concurrency=args.db_concurrency, shard=shard, exporter=args.export,
+        sink_table=args.sink_table, run_id=args.run_id,
+    )
+    logger.info("Batch selesai", extra={"fields": totals})
+    return 1 if totals["error"] else 0
+
+
+def merge(args):
+    summary = sharding.merge(args.shard_dirs, args.output_dir)
+    logger.info("Merge selesai", extra={"fields": summary})
+    if summary["missing_shards"]:
+        logger.warning("Tidak ada entri dari sebagian shard", extra={"fields": {"missing_shards": summary["missing_shards"]}})
+    return 1 if summary["missing_outputs"] or summary["missing_shards"] else 0
+
+
+def etl(args):
+    from . import db_utils, query_stats
+    try:
+        summary = db_utils.refresh_daily_sales(args.dbms, _database_name(args), args.start, args.through, args.lookback)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    logger.info("ETL selesai", extra={"fields": summary})
+    logger.info(f"Statistik querry database: {query_stats.STATS.describe()}", extra={"fields": {"queries": query_stats.STATS.summary()}})
+    return 0
+
+
+def events(args):
+    from . import event_store
+    store = event_store.open_store(args.store)
+    if args.action == "export":
+        store.export_excel(args.file)
+        logger.info("Ekspor event selesai", extra={"fields": {"store": store.path, "file": args.file}})
+        return 0
+    try:
+        counts = store.import_excel(args.file)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"Gagal impor {args.file}: {e}")
+    logger.info("Impor event selesai", extra={"fields": {"store": store.path, **counts}})
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.config:
+        os.environ[runtime.CONFIG_FILE_ENV] = args.config
+    runtime.setup_logging(args.log_level, args.log_format)
+    if args.command == "run":
+        return run(args)
+    if args.command == "merge":
+        return merge(args)
+    if args.command == "etl":
+        return etl(args)
+    if args.command == "events":
+        return events(args)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import os
+import shutil
+import threading
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+'''
+    INDEKS CAKUPAN HARI PENJUALAN PER (DATABASE, BRANCH, KATEGORI) UNTUK MEMILIH KATEGORI DENGAN DATA PENUH:
+    BITMAP HARI BERPENJUALAN + VOLUME HARIAN PER KATEGORI, DISIMPAN DI DISK (.npz, BITMAP DIPADATKAN) DAN DI MEMORI.
+    CEK "ADA PENJUALAN SETIAP HARI" & URUTAN VOLUME UNTUK RENTANG APA PUN DIJAWAB DARI MEMORI;
+    HANYA HARI DI LUAR CAKUPAN INDEKS YANG DI-QUERRY
+'''
+
+INDEX_DIR = os.environ.get("COVERAGE_INDEX_DIR", os.path.join(".cache", "coverage"))
+INDEX_ENABLED = os.environ.get("COVERAGE_INDEX", "1") != "0"
+# Nama entri indeks untuk seluruh database (tanpa filter branch)
+ALL_BRANCHES = "_all"
+
+_indexes = {}
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _safe_name(value):
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in str(value))
+
+
+def _as_date(value):
+    return pd.to_datetime(value).date()
+
+
+def _last_complete_day():
+    return date.today() - timedelta(days=1)
+
+
+class CoverageIndex:
+    '''
+        KOLOM j = HARI start + j, BARIS i = categories[i]
+        days[i, j] = ADA PENJUALAN, volume[i, j] = JUMLAH QTY; HARI SETELAH final BELUM FINAL (SELALU DI-QUERRY ULANG)
+    '''
+
+    def __init__(self, start, final=None, categories=(), days=None, volume=None):
+        self.start = start
+        self.final = final
+        self.categories = list(categories)
+        self.days = days if days is not None else np.zeros((len(self.categories), 0), dtype=bool)
+        self.volume = volume if volume is not None else np.zeros((len(self.categories), 0))
+
+    @property
+    def end(self):
+        return self.start + timedelta(days=self.days.shape[1] - 1)
+
+    def covers(self, start, end):
+        return self.final is not None and self.start <= start and end <= self.final
+
+    def missing(self, start, end):
+        '''
+            RENTANG YANG HARUS DI-QUERRY AGAR [start, end] TERCAKUP; CAKUPAN INDEKS TETAP BERSAMBUNG
+        '''
+        if self.final is None:
+            return [(start, end)]
+        ranges = []
+        if start < self.start:
+            ranges.append((start, self.start - timedelta(days=1)))
+        if end > self.final:
+            ranges.append((self.final + timedelta(days=1), end))
+        return ranges
+
+    def _extend(self, start, end):
+        before = max((self.start - start).days, 0)
+        after = max((end - self.end).days, 0) if self.days.shape[1] else (end - start).days + 1 - before
+        if before or after:
+            self.days = np.pad(self.days, ((0, 0), (before, after)))
+            self.volume = np.pad(self.volume, ((0, 0), (before, after)))
+            self.start = min(self.start, start)
+
+    def update(self, rows, start, end):
+        '''
+            I.S. rows = [(KATEGORI, TANGGAL, JUMLAH), ...] HASIL QUERRY [start, end]
+            O.S. KOLOM [start, end] DIGANTI DENGAN rows
+        '''
+        self._extend(start, end)
+        first, last = (start - self.start).days, (end - self.start).days + 1
+        self.days[:, first:last] = False
+        self.volume[:, first:last] = 0.0
+
+        df = pd.DataFrame(rows, columns=['Kategori', 'Date', 'Sales']).dropna(subset=['Kategori'])
+        if df.empty:
+            return
+        known = {category: i for i, category in enumerate(self.categories)}
+        new_categories = [category for category in df['Kategori'].unique() if category not in known]
+        if new_categories:
+            for category in new_categories:
+                known[category] = len(self.categories)
+                self.categories.append(category)
+            self.days = np.pad(self.days, ((0, len(new_categories)), (0, 0)))
+            self.volume = np.pad(self.volume, ((0, len(new_categories)), (0, 0)))
+        row_index = df['Kategori'].map(known).to_numpy()
+        col_index = (pd.to_datetime(df['Date']) - pd.Timestamp(self.start)).dt.days.to_numpy()
+        self.days[row_index, col_index] = True
+        np.add.at(self.volume, (row_index, col_index), df['Sales'].astype(float).to_numpy())
+
+    def eligible(self, start, end):
+        '''
+            KATEGORI DENGAN PENJUALAN DI SETIAP HARI [start, end], URUT DARI VOLUME TERBESAR
+        '''
+        first, last = (start - self.start).days, (end - self.start).days + 1
+        if not self.categories or first < 0 or last > self.days.shape[1]:
+            return []
+        full = np.flatnonzero(self.days[:, first:last].all(axis=1))
+        totals = self.volume[full, first:last].sum(axis=1)
+        return [self.categories[i] for i in full[np.argsort(-totals, kind="stable")]]
+
+
+def _index_path(database, branchid):
+    return os.path.join(INDEX_DIR, _safe_name(database), f"{_safe_name(branchid)}.npz")
+
+
+def _read(path):
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            n_days = int(data["n_days"])
+            return CoverageIndex(
+                _as_date(str(data["start"])),
+                final=_as_date(str(data["final"])),
+                categories=data["categories"].tolist(),
+                days=np.unpackbits(data["days"], axis=1, count=n_days).astype(bool),
+                volume=data["volume"],
+            )
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write(path, index):
+    # Tulis ke file sementara lalu os.replace agar pembaca tidak melihat file setengah jadi
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(
+            f, start=str(index.start), final=str(index.final), n_days=index.days.shape[1],
+            categories=np.array(index.categories, dtype=str), days=np.packbits(index.days, axis=1), volume=index.volume,
+        )
+    os.replace(tmp_path, path)
+
+
+def _lock(key):
+    with _locks_lock:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def eligible_categories(database, branchid, start_date, end_date, fetch):
+    '''
+        I.S. fetch(start_date, end_date) -> [(KATEGORI, TANGGAL, JUMLAH), ...] PER HARI, MELEMPAR EXCEPTION JIKA GAGAL;
+             branchid None = SELURUH DATABASE
+        O.S. KATEGORI YANG ADA PENJUALAN DI SEMUA HARI [start_date, end_date], URUT DARI VOLUME TERBESAR
+    '''
+    start, end = _as_date(start_date), _as_date(end_date)
+    if end < start:
+        return []
+    if not INDEX_ENABLED:
+        index = CoverageIndex(start)
+        index.update(fetch(start_date, end_date), start, end)
+        return index.eligible(start, end)
+
+    key = (str(database), str(branchid or ALL_BRANCHES))
+    path = _index_path(*key)
+    with _lock(key):
+        index = _indexes.get(key)
+        if index is None or not index.covers(start, end):
+            # Proses lain (batch / sesi Streamlit lain) mungkin sudah memperbarui file indeks
+            index = _read(path) or index or CoverageIndex(start)
+            ranges = index.missing(start, end)
+            for fetch_start, fetch_end in ranges:
+                index.update(fetch(fetch_start.strftime("%Y-%m-%d"), fetch_end.strftime("%Y-%m-%d")), fetch_start, fetch_end)
+            if ranges:
+                final = min(index.end, _last_complete_day())
+                index.final = final if index.final is None else max(index.final, final)
+                _write(path, index)
+            _indexes[key] = index
+        return index.eligible(start, end)
+
+
+def invalidate(database=None, branchid=None):
+    '''
+        MENGHAPUS INDEKS (SEMUA, PER DATABASE, ATAU PER BRANCH)
+    '''
+    with _locks_lock:
+        for key in list(_indexes):
+            if database is None or (key[0] == str(database) and branchid in (None, key[1])):
+                del _indexes[key]
+    if database is None:
+        shutil.rmtree(INDEX_DIR, ignore_errors=True)
+        return
+    if branchid is None:
+        shutil.rmtree(os.path.join(INDEX_DIR, _safe_name(database)), ignore_errors=True)
+        return
+    try:
+        os.remove(_index_path(database, branchid))
+    except OSError:
+        pass
@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Batas pool per database (bisa diatur lewat environment)
+POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", 5))
+# Koneksi idle lebih lama dari ini (detik) ditutup
+POOL_IDLE_TIMEOUT = float(os.environ.get("DB_POOL_IDLE_TIMEOUT", 300))
+# Koneksi idle lebih lama dari ini (detik) dicek dulu dengan SELECT 1 sebelum dipakai
+POOL_HEALTH_INTERVAL = float(os.environ.get("DB_POOL_HEALTH_INTERVAL", 30))
+# Lama menunggu koneksi bebas saat pool penuh
+POOL_ACQUIRE_TIMEOUT = float(os.environ.get("DB_POOL_ACQUIRE_TIMEOUT", 60))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    '''
+        POOL KONEKSI DB-API YANG AMAN DIPAKAI BANYAK THREAD
+        factory() MEMBUAT KONEKSI BARU (ATAU None JIKA GAGAL)
+    '''
+
+    def __init__(self, factory, max_size=POOL_MAX_SIZE, idle_timeout=POOL_IDLE_TIMEOUT,
+                 health_interval=POOL_HEALTH_INTERVAL, health_query="SELECT 1"):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self.health_query = health_query
+        self._idle = []  # (conn, waktu terakhir dipakai), yang terakhir dipakai di ujung
+        self._size = 0
+        self._cond = threading.Condition()
+
+    def _is_healthy(self, conn):
+        try:
+            cur = conn.cursor()
+            cur.execute(self.health_query)
+            cur.fetchall()
+            cur.close()
+            return True
+        except Exception:
+            return False
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self):
+        '''
+            MENUTUP KONEKSI YANG TERLALU LAMA IDLE (DIPANGGIL DENGAN LOCK)
+        '''
+        now = time.monotonic()
+        expired = [item for item in self._idle if now - item[1] > self.idle_timeout]
+        if expired:
+            self._idle = [item for item in self._idle if now - item[1] <= self.idle_timeout]
+            self._size -= len(expired)
+            for conn, _ in expired:
+                self._close(conn)
+
+    def acquire(self, timeout=POOL_ACQUIRE_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                self._evict_idle()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"Pool koneksi penuh ({self.max_size}) lebih dari {timeout} detik")
+                    self._cond.wait(remaining)
+                    self._evict_idle()
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    conn, last_used = None, None
+                    self._size += 1
+            if conn is None:
+                try:
+                    conn = self.factory()
+                except Exception:
+                    conn = None
+                if conn is None:
+                    self._forget()
+                return conn
+            if time.monotonic() - last_used <= self.health_interval or self._is_healthy(conn):
+                return conn
+            # Koneksi mati: buang dan coba ambil/buat lagi
+            self._close(conn)
+            self._forget()
+
+    def _forget(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def release(self, conn, discard=False):
+        if not discard:
+            try:
+                # Akhiri transaksi baca yang masih terbuka sebelum dipakai ulang
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard:
+            self._close(conn)
+            self._forget()
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        '''
+            with pool.connection() as conn: ...  (conn None JIKA KONEKSI GAGAL DIBUAT)
+            KONEKSI DIBUANG JIKA BLOK MELEMPAR EXCEPTION
+        '''
+        conn = self.acquire()
+        if conn is None:
+            yield None
+            return
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            self._close(conn)
+
+
+def get_pool(key, factory, **kwargs):
+    '''
+        POOL PER PROSES UNTUK key (MISAL ("ssms", db_name)); PROSES HASIL FORK MEMBUAT POOL SENDIRI
+    '''
+    full_key = (os.getpid(), key)
+    with _pools_lock:
+        pool = _pools.get(full_key)
+        if pool is None:
+            pool = ConnectionPool(factory, **kwargs)
+            _pools[full_key] = pool
+        return pool
+
+
+def close_all_pools():
+    with _pools_lock:
+        pools = [pool for (pid, _), pool in _pools.items() if pid == os.getpid()]
+    for pool in pools:
+        pool.close_all()
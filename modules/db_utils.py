@@ -1,7 +1,35 @@
-import streamlit as st
-import pyodbc #ssms
+import os
+import io
+import re
+import csv
+import time
+import hashlib
+import weakref
+import threading
+from datetime import date, timedelta
+from contextlib import contextmanager
 import pandas as pd
-import psycopg2 #postgree
+import numpy as np
+from . import runtime
+from . import sales_cache
+from . import coverage_index
+from . import query_stats
+from . import app_cache
+# Batas query ke database POS yang berjalan bersamaan per proses (terpisah dari ukuran pool koneksi),
+# agar batch banyak branch tidak membebani database di jam operasional
+DB_QUERY_CONCURRENCY = int(os.environ.get("DB_QUERY_CONCURRENCY", 2))
+_query_slots = threading.BoundedSemaphore(DB_QUERY_CONCURRENCY)
+
+def set_query_concurrency(limit):
+    global _query_slots
+    _query_slots = threading.BoundedSemaphore(max(int(limit), 1))
+
+@contextmanager
+def _query_slot():
+    slots = _query_slots
+    with slots:
+        yield
+
 '''
     SSMS
 '''
@@ -11,7 +39,9 @@ def get_db_connection_ssms(db_name):
         KONEKSI KE DATABASE
     '''
     try:
-        secrets = st.secrets["ssms"]
+        # Driver diimpor saat koneksi pertama agar start aplikasi tidak ikut memuatnya
+        import pyodbc #ssms
+        secrets = runtime.get_secrets("ssms")
         conn_str = (
             f"DRIVER={{{secrets['driver']}}};"
             f"SERVER={secrets['server']};"
@@ -21,10 +51,20 @@ def get_db_connection_ssms(db_name):
         )
         return pyodbc.connect(conn_str)
     except Exception as e:
-        st.error(f"❌ Gagal koneksi ke database {db_name}: {e}")
+        runtime.error(f"❌ Gagal koneksi ke database {db_name}: {e}")
         return None
 
-@st.cache_data
+@contextmanager
+def ssms_connection(db_name):
+    '''
+        KONEKSI DARI POOL PROSES: with ssms_connection(db_name) as conn: ...
+        MENUNGGU SLOT QUERY DULU (DB_QUERY_CONCURRENCY)
+    '''
+    with _query_slot():
+        with app_cache.connection_pool(("ssms", db_name), lambda: get_db_connection_ssms(db_name)).connection() as conn:
+            yield conn
+
+@app_cache.cache_data("branches")
 def get_branch_list_ssms(db_name):
     '''
         MENGAMBIL BRANCH UNIK DARI M_BRANCH
@@ -44,35 +84,46 @@ def get_branch_list_ssms(db_name):
         return df[['BranchId', 'BranchName']].dropna().values.tolist()
     return []
 
-# @st.cache_data
-def get_unique_categories_ssms(db_name, start_date, end_date):
+@app_cache.cache_data("categories")
+def get_unique_categories_ssms(db_name, start_date, end_date, branchid=None):
     '''
-        MENGAMBIL KATEGORI UNIK YANG MEMILIKI PENJUALAN SELAMA RENTANG WAKTU SECARA PENUH
+        MENGAMBIL KATEGORI UNIK YANG MEMILIKI PENJUALAN SELAMA RENTANG WAKTU SECARA PENUH (SELURUH DATABASE ATAU 1 branchid),
+        URUT DARI VOLUME TERBESAR; DIJAWAB DARI INDEKS CAKUPAN (coverage_index), HANYA HARI BARU YANG DI-QUERRY
     '''
+    try:
+        return coverage_index.eligible_categories(f"ssms-{db_name}", branchid, start_date, end_date,
+                                                  lambda start, end: _query_coverage_ssms(db_name, branchid, start, end))
+    except Exception as e:
+        runtime.error(f"Error saat menjalankan query: {e}")
+        return []
 
+def _query_coverage_ssms(db_name, branchid, start_date, end_date):
+    '''
+        PENJUALAN HARIAN PER KATEGORI (SEMUA QTY) UNTUK INDEKS CAKUPAN (MELEMPAR EXCEPTION JIKA GAGAL)
+    '''
+    branch_join = "JOIN S_POS sp ON spd.POSNo = sp.POSNo" if branchid else ""
+    branch_filter = "AND sp.BranchId = ?" if branchid else ""
     query = f"""
     SELECT
-        k.namakategori
+        k.namakategori,
+        CAST(spd.posdate AS DATE) AS SalesDate,
+        SUM(spd.qty) AS Jumlah
     FROM
         s_posdetail spd
+    {branch_join}
     JOIN
         i_item a ON spd.ItemID = a.ItemId
     JOIN
         m_kategori k ON a.idkategori = k.idkategori
     WHERE
-        CAST(spd.posdate AS DATE) >= '{start_date}'
-        AND CAST(spd.posdate AS DATE) <= '{end_date}'
+        spd.posdate >= ?
+        AND spd.posdate < DATEADD(day, 1, CAST(? AS DATE))
+        {branch_filter}
     GROUP BY
-        k.namakategori
-    HAVING
-        COUNT(DISTINCT CAST(spd.posdate AS DATE)) = DATEDIFF(day, '{start_date}', '{end_date}') + 1
-    ORDER BY
-        SUM(spd.qty) DESC;
+        k.namakategori, CAST(spd.posdate AS DATE);
     """
-    df = run_query(db_name, query)
-    if not df.empty:
-        return df['namakategori'].dropna().tolist()
-    return []
+    params = [_as_date(start_date), _as_date(end_date)] + ([branchid] if branchid else [])
+    return _run_sales_queries("SSMS", db_name, [("coverage_branch" if branchid else "coverage", query, params)])
 
 # @st.cache_data
 def run_query(db_name, query):
@@ -80,26 +131,43 @@ def run_query(db_name, query):
         MENJALANKAN QUERRY SQL
     '''
 
-    conn = None
     try:
-        conn = get_db_connection_ssms(db_name)
-        df = pd.read_sql(query, conn)
-        return df
+        with ssms_connection(db_name) as conn:
+            if not conn: return pd.DataFrame()
+            df = pd.read_sql(query, conn)
+            return df
     except Exception as e:
-        st.error(f"Error saat menjalankan query: {e}")
+        runtime.error(f"Error saat menjalankan query: {e}")
         return pd.DataFrame()
-    finally:
-        if conn: conn.close()
 
-@st.cache_data
+@app_cache.cache_data("sales")
 def load_data_ssms(db_name,branchid, kategori, start_date, end_date):
     '''
         MENGAMBIL DATA DARI DB DENGAN QUERRY YANG SUDAH DITENTUKKAN (1x TRANSAKSI MAX 50 ITEM/ JENIS, MENGHILANGKAN SEMUA PROMO)
+        MELALUI CACHE PARQUET DI DISK (HANYA TANGGAL BARU YANG DI-QUERRY)
+    '''
+    try:
+        return sales_cache.load(f"ssms-{db_name}", branchid, kategori, start_date, end_date,
+                                lambda start, end: _query_sales_ssms(db_name, branchid, kategori, start, end))
+    except Exception as e:
+        runtime.error(f"Error saat menjalankan kueri SQL: {e}")
+        return pd.DataFrame()
+
+def _query_sales_ssms(db_name, branchid, kategori, start_date, end_date):
     '''
+        QUERRY PENJUALAN HARIAN 1 KATEGORI (MELEMPAR EXCEPTION JIKA GAGAL)
+        TANGGAL YANG SUDAH ADA DI AGREGAT daily_category_sales DIBACA DARI SANA (SALES_SOURCE = "daily")
+    '''
+    queries = [
+        _daily_sales_query("SSMS", branchid, start, end, kategori=kategori) if source == "daily"
+        else _detail_sales_query_ssms(branchid, kategori, start, end)
+        for source, start, end in _sales_ranges("SSMS", db_name, start_date, end_date)
+    ]
+    columns = _SalesColumns(with_category=False, capacity=(_as_date(end_date) - _as_date(start_date)).days + 1)
+    return _stream_sales_queries("SSMS", db_name, queries, columns).series_frame()
 
-    conn = get_db_connection_ssms(db_name)
-    if not conn: return pd.DataFrame()
-    query = f"""
+def _detail_sales_query_ssms(branchid, kategori, start_date, end_date):
+    return "sales_category", """
 
         SELECT
             CAST(spd.posdate AS DATE) AS SalesDate,
@@ -113,33 +181,62 @@ def load_data_ssms(db_name,branchid, kategori, start_date, end_date):
         JOIN
             m_kategori mk ON ii.idkategori = mk.idkategori
         WHERE
-            spd.posdate >= '{start_date}'
-            AND spd.posdate <= '{end_date}'
-            AND sp.BranchId = '{branchid}'
-            AND mk.namakategori = '{kategori}'
+            spd.posdate >= ?
+            AND spd.posdate <= ?
+            AND sp.BranchId = ?
+            AND mk.namakategori = ?
             AND spd.Qty <= 50
         GROUP BY
             CAST(spd.posdate AS DATE)
         ORDER BY
             SalesDate ASC;
         ;
-    """
-    try:
-        cur = conn.cursor()
-        cur.execute(query)
-        db_data = cur.fetchall()
-        processed_db_data = [tuple(row) for row in db_data]
-        columns = ['Date', 'Sales']
-        df = pd.DataFrame(processed_db_data, columns=columns)
-        df['Date'] = pd.to_datetime(df['Date'])
-        df.set_index('Date', inplace=True)
-        df['Sales'] = df['Sales'].astype(float)
-        return df
-    except Exception as e:
-        st.error(f"Error saat menjalankan kueri SQL: {e}")
-        return pd.DataFrame()
-    finally:
-        if conn: conn.close()
+    """, [_as_date(start_date), _as_date(end_date), branchid, kategori]
+
+
+def load_data_bulk_ssms(db_name, branchid, start_date, end_date, categories=None, wide=False):
+    '''
+        MENGAMBIL PENJUALAN HARIAN SEMUA KATEGORI (ATAU categories) DALAM 1 QUERRY GROUP BY TANGGAL, KATEGORI
+        MELEMPAR EXCEPTION JIKA KONEKSI / QUERRY GAGAL (DATAFRAME KOSONG = MEMANG TIDAK ADA DATA)
+        TIDAK MEMAKAI app_cache: BATCH MEMBACA TIAP BRANCH SEKALI, CACHE TIDAK PERNAH KENA
+    '''
+    queries = [
+        _daily_sales_query("SSMS", branchid, start, end, categories=categories) if source == "daily"
+        else _detail_bulk_query_ssms(branchid, start, end, categories)
+        for source, start, end in _sales_ranges("SSMS", db_name, start_date, end_date)
+    ]
+    columns = _SalesColumns(with_category=True, capacity=_bulk_capacity(start_date, end_date, categories))
+    return _stream_sales_queries("SSMS", db_name, queries, columns).bulk_frame(wide)
+
+def _detail_bulk_query_ssms(branchid, start_date, end_date, categories):
+    category_filter, category_params = _category_filter('mk.namakategori', categories, "?")
+    return "sales_bulk", f"""
+
+        SELECT
+            CAST(spd.posdate AS DATE) AS SalesDate,
+            mk.namakategori AS Kategori,
+            SUM(spd.qty) AS Jumlah
+        FROM
+            s_posdetail spd
+        JOIN
+            S_POS sp ON spd.POSNo = sp.POSNo
+        JOIN
+            i_item ii ON spd.itemid = ii.itemid
+        JOIN
+            m_kategori mk ON ii.idkategori = mk.idkategori
+        WHERE
+            spd.posdate >= ?
+            AND spd.posdate <= ?
+            AND sp.BranchId = ?
+            {category_filter}
+            AND spd.Qty <= 50
+        GROUP BY
+            CAST(spd.posdate AS DATE), mk.namakategori
+        ORDER BY
+            Kategori ASC, SalesDate ASC;
+        ;
+    """, [_as_date(start_date), _as_date(end_date), branchid] + category_params
+
 
 '''
     POSTGREE
@@ -150,7 +247,8 @@ def get_db_connection_postgres():
     KONEKSI KE DATABASE POSTGRESQL MENGGUNAKAN NAMA DB DARI SECRETS.
     '''
     try:
-        secrets = st.secrets["postgres"]
+        import psycopg2 #postgree
+        secrets = runtime.get_secrets("postgres")
         conn_str = (
             f"host={secrets['host']} "
             f"port={secrets['port']} "
@@ -160,10 +258,20 @@ def get_db_connection_postgres():
         )
         return psycopg2.connect(conn_str)
     except Exception as e:
-        st.error(f"❌ Gagal koneksi ke PostgreSQL: {e}")
+        runtime.error(f"❌ Gagal koneksi ke PostgreSQL: {e}")
         return None
 
-@st.cache_data
+@contextmanager
+def postgres_connection():
+    '''
+    KONEKSI DARI POOL PROSES: with postgres_connection() as conn: ...
+    MENUNGGU SLOT QUERY DULU (DB_QUERY_CONCURRENCY)
+    '''
+    with _query_slot():
+        with app_cache.connection_pool(("postgres",), get_db_connection_postgres).connection() as conn:
+            yield conn
+
+@app_cache.cache_data("branches")
 def get_branch_list_postgres():
     '''
         MENGAMBIL BRANCH UNIK DARI S_POS2
@@ -179,59 +287,88 @@ def get_branch_list_postgres():
         return df[['branchid']].dropna().values.tolist()
     return []    
 
-# @st.cache_data
-def get_unique_categories_postgres(start_date, end_date):
+@app_cache.cache_data("categories")
+def get_unique_categories_postgres(start_date, end_date, branchid=None):
+    '''
+    MENGAMBIL KATEGORI UNIK YANG MEMILIKI PENJUALAN SELAMA RENTANG WAKTU SECARA PENUH (SELURUH DATABASE ATAU 1 branchid),
+    URUT DARI VOLUME TERBESAR; DIJAWAB DARI INDEKS CAKUPAN (coverage_index), HANYA HARI BARU YANG DI-QUERRY.
+    '''
+    try:
+        return coverage_index.eligible_categories(f"postgres-{runtime.get_secrets('postgres')['dbname']}", branchid, start_date, end_date,
+                                                  lambda start, end: _query_coverage_postgres(branchid, start, end))
+    except Exception as e:
+        runtime.error(f"Error saat menjalankan query: {e}")
+        return []
+
+def _query_coverage_postgres(branchid, start_date, end_date):
     '''
-    MENGAMBIL KATEGORI UNIK YANG MEMILIKI PENJUALAN SELAMA RENTANG WAKTU SECARA PENUH.
+    PENJUALAN HARIAN PER KATEGORI (SEMUA QTY) UNTUK INDEKS CAKUPAN (MELEMPAR EXCEPTION JIKA GAGAL).
     '''
+    branch_join = "JOIN S_POS2 sp ON spd.POSNo = sp.POSNo" if branchid else ""
+    branch_filter = "AND sp.branchid = %s" if branchid else ""
     query = f"""
     SELECT
-        ic.categoryname
+        ic.categoryname,
+        spd.posdate::date AS SalesDate,
+        SUM(spd.qty) AS Jumlah
     FROM
         s_pos2detail spd
+    {branch_join}
     JOIN
         i_item a ON spd.itemid = a.itemid
     JOIN
         i_itemcategory ic ON a.categoryid = ic.categoryid
     WHERE
-        spd.posdate::date BETWEEN '{start_date}' AND '{end_date}'
+        spd.posdate >= %s
+        AND spd.posdate < %s::date + 1
+        {branch_filter}
     GROUP BY
-        ic.categoryname
-    HAVING
-        COUNT(DISTINCT spd.posdate::date) = ('{end_date}'::date - '{start_date}'::date) + 1
-    ORDER BY
-        SUM(spd.qty) DESC;
+        ic.categoryname, spd.posdate::date;
     """
-    df = run_query_postgres(query)
-    if not df.empty:
-        return df['categoryname'].dropna().tolist()
-    return []
+    params = [_as_date(start_date), _as_date(end_date)] + ([branchid] if branchid else [])
+    return _run_sales_queries("POSTGRES", None, [("coverage_branch" if branchid else "coverage", query, params)])
 
 # @st.cache_data
 def run_query_postgres(query):
     '''
     MENJALANKAN QUERRY SQL.
     '''
-    conn = None
     try:
-        conn = get_db_connection_postgres()
-        df = pd.read_sql(query, conn)
-        return df
+        with postgres_connection() as conn:
+            if not conn: return pd.DataFrame()
+            df = pd.read_sql(query, conn)
+            return df
     except Exception as e:
-        st.error(f"Error saat menjalankan query: {e}")
+        runtime.error(f"Error saat menjalankan query: {e}")
         return pd.DataFrame()
-    finally:
-        if conn: conn.close()
 
-@st.cache_data
+@app_cache.cache_data("sales")
 def load_data_postgres(branchid, kategori, start_date, end_date):
     '''
-    MENGAMBIL DATA DARI DB DENGAN QUERRY YANG SUDAH DITENTUKKAN.
+    MENGAMBIL DATA DARI DB DENGAN QUERRY YANG SUDAH DITENTUKKAN, MELALUI CACHE PARQUET DI DISK.
     '''
-    conn = get_db_connection_postgres()
-    if not conn: return pd.DataFrame()
+    try:
+        return sales_cache.load(f"postgres-{runtime.get_secrets('postgres')['dbname']}", branchid, kategori, start_date, end_date,
+                                lambda start, end: _query_sales_postgres(branchid, kategori, start, end))
+    except Exception as e:
+        runtime.error(f"Error saat menjalankan kueri SQL: {e}")
+        return pd.DataFrame()
 
-    query = f"""
+def _query_sales_postgres(branchid, kategori, start_date, end_date):
+    '''
+    QUERRY PENJUALAN HARIAN 1 KATEGORI (MELEMPAR EXCEPTION JIKA GAGAL).
+    TANGGAL YANG SUDAH ADA DI AGREGAT daily_category_sales DIBACA DARI SANA (SALES_SOURCE = "daily").
+    '''
+    queries = [
+        _daily_sales_query("POSTGRES", branchid, start, end, kategori=kategori) if source == "daily"
+        else _detail_sales_query_postgres(branchid, kategori, start, end)
+        for source, start, end in _sales_ranges("POSTGRES", None, start_date, end_date)
+    ]
+    columns = _SalesColumns(with_category=False, capacity=(_as_date(end_date) - _as_date(start_date)).days + 1)
+    return _stream_sales_queries("POSTGRES", None, queries, columns).series_frame()
+
+def _detail_sales_query_postgres(branchid, kategori, start_date, end_date):
+    return "sales_category", """
     SELECT
         spd.posdate::date AS SalesDate,
         SUM(spd.qty) AS Jumlah
@@ -244,29 +381,537 @@ def load_data_postgres(branchid, kategori, start_date, end_date):
     JOIN
         i_itemcategory ic ON ii.categoryid = ic.categoryid
     WHERE
-        spd.posdate::date BETWEEN '{start_date}' AND '{end_date}'
-        AND sp.branchid = '{branchid}'
-        AND ic.categoryname = '{kategori}'
+        spd.posdate::date BETWEEN %s AND %s
+        AND sp.branchid = %s
+        AND ic.categoryname = %s
         AND spd.qty <= 50
     GROUP BY
         spd.posdate::date
     ORDER BY
         SalesDate ASC
     ;
-    """
+    """, [_as_date(start_date), _as_date(end_date), branchid, kategori]
 
-    try:
+
+def load_data_bulk_postgres(branchid, start_date, end_date, categories=None, wide=False):
+    '''
+    MENGAMBIL PENJUALAN HARIAN SEMUA KATEGORI (ATAU categories) DALAM 1 QUERRY GROUP BY TANGGAL, KATEGORI.
+    MELEMPAR EXCEPTION JIKA KONEKSI / QUERRY GAGAL (DATAFRAME KOSONG = MEMANG TIDAK ADA DATA).
+    TIDAK MEMAKAI app_cache: BATCH MEMBACA TIAP BRANCH SEKALI, CACHE TIDAK PERNAH KENA.
+    '''
+    queries = [
+        _daily_sales_query("POSTGRES", branchid, start, end, categories=categories) if source == "daily"
+        else _detail_bulk_query_postgres(branchid, start, end, categories)
+        for source, start, end in _sales_ranges("POSTGRES", None, start_date, end_date)
+    ]
+    columns = _SalesColumns(with_category=True, capacity=_bulk_capacity(start_date, end_date, categories))
+    return _stream_sales_queries("POSTGRES", None, queries, columns, copy=BULK_COPY).bulk_frame(wide)
+
+def _detail_bulk_query_postgres(branchid, start_date, end_date, categories):
+    category_filter, category_params = _category_filter('ic.categoryname', categories, "%s")
+    return "sales_bulk", f"""
+    SELECT
+        spd.posdate::date AS SalesDate,
+        ic.categoryname AS Kategori,
+        SUM(spd.qty) AS Jumlah
+    FROM
+        s_pos2detail spd
+    JOIN
+        S_POS2 sp ON spd.POSNo = sp.POSNo
+    JOIN
+        i_item ii ON spd.itemid = ii.itemid
+    JOIN
+        i_itemcategory ic ON ii.categoryid = ic.categoryid
+    WHERE
+        spd.posdate::date BETWEEN %s AND %s
+        AND sp.branchid = %s
+        {category_filter}
+        AND spd.qty <= 50
+    GROUP BY
+        spd.posdate::date, ic.categoryname
+    ORDER BY
+        Kategori ASC, SalesDate ASC
+    ;
+    """, [_as_date(start_date), _as_date(end_date), branchid] + category_params
+
+
+'''
+    BULK HELPER
+'''
+
+def _category_filter(column, categories, placeholder):
+    '''
+        KLAUSA "AND kolom IN (?, ...)" & PARAMETERNYA UNTUK SUBSET KATEGORI (KOSONG = SEMUA KATEGORI)
+    '''
+    if not categories: return "", []
+    return f"AND {column} IN ({', '.join([placeholder] * len(categories))})", [str(c) for c in categories]
+
+def slice_category(bulk_df, kategori):
+    '''
+        MENGAMBIL 1 KATEGORI DARI HASIL BULK, BENTUKNYA SAMA DENGAN load_data_ssms / load_data_postgres
+    '''
+    if bulk_df.empty: return pd.DataFrame()
+    if 'Kategori' in bulk_df.columns:
+        df = bulk_df.loc[bulk_df['Kategori'] == kategori, ['Sales']]
+    elif kategori in bulk_df.columns:
+        df = bulk_df[[kategori]].dropna().rename(columns={kategori: 'Sales'})
+    else:
+        return pd.DataFrame()
+    return df.sort_index().copy()
+
+
+'''
+    QUERRY BERPARAMETER
+'''
+
+# Statement yang sudah di-PREPARE per koneksi PostgreSQL (hilang bersama koneksinya)
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+def _connection(dbms, db_name=None):
+    return ssms_connection(db_name) if dbms == "SSMS" else postgres_connection()
+
+def _as_date(value):
+    return pd.to_datetime(value).date()
+
+def _numbered(query):
+    '''
+        %s -> $1, $2, ... UNTUK PREPARE POSTGRES
+    '''
+    counter = iter(range(1, query.count("%s") + 1))
+    return re.sub(r"%s", lambda _: f"${next(counter)}", query)
+
+def _execute(conn, cur, dbms, shape, query, params):
+    '''
+        MENJALANKAN QUERRY BERPARAMETER (? UNTUK pyodbc, %s UNTUK psycopg2), WAKTUNYA DICATAT PER shape DI query_stats
+        SSMS: pyodbc MENGIRIM sp_prepexec, PLAN DI-CACHE SERVER SEKALI UNTUK SEMUA NILAI PARAMETER;
+        POSTGRES: psycopg2 MENGISI PARAMETER DI CLIENT, JADI QUERRY DI-PREPARE SEKALI PER KONEKSI LALU DI-EXECUTE
+    '''
+    shape = f"{dbms.lower()}.{shape}"
+    if dbms == "SSMS":
+        with query_stats.STATS.timed(shape, "execute"):
+            cur.execute(query, params)
+        return
+    name = "fc_" + hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+    with _prepared_lock:
+        prepared = _prepared.setdefault(conn, set())
+    if name not in prepared:
+        with query_stats.STATS.timed(shape, "prepare"):
+            cur.execute(f"PREPARE {name} AS {_numbered(query)}")
+        prepared.add(name)
+    with query_stats.STATS.timed(shape, "execute"):
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})" if params else f"EXECUTE {name}", params)
+
+def _run_sales_queries(dbms, db_name, queries):
+    '''
+        I.S. queries = [(shape, querry, parameter), ...]
+        O.S. GABUNGAN BARIS SEMUA QUERRY DENGAN 1 KONEKSI (MELEMPAR EXCEPTION JIKA GAGAL)
+    '''
+    with _connection(dbms, db_name) as conn:
+        if not conn: raise ConnectionError(f"Tidak ada koneksi ke database {db_name or 'PostgreSQL'}")
         cur = conn.cursor()
-        cur.execute(query)
-        db_data = cur.fetchall()
-        columns = ['Date', 'Sales']
-        df = pd.DataFrame(db_data, columns=columns)
-        df['Date'] = pd.to_datetime(df['Date'])
-        df.set_index('Date', inplace=True)
-        df['Sales'] = df['Sales'].astype(float)
+        db_data = []
+        for shape, query, params in queries:
+            _execute(conn, cur, dbms, shape, query, params)
+            with query_stats.STATS.timed(f"{dbms.lower()}.{shape}", "fetch"):
+                db_data += [tuple(row) for row in cur.fetchall()]
+    return db_data
+
+
+'''
+    EKSTRAKSI BARIS STREAMING
+'''
+
+# Jumlah baris per fetchmany / per potongan COPY yang diubah ke array sekaligus
+FETCH_CHUNK_ROWS = int(os.environ.get("DB_FETCH_CHUNK_ROWS", 10000))
+# Querry bulk POSTGRES lewat COPY ... TO STDOUT (1 = aktif). Default mati: COPY tidak bisa memakai PREPARE / EXECUTE,
+# jadi parameter diisi ke teks querry dan plan dibuat ulang tiap querry; jalur default memakai _execute + fetchmany
+BULK_COPY = os.environ.get("DB_BULK_COPY", "0") == "1"
+
+class _SalesColumns:
+    '''
+        KOLOM TANGGAL, (KATEGORI), JUMLAH SEBAGAI ARRAY NUMPY YANG DIALOKASIKAN DI AWAL (DIPERBESAR 2x JIKA PENUH),
+        DIISI PER POTONGAN BARIS: TIDAK ADA LIST BARIS PYTHON SEPANJANG HASIL QUERRY
+    '''
+
+    def __init__(self, with_category, capacity=None):
+        capacity = max(int(capacity or FETCH_CHUNK_ROWS), 1)
+        self.size = 0
+        self.dates = np.empty(capacity, dtype="datetime64[D]")
+        self.sales = np.empty(capacity, dtype=np.float64)
+        self.codes = np.empty(capacity, dtype=np.int32) if with_category else None
+        self.categories = {}
+
+    def _reserve(self, n):
+        needed = self.size + n
+        if needed <= len(self.sales):
+            return
+        capacity = max(needed, 2 * len(self.sales))
+        for name in ("dates", "sales", "codes"):
+            old = getattr(self, name)
+            if old is not None:
+                new = np.empty(capacity, dtype=old.dtype)
+                new[:self.size] = old[:self.size]
+                setattr(self, name, new)
+
+    def extend(self, rows):
+        '''
+            I.S. rows = POTONGAN BARIS (TANGGAL, [KATEGORI,] JUMLAH); TANGGAL & JUMLAH BOLEH BERUPA TEKS (COPY CSV)
+        '''
+        if not rows: return
+        self._reserve(len(rows))
+        end = self.size + len(rows)
+        self.dates[self.size:end] = [row[0] for row in rows]
+        self.sales[self.size:end] = [row[-1] for row in rows]
+        if self.codes is not None:
+            self.codes[self.size:end] = [self.categories.setdefault(row[1], len(self.categories)) for row in rows]
+        self.size = end
+
+    def _index(self):
+        return pd.DatetimeIndex(pd.to_datetime(self.dates[:self.size]), name='Date')
+
+    def series_frame(self):
+        '''
+            FRAME 1 KATEGORI (INDEX Date, KOLOM Sales)
+        '''
+        return pd.DataFrame({'Sales': self.sales[:self.size].copy()}, index=self._index())
+
+    def bulk_frame(self, wide):
+        '''
+            FRAME PANJANG (INDEX Date, KOLOM Kategori & Sales) ATAU LEBAR (INDEX Date, 1 KOLOM PER KATEGORI)
+        '''
+        names = np.array(list(self.categories), dtype=object)
+        df = pd.DataFrame({'Kategori': names[self.codes[:self.size]], 'Sales': self.sales[:self.size].copy()}, index=self._index())
+        if wide:
+            return df.pivot(columns='Kategori', values='Sales').sort_index()
         return df
+
+def _bulk_capacity(start_date, end_date, categories):
+    '''
+        PERKIRAAN JUMLAH BARIS BULK: HARI x KATEGORI (TANPA SUBSET KATEGORI: FETCH_CHUNK_ROWS, DIPERBESAR SAAT PERLU)
+    '''
+    if not categories: return FETCH_CHUNK_ROWS
+    return ((_as_date(end_date) - _as_date(start_date)).days + 1) * len(categories)
+
+class _CsvCopySink:
+    '''
+        TUJUAN copy_expert: TEKS CSV DITAMPUNG SAMPAI FETCH_CHUNK_ROWS BARIS LENGKAP, LALU DIBACA csv.reader KE _SalesColumns.
+        NEWLINE DI DALAM FIELD BERKUTIP BUKAN AKHIR BARIS: BARIS LENGKAP = NEWLINE DENGAN JUMLAH TANDA KUTIP GENAP SEBELUMNYA
+    '''
+
+    def __init__(self, columns):
+        self.columns = columns
+        self._complete = []
+        self._rows = 0
+        self._tail = ""
+        self._scanned = 0
+        self._quoted = False
+
+    def write(self, data):
+        if isinstance(data, bytes): data = data.decode("utf-8")
+        self._tail += data
+        end = 0
+        newline = self._tail.find("\n", self._scanned)
+        while newline >= 0:
+            if self._tail.count('"', self._scanned, newline) % 2:
+                self._quoted = not self._quoted
+            self._scanned = newline + 1
+            if not self._quoted:
+                end = self._scanned
+                self._rows += 1
+            newline = self._tail.find("\n", self._scanned)
+        if end:
+            self._complete.append(self._tail[:end])
+            self._tail = self._tail[end:]
+            self._scanned -= end
+        if self._rows >= FETCH_CHUNK_ROWS:
+            self._parse()
+
+    def _parse(self):
+        self.columns.extend(list(csv.reader(io.StringIO("".join(self._complete), newline=""))))
+        self._complete, self._rows = [], 0
+
+    def flush(self):
+        if self._tail:
+            self._complete.append(self._tail)
+            self._tail, self._scanned, self._quoted = "", 0, False
+        self._parse()
+
+def _stream_sales_queries(dbms, db_name, queries, columns, copy=False):
+    '''
+        I.S. queries = [(shape, querry, parameter), ...]
+        O.S. columns (_SalesColumns) BERISI HASIL SEMUA QUERRY DENGAN 1 KONEKSI (MELEMPAR EXCEPTION JIKA GAGAL);
+        BARIS DIAMBIL PER FETCH_CHUNK_ROWS DENGAN fetchmany, ATAU COPY ... TO STDOUT (POSTGRES, copy=True)
+    '''
+    with _connection(dbms, db_name) as conn:
+        if not conn: raise ConnectionError(f"Tidak ada koneksi ke database {db_name or 'PostgreSQL'}")
+        cur = conn.cursor()
+        for shape, query, params in queries:
+            if copy and dbms != "SSMS":
+                _copy_query(cur, shape, query, params, columns)
+                continue
+            _execute(conn, cur, dbms, shape, query, params)
+            with query_stats.STATS.timed(f"{dbms.lower()}.{shape}", "fetch"):
+                rows = cur.fetchmany(FETCH_CHUNK_ROWS)
+                while rows:
+                    columns.extend(rows)
+                    rows = cur.fetchmany(FETCH_CHUNK_ROWS)
+    return columns
+
+def _copy_query(cur, shape, query, params, columns):
+    '''
+        COPY (querry) TO STDOUT FORMAT csv LANGSUNG KE columns. COPY TIDAK MENERIMA PARAMETER / EXECUTE,
+        JADI PARAMETER DIISI psycopg2 (mogrify, SUDAH DI-ESCAPE) DAN PLAN TIDAK DI-CACHE (LIHAT BULK_COPY)
+    '''
+    select = cur.mogrify(query.strip().rstrip(";").strip(), params)
+    if isinstance(select, bytes): select = select.decode("utf-8")
+    sink = _CsvCopySink(columns)
+    with query_stats.STATS.timed(f"postgres.{shape}", "execute"):
+        cur.copy_expert(f"COPY ({select}) TO STDOUT WITH (FORMAT csv)", sink)
+        sink.flush()
+
+
+'''
+    AGREGAT PENJUALAN HARIAN (daily_category_sales)
+'''
+
+# Sumber data loader: "detail" (tabel detail POS) atau "daily" (agregat hasil refresh_daily_sales;
+# tanggal setelah watermark agregat tetap diambil dari tabel detail)
+SALES_SOURCES = ["detail", "daily"]
+SALES_SOURCE = os.environ.get("SALES_SOURCE", "detail")
+DAILY_SALES_TABLE = os.environ.get("DAILY_SALES_TABLE", "daily_category_sales")
+# Jumlah hari terakhir sebelum watermark yang dihitung ulang tiap refresh (transaksi yang masuk terlambat)
+DAILY_SALES_LOOKBACK_DAYS = int(os.environ.get("DAILY_SALES_LOOKBACK_DAYS", 3))
+# Refresh dibagi per rentang hari ini, 1 transaksi per rentang
+DAILY_SALES_CHUNK_DAYS = int(os.environ.get("DAILY_SALES_CHUNK_DAYS", 31))
+# Lama (detik) cakupan agregat disimpan di memori sebelum watermark dibaca ulang
+DAILY_SALES_COVERAGE_TTL = float(os.environ.get("DAILY_SALES_COVERAGE_TTL", 60))
+
+_coverage = {}
+_coverage_lock = threading.Lock()
+
+def set_sales_source(source):
+    global SALES_SOURCE
+    if source not in SALES_SOURCES:
+        raise ValueError(f"Sumber data harus salah satu dari {SALES_SOURCES} (bukan '{source}')")
+    SALES_SOURCE = source
+
+def daily_sales_coverage(dbms, db_name=None, refresh=False):
+    '''
+        O.S. (from_date, through_date) YANG SUDAH DIHITUNG DI AGREGAT, ATAU None JIKA BELUM ADA
+        DISIMPAN DI MEMORI SELAMA DAILY_SALES_COVERAGE_TTL DETIK
+    '''
+    key = (dbms, db_name)
+    with _coverage_lock:
+        cached = _coverage.get(key)
+        if cached is not None and not refresh and cached[0] > time.monotonic():
+            return cached[1]
+    try:
+        rows = _run_sales_queries(dbms, db_name, [("daily_watermark", f"SELECT from_date, through_date FROM {DAILY_SALES_TABLE}_watermark;", [])])
+        coverage = (_as_date(rows[0][0]), _as_date(rows[0][1])) if rows else None
     except Exception as e:
-        st.error(f"Error saat menjalankan kueri SQL: {e}")
-        return pd.DataFrame()
-    finally:
-        if conn: conn.close()
\ No newline at end of file
+        runtime.warning(f"Agregat {DAILY_SALES_TABLE} belum bisa dipakai, data diambil dari tabel detail: {e}")
+        coverage = None
+    with _coverage_lock:
+        _coverage[key] = (time.monotonic() + DAILY_SALES_COVERAGE_TTL, coverage)
+    return coverage
+
+def _sales_ranges(dbms, db_name, start_date, end_date):
+    '''
+        I.S. RENTANG YANG DIMINTA LOADER
+        O.S. [(SUMBER, START, END), ...]: "daily" SAMPAI WATERMARK AGREGAT, "detail" UNTUK TANGGAL SETELAHNYA
+        (AGREGAT HANYA DIPAKAI JIKA AWAL RENTANG ADA DI CAKUPANNYA)
+    '''
+    if SALES_SOURCE != "daily":
+        return [("detail", start_date, end_date)]
+    coverage = daily_sales_coverage(dbms, db_name)
+    start, end = _as_date(start_date), _as_date(end_date)
+    if coverage is None or not coverage[0] <= start <= coverage[1]:
+        return [("detail", start_date, end_date)]
+    if end <= coverage[1]:
+        return [("daily", start_date, end_date)]
+    return [
+        ("daily", start_date, coverage[1].strftime("%Y-%m-%d")),
+        ("detail", (coverage[1] + timedelta(days=1)).strftime("%Y-%m-%d"), end_date),
+    ]
+
+def _daily_sales_query(dbms, branchid, start_date, end_date, kategori=None, categories=None):
+    '''
+        QUERRY KE AGREGAT: (TANGGAL, JUMLAH) UNTUK 1 kategori, ATAU (TANGGAL, KATEGORI, JUMLAH) SEPERTI QUERRY BULK
+    '''
+    date_column = "[date]" if dbms == "SSMS" else '"date"'
+    placeholder = "?" if dbms == "SSMS" else "%s"
+    if kategori is not None:
+        shape = "daily_category"
+        select = f"{date_column} AS SalesDate, qty AS Jumlah"
+        category_filter, category_params = f"AND category = {placeholder}", [kategori]
+        order = f"{date_column} ASC"
+    else:
+        shape = "daily_bulk"
+        select = f"{date_column} AS SalesDate, category AS Kategori, qty AS Jumlah"
+        category_filter, category_params = _category_filter("category", categories, placeholder)
+        order = f"category ASC, {date_column} ASC"
+    return shape, f"""
+        SELECT {select}
+        FROM {DAILY_SALES_TABLE}
+        WHERE
+            branch = {placeholder}
+            AND {date_column} >= {placeholder}
+            AND {date_column} <= {placeholder}
+            {category_filter}
+        ORDER BY {order};
+    """, [branchid, _as_date(start_date), _as_date(end_date)] + category_params
+
+def _daily_sales_ddl(dbms, table):
+    if dbms == "SSMS":
+        return f"""
+            IF OBJECT_ID(N'{table}', N'U') IS NULL
+            CREATE TABLE {table} (
+                branch VARCHAR(50) NOT NULL,
+                category NVARCHAR(200) NOT NULL,
+                [date] DATE NOT NULL,
+                qty DECIMAL(18, 4) NOT NULL,
+                PRIMARY KEY (branch, category, [date])
+            );
+            IF OBJECT_ID(N'{table}_watermark', N'U') IS NULL
+            CREATE TABLE {table}_watermark (
+                from_date DATE NOT NULL,
+                through_date DATE NOT NULL,
+                refreshed_at DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()
+            );
+        """
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            branch VARCHAR(50) NOT NULL,
+            category TEXT NOT NULL,
+            "date" DATE NOT NULL,
+            qty NUMERIC(18, 4) NOT NULL,
+            PRIMARY KEY (branch, category, "date")
+        );
+        CREATE TABLE IF NOT EXISTS {table}_watermark (
+            from_date DATE NOT NULL,
+            through_date DATE NOT NULL,
+            refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """
+
+def _daily_sales_refresh_queries(dbms, table, start_date, end_date):
+    '''
+        HAPUS LALU HITUNG ULANG [start_date, end_date] DENGAN ATURAN LOADER (Qty <= 50);
+        FILTER posdate DALAM BENTUK RENTANG (TANPA CAST) AGAR INDEX posdate TERPAKAI
+    '''
+    params = [_as_date(start_date), _as_date(end_date)]
+    if dbms == "SSMS":
+        return [
+            ("daily_refresh_delete", f"DELETE FROM {table} WHERE [date] >= ? AND [date] <= ?;", params),
+            ("daily_refresh_insert", f"""
+            INSERT INTO {table} (branch, category, [date], qty)
+            SELECT
+                sp.BranchId,
+                mk.namakategori,
+                CAST(spd.posdate AS DATE),
+                SUM(spd.qty)
+            FROM
+                s_posdetail spd
+            JOIN
+                S_POS sp ON spd.POSNo = sp.POSNo
+            JOIN
+                i_item ii ON spd.itemid = ii.itemid
+            JOIN
+                m_kategori mk ON ii.idkategori = mk.idkategori
+            WHERE
+                spd.posdate >= ?
+                AND spd.posdate < DATEADD(day, 1, CAST(? AS DATE))
+                AND sp.BranchId IS NOT NULL
+                AND mk.namakategori IS NOT NULL
+                AND spd.Qty <= 50
+            GROUP BY
+                sp.BranchId, mk.namakategori, CAST(spd.posdate AS DATE);
+            """, params),
+        ]
+    return [
+        ("daily_refresh_delete", f"""DELETE FROM {table} WHERE "date" >= %s AND "date" <= %s;""", params),
+        ("daily_refresh_insert", f"""
+        INSERT INTO {table} (branch, category, "date", qty)
+        SELECT
+            sp.branchid,
+            ic.categoryname,
+            spd.posdate::date,
+            SUM(spd.qty)
+        FROM
+            s_pos2detail spd
+        JOIN
+            S_POS2 sp ON spd.POSNo = sp.POSNo
+        JOIN
+            i_item ii ON spd.itemid = ii.itemid
+        JOIN
+            i_itemcategory ic ON ii.categoryid = ic.categoryid
+        WHERE
+            spd.posdate >= %s
+            AND spd.posdate < %s::date + 1
+            AND sp.branchid IS NOT NULL
+            AND ic.categoryname IS NOT NULL
+            AND spd.qty <= 50
+        GROUP BY
+            sp.branchid, ic.categoryname, spd.posdate::date;
+        """, params),
+    ]
+
+def refresh_daily_sales(dbms, db_name=None, start_date=None, through_date=None, lookback_days=None):
+    '''
+        MEMBUAT (JIKA BELUM ADA) & MEMPERBARUI AGREGAT daily_category_sales(branch, category, date, qty) SECARA INKREMENTAL
+        I.S. start_date KOSONG = LANJUT DARI WATERMARK (lookback_days HARI TERAKHIR DIHITUNG ULANG), WAJIB SAAT LOAD AWAL;
+             through_date KOSONG = KEMARIN (HARI INI BELUM LENGKAP)
+        O.S. RINGKASAN {"from", "through", "days", "rows"}; WATERMARK DIPERBARUI PER RENTANG YANG SELESAI
+    '''
+    table = DAILY_SALES_TABLE
+    lookback = DAILY_SALES_LOOKBACK_DAYS if lookback_days is None else max(int(lookback_days), 0)
+    through = _as_date(through_date) if through_date else date.today() - timedelta(days=1)
+
+    with _connection(dbms, db_name) as conn:
+        if not conn: raise ConnectionError(f"Tidak ada koneksi ke database {db_name or 'PostgreSQL'}")
+        cur = conn.cursor()
+        cur.execute(_daily_sales_ddl(dbms, table))
+        cur.execute(f"SELECT from_date, through_date FROM {table}_watermark;")
+        row = cur.fetchone()
+        conn.commit()
+    coverage = (_as_date(row[0]), _as_date(row[1])) if row else None
+
+    if start_date:
+        start = _as_date(start_date)
+    elif coverage is not None:
+        start = coverage[1] + timedelta(days=1 - lookback)
+    else:
+        raise ValueError(f"Agregat {table} masih kosong, isi tanggal mulai untuk load awal")
+    if coverage is not None:
+        # Rentang diperluas agar cakupan agregat tetap bersambung dengan watermark lama
+        start = min(start, coverage[1] + timedelta(days=1))
+        through = max(through, coverage[0] - timedelta(days=1))
+
+    summary = {"from": start.strftime("%Y-%m-%d"), "through": through.strftime("%Y-%m-%d"), "days": 0, "rows": 0}
+    chunk_start = start
+    while chunk_start <= through:
+        chunk_end = min(chunk_start + timedelta(days=max(DAILY_SALES_CHUNK_DAYS, 1) - 1), through)
+        # Cakupan lama hanya digabung jika [start, chunk_end] bersambung dengannya
+        if coverage is not None and coverage[0] <= chunk_end + timedelta(days=1):
+            coverage = (min(coverage[0], start), max(coverage[1], chunk_end))
+        else:
+            coverage = (start, chunk_end)
+        with _connection(dbms, db_name) as conn:
+            if not conn: raise ConnectionError(f"Tidak ada koneksi ke database {db_name or 'PostgreSQL'}")
+            cur = conn.cursor()
+            for shape, query, params in _daily_sales_refresh_queries(dbms, table, chunk_start, chunk_end):
+                _execute(conn, cur, dbms, shape, query, params)
+            summary["rows"] += max(cur.rowcount, 0)
+            placeholder = "?" if dbms == "SSMS" else "%s"
+            cur.execute(f"DELETE FROM {table}_watermark;")
+            _execute(conn, cur, dbms, "daily_watermark_update",
+                     f"INSERT INTO {table}_watermark (from_date, through_date) VALUES ({placeholder}, {placeholder});", list(coverage))
+            conn.commit()
+        summary["days"] += (chunk_end - chunk_start).days + 1
+        runtime.info(f"Agregat {table} diperbarui sampai {chunk_end.strftime('%Y-%m-%d')}", days=summary["days"], rows=summary["rows"])
+        chunk_start = chunk_end + timedelta(days=1)
+
+    with _coverage_lock:
+        _coverage.clear()
+    return summary
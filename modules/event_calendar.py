@@ -0,0 +1,92 @@
+import threading
+import numpy as np
+import pandas as pd
+from . import runtime
+from . import event_store
+
+'''
+    KALENDER EVENT TERKOMPILASI: STORE EVENT (event_store) DIBACA SEKALI PER VERSI DATA
+    DAN DIPAKAI BERSAMA OLEH SEMUA FIT DALAM SATU PROSES
+'''
+
+_calendars = {}
+_lock = threading.Lock()
+
+
+def _expand_ranges(ranges_df):
+    '''
+        I.S. DATAFRAME Start Date / End Date
+        O.S. ARRAY datetime64[D] TERURUT SEMUA HARI DALAM RENTANG
+    '''
+    ranges_df = ranges_df.dropna(subset=['Start Date', 'End Date'])
+    starts = ranges_df['Start Date'].to_numpy().astype('datetime64[D]')
+    ends = ranges_df['End Date'].to_numpy().astype('datetime64[D]')
+    lengths = (ends - starts).astype(int) + 1
+    valid = lengths > 0
+    starts, lengths = starts[valid], lengths[valid]
+    if not len(starts):
+        return np.array([], dtype='datetime64[D]')
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.unique(np.repeat(starts, lengths) + offsets.astype('timedelta64[D]'))
+
+
+class EventCalendar:
+    '''
+        HOLIDAYS UNTUK PROPHET + ARRAY TANGGAL TERURUT (datetime64[D]) PER JENIS EVENT;
+        KEANGGOTAAN TANGGAL DICEK DI prophet_model.build_features
+    '''
+
+    def __init__(self, holidays_df, ramadan_df, ujian_df, version=None):
+        self.version = version
+        self.holidays_df = holidays_df
+        self.holiday_dates = np.unique(holidays_df['ds'].dropna().to_numpy().astype('datetime64[D]'))
+        self.ramadan_dates = _expand_ranges(ramadan_df)
+        self.ujian_dates = _expand_ranges(ujian_df)
+
+
+def _read_calendar(store, version):
+    '''
+        MEMBACA SEMUA EVENT DARI STORE SEKALI LALU MENGOMPILASI KALENDER
+    '''
+    try:
+        holidays_df = store.holidays().reset_index(drop=True).rename(columns={"Date": "ds", "Holiday Name": "holiday"})
+        holidays_df["ds"] = pd.to_datetime(holidays_df["ds"])
+    except Exception as e:
+        runtime.error(f"Gagal memuat data 'Holidays' dari {store.path}: {e}")
+        holidays_df = pd.DataFrame(columns=["ds", "holiday"])
+        holidays_df["ds"] = pd.to_datetime(holidays_df["ds"])
+    ranges = {}
+    for name in event_store.PERIOD_SHEETS:
+        try:
+            ranges_df = store.periods(name).reset_index(drop=True)
+            ranges_df['Start Date'] = pd.to_datetime(ranges_df['Start Date'])
+            ranges_df['End Date'] = pd.to_datetime(ranges_df['End Date'])
+        except Exception as e:
+            runtime.error(f"Gagal memuat data '{name}' dari {store.path}: {e}")
+            ranges_df = pd.DataFrame({'Start Date': pd.to_datetime([]), 'End Date': pd.to_datetime([])})
+        ranges[name] = ranges_df
+    holidays_df['lower_window'] = 0
+    holidays_df['upper_window'] = 0
+    return EventCalendar(holidays_df, ranges['Ramadan'], ranges['Ujian'], version=version)
+
+
+def get_event_calendar(store=None):
+    '''
+        KALENDER UNTUK STORE EVENT (DEFAULT event_store.get_store(), ATAU PATH FILE);
+        DIKOMPILASI ULANG HANYA JIKA STORE BERUBAH (signature) DAN ISINYA BERBEDA (version)
+    '''
+    if store is None or isinstance(store, str):
+        store = event_store.open_store(store)
+    signature = store.signature()
+    with _lock:
+        cached = _calendars.get(store.key)
+        if cached is not None and cached[0] == signature:
+            return cached[2]
+        content_hash = store.version() if signature is not None else None
+        if cached is not None and content_hash is not None and cached[1] == content_hash:
+            _calendars[store.key] = (signature, content_hash, cached[2])
+            return cached[2]
+        calendar = _read_calendar(store, version=content_hash)
+        if signature is not None:
+            _calendars[store.key] = (signature, content_hash, calendar)
+        return calendar
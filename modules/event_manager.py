@@ -3,7 +3,7 @@ import time
 import pandas as pd
 from datetime import datetime
 from . import event_utils
-import os # Import the os module
+from . import event_store
 
 def run():
     start_year = st.sidebar.number_input("Tahun Awal",  value=2015)
@@ -14,11 +14,11 @@ def run():
         return False
     
     st.title("Aplikasi Pengelola Data Hari Libur & Event")
-    event_utils.last_update_excel()
+    event_utils.last_update()
     
-    # Check if the file exists before creating it
-    if not os.path.exists(event_utils.EVENTS_EXCEL_FILE):
-        event_utils.create_events_excel_file(start_year, end_year)
+    # Check if the store exists before creating it
+    if not event_store.get_store().exists():
+        event_utils.create_events_store(start_year, end_year)
     
     if st.button("Lakukan Scraping & Perbarui Data"):
         with st.spinner('Sedang melakukan scraping...'):
@@ -30,7 +30,7 @@ def run():
     selected_sheet = st.selectbox("Pilih Sheet", sheet_options)
     st.header(f"Data {selected_sheet}")
     
-    # Load data from the existing file
+    # Load data from the event store
     df = event_utils.load_data(selected_sheet)
     edited_df = df.copy()
 
@@ -39,10 +39,12 @@ def run():
             df,
             use_container_width=True,
             num_rows="dynamic",
-            hide_index=True
+            hide_index=True,
+            key=f"editor_{selected_sheet}"
         )
         if st.button("Simpan Perubahan"):
-            if event_utils.save_changes(edited_df, selected_sheet, sheet_options):
+            # Hanya baris yang diubah di editor yang ditulis ke store
+            if event_utils.save_changes(selected_sheet, df, st.session_state[f"editor_{selected_sheet}"]):
                 time.sleep(2)
                 st.rerun()
 
@@ -91,3 +93,15 @@ def run():
             else:
                 st.warning("Mohon isi tanggal awal dan akhir dengan benar.")
 
+    st.markdown("---")
+    st.header("Impor / Ekspor Excel")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Unduh Data Event (events.xlsx)", data=event_utils.export_excel(), file_name="events.xlsx",
+                           mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    with col2:
+        uploaded_file = st.file_uploader("Impor dari Excel (sheet Holidays, Ramadan, Ujian)", type=["xlsx"])
+        if uploaded_file is not None and st.button("Impor & Ganti Semua Data Event"):
+            if event_utils.import_excel(uploaded_file):
+                time.sleep(2)
+                st.rerun()
@@ -0,0 +1,448 @@
+import os
+import io
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from contextlib import closing
+import numpy as np
+import pandas as pd
+from . import runtime
+
+'''
+    PENYIMPANAN EVENT (Holidays / Ramadan / Ujian) DENGAN BACKEND YANG BISA DIGANTI:
+    - sqlite : FILE .db, INDEKS TANGGAL, INSERT / UPDATE / DELETE PER BARIS & QUERRY RENTANG TANGGAL
+    - excel  : LAYOUT LAMA events.xlsx (SETIAP PERUBAHAN MENULIS ULANG WORKBOOK), UNTUK YANG MASIH MENGEDIT MANUAL
+    DATAFRAME MEMAKAI KOLOM SHEET EXCEL (Date, Holiday Name / Start Date, End Date) DENGAN id BARIS DI INDEX
+'''
+
+# Lokasi store; backend dipilih dari ekstensi (.xlsx = excel, selain itu sqlite)
+EVENTS_STORE = os.environ.get("EVENTS_STORE", "events.db")
+# Workbook lama, diimpor otomatis saat store SQLite belum ada
+LEGACY_EXCEL_FILE = "events.xlsx"
+
+SHEETS = ["Holidays", "Ramadan", "Ujian"]
+PERIOD_SHEETS = ["Ramadan", "Ujian"]
+COLUMNS = {"Holidays": ["Date", "Holiday Name"], "Ramadan": ["Start Date", "End Date"], "Ujian": ["Start Date", "End Date"]}
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _check_sheet(sheet):
+    if sheet not in COLUMNS:
+        raise ValueError(f"Sheet event '{sheet}' tidak dikenal, pilih salah satu dari {SHEETS}")
+    return sheet
+
+
+def _as_date(value):
+    value = pd.to_datetime(value, errors="coerce")
+    return None if pd.isna(value) else value.date()
+
+
+def _normalize(sheet, df):
+    '''
+        I.S. DATAFRAME DENGAN KOLOM SHEET (TANGGAL BOLEH STRING / datetime)
+        O.S. DATAFRAME KOLOM COLUMNS[sheet], TANGGAL datetime.date, BARIS TANPA TANGGAL DIBUANG
+    '''
+    columns = COLUMNS[_check_sheet(sheet)]
+    df = pd.DataFrame(df).reindex(columns=columns)
+    for col in columns:
+        if "Date" in col:
+            df[col] = [_as_date(value) for value in df[col]]
+    if sheet == "Holidays":
+        df["Holiday Name"] = df["Holiday Name"].fillna("").astype(str)
+    return df.dropna(subset=[col for col in columns if "Date" in col])
+
+
+def _validated(sheet, df):
+    '''
+        SEPERTI _normalize, TETAPI MENOLAK (ValueError) SHEET TANPA KOLOM WAJIB ATAU BARIS DENGAN TANGGAL YANG TIDAK BISA DIBACA;
+        HANYA BARIS YANG SELURUHNYA KOSONG YANG DIBUANG. DIPAKAI SEBELUM ISI STORE DIGANTI
+    '''
+    columns = COLUMNS[_check_sheet(sheet)]
+    df = pd.DataFrame(df)
+    missing = [col for col in columns if col not in df.columns]
+    if missing:
+        raise ValueError(f"Sheet '{sheet}' tidak punya kolom {missing} (kolom yang ada: {list(df.columns)})")
+    df = df[columns].dropna(how="all")
+    dates = [col for col in columns if "Date" in col]
+    bad = np.zeros(len(df), dtype=bool)
+    for col in dates:
+        bad |= np.array([_as_date(value) is None for value in df[col]], dtype=bool)
+    if bad.any():
+        # Nomor baris seperti di Excel (baris 1 = header) selama index masih index bawaan read_excel
+        rows = [int(label) + 2 if isinstance(label, (int, np.integer)) else label for label in df.index[bad]]
+        raise ValueError(f"Sheet '{sheet}': tanggal kosong / tidak valid di baris {rows[:10]}{' ...' if len(rows) > 10 else ''}")
+    return _normalize(sheet, df)
+
+
+def _empty(sheet):
+    return _normalize(sheet, pd.DataFrame(columns=COLUMNS[sheet])).rename_axis("id")
+
+
+class EventStore:
+    '''
+        OPERASI BERSAMA SEMUA BACKEND; SUBCLASS MENGISI load / insert / update / delete / replace / replace_all / signature
+    '''
+
+    backend = None
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    @property
+    def key(self):
+        return (self.backend, self.path)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def last_modified(self):
+        '''
+            WAKTU PERUBAHAN TERAKHIR (datetime) ATAU None JIKA STORE BELUM ADA
+        '''
+        try:
+            return datetime.fromtimestamp(os.path.getmtime(self.path))
+        except OSError:
+            return None
+
+    def holidays(self, start=None, end=None):
+        '''
+            HARI LIBUR DENGAN start <= Date <= end (BATAS None = TERBUKA)
+        '''
+        df = self.load("Holidays")
+        if start is not None:
+            df = df[df["Date"] >= _as_date(start)]
+        if end is not None:
+            df = df[df["Date"] <= _as_date(end)]
+        return df
+
+    def periods(self, sheet, start=None, end=None):
+        '''
+            PERIODE Ramadan / Ujian YANG BERIRISAN DENGAN [start, end]
+        '''
+        df = self.load(sheet)
+        if start is not None:
+            df = df[df["End Date"] >= _as_date(start)]
+        if end is not None:
+            df = df[df["Start Date"] <= _as_date(end)]
+        return df
+
+    def version(self):
+        '''
+            HASH ISI SEMUA SHEET (BERUBAH HANYA JIKA DATA EVENT BERUBAH), DIPAKAI KALENDER & MANIFEST RUN
+        '''
+        digest = hashlib.sha1()
+        for sheet in SHEETS:
+            df = self.load(sheet)
+            rows = sorted(tuple(str(value) for value in row) for row in df.itertuples(index=False))
+            digest.update(repr((sheet, rows)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def import_excel(self, source):
+        '''
+            MENGGANTI SEMUA SHEET DENGAN ISI WORKBOOK source (PATH / FILE-LIKE / BYTES) BERLAYOUT events.xlsx.
+            SEMUA SHEET DIVALIDASI DULU (ValueError, STORE TIDAK BERUBAH), LALU DITULIS SEKALIGUS
+        '''
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        sheets = pd.read_excel(source, sheet_name=None)
+        missing = [sheet for sheet in SHEETS if sheet not in sheets]
+        if missing:
+            raise ValueError(f"Sheet {missing} tidak ada di file Excel")
+        sheets = {sheet: _validated(sheet, sheets[sheet]).drop_duplicates() for sheet in SHEETS}
+        self.replace_all(sheets)
+        return {sheet: len(df) for sheet, df in sheets.items()}
+
+    def export_excel(self, target=None):
+        '''
+            MENULIS SEMUA SHEET KE WORKBOOK BERLAYOUT events.xlsx; target None -> BYTES
+        '''
+        buffer = io.BytesIO() if target is None else target
+        with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+            for sheet in SHEETS:
+                df = self.load(sheet).reset_index(drop=True)
+                for col in df.columns:
+                    if "Date" in col:
+                        df[col] = pd.to_datetime(df[col]).dt.strftime("%Y-%m-%d")
+                df.to_excel(writer, sheet_name=sheet, index=False)
+        return buffer.getvalue() if target is None else target
+
+
+class ExcelEventStore(EventStore):
+    '''
+        BACKEND events.xlsx: id = POSISI BARIS DI SHEET; SETIAP PERUBAHAN MEMBACA & MENULIS ULANG SELURUH WORKBOOK
+    '''
+
+    backend = "excel"
+
+    def signature(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def version(self):
+        digest = hashlib.sha1()
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _read_all(self):
+        if not self.exists():
+            return {sheet: _empty(sheet) for sheet in SHEETS}
+        sheets = pd.read_excel(self.path, sheet_name=None)
+        return {sheet: _normalize(sheet, sheets.get(sheet, pd.DataFrame())).reset_index(drop=True).rename_axis("id") for sheet in SHEETS}
+
+    def _write_all(self, sheets):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            with pd.ExcelWriter(f, engine="xlsxwriter") as writer:
+                for sheet in SHEETS:
+                    df = sheets[sheet].reset_index(drop=True)
+                    for col in df.columns:
+                        if "Date" in col:
+                            df[col] = pd.to_datetime(df[col]).dt.strftime("%Y-%m-%d")
+                    df.to_excel(writer, sheet_name=sheet, index=False)
+        os.replace(tmp_path, self.path)
+
+    def load(self, sheet):
+        return self._read_all()[_check_sheet(sheet)]
+
+    def insert(self, sheet, rows):
+        sheets = self._read_all()
+        current = sheets[_check_sheet(sheet)]
+        new = _normalize(sheet, rows)
+        key_columns = COLUMNS[sheet]
+        new = new[~new.set_index(key_columns).index.isin(current.set_index(key_columns).index)].drop_duplicates()
+        sheets[sheet] = pd.concat([current, new], ignore_index=True).sort_values(key_columns[0], kind="stable")
+        self._write_all(sheets)
+        return len(new)
+
+    def update(self, sheet, row_id, values):
+        sheets = self._read_all()
+        df = sheets[_check_sheet(sheet)]
+        row = _normalize(sheet, [{**df.loc[row_id].to_dict(), **values}]).iloc[0]
+        df.loc[row_id, COLUMNS[sheet]] = row[COLUMNS[sheet]].tolist()
+        self._write_all(sheets)
+
+    def delete(self, sheet, ids):
+        sheets = self._read_all()
+        sheets[_check_sheet(sheet)] = sheets[sheet].drop(index=list(ids), errors="ignore")
+        self._write_all(sheets)
+
+    def replace(self, sheet, df):
+        sheets = self._read_all()
+        sheets[_check_sheet(sheet)] = _validated(sheet, df).drop_duplicates()
+        self._write_all(sheets)
+
+    def replace_all(self, sheets):
+        self._write_all({sheet: _validated(sheet, sheets[sheet]).drop_duplicates().reset_index(drop=True) for sheet in SHEETS})
+
+
+class SqliteEventStore(EventStore):
+    '''
+        BACKEND SQLITE: TANGGAL DISIMPAN 'YYYY-MM-DD' (URUTAN TEKS = URUTAN TANGGAL) DENGAN INDEKS,
+        BARIS DUPLIKAT (TANGGAL + NAMA / AWAL + AKHIR) DIABAIKAN; meta.revision NAIK DI SETIAP PERUBAHAN
+    '''
+
+    backend = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS holidays (
+            id INTEGER PRIMARY KEY,
+            date TEXT NOT NULL,
+            name TEXT NOT NULL DEFAULT '',
+            UNIQUE (date, name)
+        );
+        CREATE TABLE IF NOT EXISTS periods (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            UNIQUE (kind, start_date, end_date)
+        );
+        CREATE INDEX IF NOT EXISTS periods_kind_end ON periods (kind, end_date);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', '0');
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._ready:
+            conn.executescript(self.SCHEMA)
+            conn.commit()
+            self._ready = True
+        return conn
+
+    def _write(self, conn):
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'revision'")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('updated_at', ?)", (datetime.now().isoformat(timespec="seconds"),))
+
+    def signature(self):
+        if not self.exists():
+            return None
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+
+    def last_modified(self):
+        if not self.exists():
+            return None
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'updated_at'").fetchone()
+        return datetime.fromisoformat(row[0]) if row else super().last_modified()
+
+    def _query(self, sheet, where="", params=()):
+        if sheet == "Holidays":
+            query = f"SELECT id, date AS \"Date\", name AS \"Holiday Name\" FROM holidays {where} ORDER BY date, id"
+        else:
+            where = f"WHERE kind = ? {where.replace('WHERE', 'AND', 1)}"
+            query = f"SELECT id, start_date AS \"Start Date\", end_date AS \"End Date\" FROM periods {where} ORDER BY start_date, id"
+            params = (sheet, *params)
+        with closing(self._connect()) as conn:
+            df = pd.read_sql_query(query, conn, params=params, index_col="id")
+        return _normalize(sheet, df) if len(df) else _empty(sheet)
+
+    def load(self, sheet):
+        return self._query(_check_sheet(sheet))
+
+    def holidays(self, start=None, end=None):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(str(_as_date(start)))
+        if end is not None:
+            clauses.append("date <= ?")
+            params.append(str(_as_date(end)))
+        return self._query("Holidays", f"WHERE {' AND '.join(clauses)}" if clauses else "", params)
+
+    def periods(self, sheet, start=None, end=None):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("end_date >= ?")
+            params.append(str(_as_date(start)))
+        if end is not None:
+            clauses.append("start_date <= ?")
+            params.append(str(_as_date(end)))
+        return self._query(_check_sheet(sheet), f"WHERE {' AND '.join(clauses)}" if clauses else "", params)
+
+    @staticmethod
+    def _row(sheet, row):
+        if sheet == "Holidays":
+            return str(row["Date"]), row["Holiday Name"]
+        return sheet, str(row["Start Date"]), str(row["End Date"])
+
+    @staticmethod
+    def _insert_query(sheet):
+        if sheet == "Holidays":
+            return "INSERT OR IGNORE INTO holidays (date, name) VALUES (?, ?)"
+        return "INSERT OR IGNORE INTO periods (kind, start_date, end_date) VALUES (?, ?, ?)"
+
+    def insert(self, sheet, rows):
+        '''
+            O.S. JUMLAH BARIS BARU (DUPLIKAT TIDAK DIHITUNG)
+        '''
+        df = _normalize(_check_sheet(sheet), rows)
+        with closing(self._connect()) as conn, conn:
+            before = conn.total_changes
+            conn.executemany(self._insert_query(sheet), [self._row(sheet, row) for _, row in df.iterrows()])
+            inserted = conn.total_changes - before
+            if inserted:
+                self._write(conn)
+        return inserted
+
+    def update(self, sheet, row_id, values):
+        current = self.load(sheet)
+        row = _normalize(sheet, [{**current.loc[row_id].to_dict(), **values}]).iloc[0]
+        with closing(self._connect()) as conn, conn:
+            if sheet == "Holidays":
+                conn.execute("UPDATE holidays SET date = ?, name = ? WHERE id = ?", (*self._row(sheet, row), int(row_id)))
+            else:
+                conn.execute("UPDATE periods SET start_date = ?, end_date = ? WHERE id = ? AND kind = ?", (*self._row(sheet, row)[1:], int(row_id), sheet))
+            self._write(conn)
+
+    def delete(self, sheet, ids):
+        ids = [int(row_id) for row_id in ids]
+        if not ids:
+            return
+        with closing(self._connect()) as conn, conn:
+            if _check_sheet(sheet) == "Holidays":
+                conn.executemany("DELETE FROM holidays WHERE id = ?", [(row_id,) for row_id in ids])
+            else:
+                conn.executemany("DELETE FROM periods WHERE id = ? AND kind = ?", [(row_id, sheet) for row_id in ids])
+            self._write(conn)
+
+    def _replace_rows(self, conn, sheet, df):
+        if sheet == "Holidays":
+            conn.execute("DELETE FROM holidays")
+        else:
+            conn.execute("DELETE FROM periods WHERE kind = ?", (sheet,))
+        conn.executemany(self._insert_query(sheet), [self._row(sheet, row) for _, row in df.iterrows()])
+
+    def replace(self, sheet, df):
+        df = _validated(_check_sheet(sheet), df)
+        with closing(self._connect()) as conn, conn:
+            self._replace_rows(conn, sheet, df)
+            self._write(conn)
+
+    def replace_all(self, sheets):
+        '''
+            MENGGANTI SEMUA SHEET DALAM SATU TRANSAKSI (GAGAL = TIDAK ADA YANG BERUBAH)
+        '''
+        sheets = {sheet: _validated(sheet, sheets[sheet]) for sheet in SHEETS}
+        with closing(self._connect()) as conn, conn:
+            for sheet in SHEETS:
+                self._replace_rows(conn, sheet, sheets[sheet])
+            self._write(conn)
+
+
+def _migrate_excel(path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        counts = SqliteEventStore(tmp_path).import_excel(LEGACY_EXCEL_FILE)
+        os.replace(tmp_path, path)
+    except ValueError as e:
+        raise ValueError(f"Gagal memindahkan data event dari {LEGACY_EXCEL_FILE} ke {path}: {e}") from e
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    runtime.info(f"Data event diimpor dari {LEGACY_EXCEL_FILE} ke {path}", **counts)
+
+
+def open_store(path=None):
+    '''
+        STORE UNTUK path (DEFAULT EVENTS_STORE), SATU OBJEK PER FILE DALAM PROSES;
+        STORE DEFAULT SQLITE YANG BELUM ADA DIISI DARI events.xlsx JIKA WORKBOOK ITU ADA
+        (DIBANGUN DI FILE SEMENTARA LALU os.replace; WORKBOOK TIDAK VALID = ValueError, STORE TIDAK DIBUAT)
+    '''
+    migrate = path is None
+    path = path or EVENTS_STORE
+    cls = ExcelEventStore if path.lower().endswith((".xlsx", ".xls")) else SqliteEventStore
+    key = (cls.backend, os.path.abspath(path))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = cls(path)
+            if migrate and cls is SqliteEventStore and not store.exists() and os.path.exists(LEGACY_EXCEL_FILE):
+                _migrate_excel(path)
+            _stores[key] = store
+        return store
+
+
+def get_store():
+    return open_store()
+
+
+def configure(path):
+    '''
+        MENGGANTI STORE DEFAULT (MISAL --events-file DI BATCH CLI)
+    '''
+    global EVENTS_STORE
+    EVENTS_STORE = path
@@ -1,22 +1,23 @@
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
 import os
-import io
+import pandas as pd
 from datetime import datetime, timedelta
 import streamlit as st
+from . import app_cache
+from . import event_store
+from . import page_cache
 
-EVENTS_EXCEL_FILE = "events.xlsx"
-BASE_URL = "https://tanggalan.com/"
+# Bisa diarahkan ke server fixture lokal, misal EVENTS_SCRAPE_URL=http://127.0.0.1:8000/
+BASE_URL = os.environ.get("EVENTS_SCRAPE_URL", "https://tanggalan.com/")
+# Halaman tahun yang sudah lewat jarang berubah: dipakai dari cache disk tanpa request selama ini (detik)
+PAST_YEAR_MAX_AGE = float(os.environ.get("SCRAPE_PAST_YEAR_MAX_AGE", 7 * 24 * 3600))
 MONTHS = ["januari", "februari", "maret", "april", "mei", "juni", "juli", "agustus", "september", "oktober", "november", "desember"]
 
-def last_update_excel():
-    if os.path.exists(EVENTS_EXCEL_FILE):
-        last_modified_time = os.path.getmtime(EVENTS_EXCEL_FILE)
-        last_modified_dt = datetime.fromtimestamp(last_modified_time)
+def last_update():
+    last_modified_dt = event_store.get_store().last_modified()
+    if last_modified_dt is not None:
         st.markdown(f"**Terakhir diperbarui:** {last_modified_dt.strftime('%d %B %Y %H:%M:%S')}")
     else:
-        st.warning("File events.xlsx tidak ditemukan. File akan dibuat saat pertama kali dijalankan.")
+        st.warning(f"Data event ({event_store.EVENTS_STORE}) belum ada. Data akan dibuat saat pertama kali dijalankan.")
 
 
 def parse_holiday_range(range_str):
@@ -53,14 +54,42 @@ def clean_keterangan(desc):
     if "pilkada" in desc.lower(): return "Pilkada"
     return desc.strip()
     
+def _year_url(year):
+    return f"{BASE_URL}{year}"
+
+def _max_age(year):
+    return PAST_YEAR_MAX_AGE if year < datetime.now().year else 0
+
 def scrape_year(year):
     '''
-        SCRAPPING DARI WEBSITE BASE_URL
+        SCRAPPING DARI WEBSITE BASE_URL (LEWAT CACHE HALAMAN DI DISK)
     '''
+    content, _ = page_cache.fetch(_year_url(year), max_age=_max_age(year))
+    return parse_year(content, year)
 
-    url = f"{BASE_URL}{year}"
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, "html.parser")
+def scrape_years(start_year, end_year):
+    '''
+        SCRAPPING SEMUA TAHUN BERSAMAAN (1 SESSION KEEP-ALIVE, CACHE HALAMAN DI DISK),
+        TAHUN YANG GAGAL DIAMBIL DILEWATI DENGAN PERINGATAN
+    '''
+    years = list(range(start_year, end_year + 1))
+    url_years = {_year_url(year): year for year in years}
+    results, errors = page_cache.fetch_many(list(url_years), max_age=lambda url: _max_age(url_years[url]))
+    for url, error in errors.items():
+        st.warning(f"Gagal mengambil data tahun {url_years[url]}: {error}")
+    stale = [url_years[url] for url, (_, status) in results.items() if status == "stale"]
+    if stale:
+        st.warning(f"Server tidak dapat dihubungi, memakai salinan halaman sebelumnya untuk tahun {stale}")
+    return [item for year in years if _year_url(year) in results for item in parse_year(results[_year_url(year)][0], year)]
+
+def parse_year(content, year):
+    '''
+        HARI LIBUR DARI HALAMAN TAHUN year: [(TANGGAL, HARI, KETERANGAN), ...]
+    '''
+    # bs4 hanya dibutuhkan saat scrapping
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, "html.parser")
     results = []
     paskah_ada = False
     wafat_yesus_date = None
@@ -94,12 +123,13 @@ def scrape_year(year):
         results.append((easter_date.strftime('%Y-%m-%d'), easter_date.strftime('%A'), "Kebangkitan Yesus Kristus"))
     return results
 
-def create_events_excel_file(start_year,end_year):
+def create_events_store(start_year,end_year):
     '''
         buat event ramadan dan ujian(sebenernya buat kalau mau nambahin rentang liburan)
     '''
-    if os.path.exists(EVENTS_EXCEL_FILE): return
-    all_holiday_data = [item for year in range(start_year, end_year+1) for item in scrape_year(year)]
+    store = event_store.get_store()
+    if store.exists(): return
+    all_holiday_data = scrape_years(start_year, end_year)
     holidays_df = pd.DataFrame(all_holiday_data, columns=['Date', 'Weekday', 'Holiday Name'])
     holidays_df.drop(columns=['Weekday'], inplace=True)
     holidays_df.drop_duplicates(subset=['Date', 'Holiday Name'], keep='first', inplace=True)
@@ -130,10 +160,9 @@ def create_events_excel_file(start_year,end_year):
     ujian_df = pd.DataFrame(ujian_data, columns=['Start Date', 'End Date'])
     ujian_df['Start Date'] = pd.to_datetime(ujian_df['Start Date'])
     ujian_df['End Date'] = pd.to_datetime(ujian_df['End Date'])
-    with pd.ExcelWriter(EVENTS_EXCEL_FILE, engine='xlsxwriter') as writer:
-        holidays_df.to_excel(writer, sheet_name='Holidays', index=False)
-        ramadan_df.to_excel(writer, sheet_name='Ramadan', index=False)
-        ujian_df.to_excel(writer, sheet_name='Ujian', index=False)
+    store.replace('Holidays', holidays_df)
+    store.replace('Ramadan', ramadan_df)
+    store.replace('Ujian', ujian_df)
 
 def update_holidays_data(start_year,end_year):
     '''
@@ -141,7 +170,7 @@ def update_holidays_data(start_year,end_year):
     '''
         
     st.info(f"Mulai scraping hari libur dari tahun **{start_year}** hingga **{end_year}**...")
-    new_holiday_data = [item for year in range(start_year, end_year + 1) for item in scrape_year(year)]
+    new_holiday_data = scrape_years(start_year, end_year)
     if not new_holiday_data:
         st.warning("Tidak ada data baru yang ditemukan dari scraping.")
         return False
@@ -151,57 +180,49 @@ def update_holidays_data(start_year,end_year):
     st.write(new_holidays_df)
     new_holidays_df.drop_duplicates(subset=['Date', 'Holiday Name'], keep='first', inplace=True)
     new_holidays_df['Date'] = pd.to_datetime(new_holidays_df['Date'])
-    
+
+    # Hanya baris (Date, Holiday Name) yang belum ada yang ditambahkan
     try:
-        existing_df = pd.read_excel(EVENTS_EXCEL_FILE, sheet_name='Holidays')
-        existing_df['Date'] = pd.to_datetime(existing_df['Date'])
+        inserted = event_store.get_store().insert('Holidays', new_holidays_df)
     except Exception as e:
-        st.error(f"Gagal memuat sheet 'Holidays'. Error: {e}")
+        st.error(f"❌ Terjadi kesalahan saat menyimpan data: {e}")
         return False
-        
-    merged_df = pd.concat([existing_df, new_holidays_df], ignore_index=True)
-    final_df = merged_df.drop_duplicates(subset=['Date', 'Holiday Name'], keep='first')
-    final_df.sort_values(by='Date', inplace=True)
-    final_df.reset_index(drop=True, inplace=True)
+    st.success(f"✅ {inserted} hari libur baru ditambahkan.")
+    return True
 
-    return save_changes(final_df, sheet_name='Holidays', all_sheets=['Holidays', 'Ramadan', 'Ujian'])
-    
 
 
-# @st.cache_data
+@app_cache.cache_data("events")
 def load_data(sheet_name):
+    '''
+        DATA SATU SHEET DARI STORE EVENT, id BARIS DI INDEX (DIPAKAI save_changes)
+    '''
     try:
-        df = pd.read_excel(EVENTS_EXCEL_FILE, sheet_name=sheet_name)
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date']).dt.date
-        if 'Start Date' in df.columns and 'End Date' in df.columns:
-            df['Start Date'] = pd.to_datetime(df['Start Date']).dt.date
-            df['End Date'] = pd.to_datetime(df['End Date']).dt.date
-        return df
+        return event_store.get_store().load(sheet_name)
     except Exception as e:
         st.error(f"Gagal memuat data dari sheet '{sheet_name}'. Pastikan nama sheet benar. Error: {e}")
         return pd.DataFrame()
 
-def save_changes(df, sheet_name, all_sheets):
+def save_changes(sheet_name, df, changes):
+    '''
+        I.S. df = DATA YANG DITAMPILKAN DI st.data_editor, changes = STATE EDITOR
+             {"edited_rows": {POSISI: {KOLOM: NILAI}}, "added_rows": [...], "deleted_rows": [POSISI, ...]}
+        O.S. HANYA BARIS YANG DIUBAH / DITAMBAH / DIHAPUS YANG DITULIS KE STORE
+    '''
+    store = event_store.get_store()
+    ids = list(df.index)
     try:
-        excel_buffer = io.BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
-            for name in all_sheets:
-                if name == sheet_name:
-                    temp_df = df.copy()
-                    for col in temp_df.columns:
-                        if 'date' in col.lower() and pd.api.types.is_datetime64_any_dtype(temp_df[col]):
-                            temp_df[col] = temp_df[col].dt.strftime('%Y-%m-%d')
-                    temp_df.to_excel(writer, sheet_name=name, index=False)
-                else:
-                    other_df = pd.read_excel(EVENTS_EXCEL_FILE, sheet_name=name)
-                    other_df.to_excel(writer, sheet_name=name, index=False)
-        with open(EVENTS_EXCEL_FILE, 'wb') as f:
-            f.write(excel_buffer.getbuffer())
+        for position, values in changes.get("edited_rows", {}).items():
+            store.update(sheet_name, ids[int(position)], values)
+        store.delete(sheet_name, [ids[int(position)] for position in changes.get("deleted_rows", [])])
+        # Ditambahkan terakhir: di backend excel id = posisi baris, yang bergeser setelah insert
+        added = [row for row in changes.get("added_rows", []) if row]
+        if added:
+            store.insert(sheet_name, added)
         st.success("✅ Perubahan berhasil disimpan!")
         return True
     except Exception as e:
-        st.error(f"❌ Terjadi kesalahan saat menyimpan file: {e}")
+        st.error(f"❌ Terjadi kesalahan saat menyimpan data: {e}")
         return False
 
 def add_holiday_form(edited_df,new_date,new_description):
@@ -209,24 +230,41 @@ def add_holiday_form(edited_df,new_date,new_description):
         st.warning("Mohon isi semua field untuk menambahkan data.")
         return None
 
-    new_row = pd.DataFrame([{'Date': new_date, 'Holiday Name': new_description}])
-    updated_df = pd.concat([edited_df, new_row], ignore_index=True)
-    updated_df.sort_values(by='Date', inplace=True)
-    updated_df.reset_index(drop=True, inplace=True)
-    st.session_state['temp_df'] = updated_df
-    save_changes(updated_df, sheet_name='Holidays', all_sheets=['Holidays', 'Ramadan', 'Ujian'])
+    return _insert_row('Holidays', {'Date': new_date, 'Holiday Name': new_description})
 
+def _insert_row(sheet_name, row):
+    try:
+        store = event_store.get_store()
+        store.insert(sheet_name, [row])
+    except Exception as e:
+        st.error(f"❌ Terjadi kesalahan saat menyimpan data: {e}")
+        return None
+    updated_df = store.load(sheet_name)
+    st.session_state['temp_df'] = updated_df
+    st.success("✅ Perubahan berhasil disimpan!")
     return updated_df
 
 def validate_dates(start_date, end_date):
     return start_date and end_date and start_date <= end_date
 
 def add_period(edited_df, start_date, end_date,selected_sheet):
-    new_row = pd.DataFrame([{'Start Date': start_date, 'End Date': end_date}])
-    updated_df = pd.concat([edited_df, new_row], ignore_index=True)
-    updated_df.sort_values(by='Start Date', inplace=True)
-    updated_df.reset_index(drop=True, inplace=True)
-    st.session_state['temp_df'] = updated_df
-    save_changes(updated_df, selected_sheet, all_sheets=['Holidays', 'Ramadan', 'Ujian'])
+    return _insert_row(selected_sheet, {'Start Date': start_date, 'End Date': end_date})
 
-    return updated_df
+@app_cache.cache_data("events")
+def export_excel():
+    '''
+        ISI STORE EVENT SEBAGAI BYTES WORKBOOK BERLAYOUT events.xlsx (UNTUK DIUNDUH & DIEDIT MANUAL)
+    '''
+    return event_store.get_store().export_excel()
+
+def import_excel(uploaded_file):
+    '''
+        MENGGANTI SEMUA DATA EVENT DENGAN ISI WORKBOOK BERLAYOUT events.xlsx
+    '''
+    try:
+        counts = event_store.get_store().import_excel(uploaded_file)
+    except Exception as e:
+        st.error(f"❌ Gagal mengimpor file Excel: {e}")
+        return False
+    st.success("✅ Data event diimpor: " + ", ".join(f"{sheet} {count} baris" for sheet, count in counts.items()))
+    return True
@@ -0,0 +1,228 @@
+import os
+import re
+import json
+import datetime
+import pandas as pd
+
+'''
+    EXPORTER HASIL PREDIKSI BATCH, DIPANGGIL DARI SATU THREAD PENULIS:
+    - file            : SATU .xlsx PER KATEGORI (LAYOUT LAMA, METRIK DI NAMA FILE, MODE INTERVAL HANYA DI results_<run_id>.json)
+    - branch-workbook : SATU .xlsx PER BRANCH (SHEET PER KATEGORI + SHEET Info), xlsxwriter constant_memory
+    - parquet / csv   : SATU FILE UNTUK SELURUH RUN (KOLOM Branch, Kategori, ...)
+    write() MENGEMBALIKAN PATH OUTPUT RELATIF TERHADAP FOLDER BRANCH (DICATAT DI MANIFEST);
+    "#SHEET" MENUNJUK SHEET DI DALAM WORKBOOK
+'''
+
+EXPORTERS = ["file", "branch-workbook", "parquet", "csv"]
+EXPORTER_LABELS = {
+    "file": "Satu file Excel per kategori",
+    "branch-workbook": "Satu workbook Excel per branch",
+    "parquet": "Satu file Parquet per run",
+    "csv": "Satu file CSV per run",
+}
+EXPORTER_DEFAULT = "file"
+
+VALUE_COLUMNS = ['Prediksi', 'Batas Bawah', 'Batas Atas']
+
+
+def _metric_text(value):
+    return f"{value:.2f}" if value is not None else "N/A"
+
+
+class PerFileExporter:
+    def __init__(self, run_dir, run_id, interval_mode, interval_samples):
+        pass
+
+    def write(self, output_folder, branch, category, forecast_for_excel, r2, mape, rmse=None):
+        # Get prediction start dan end dates untuk nama file
+        pred_start_date = forecast_for_excel['Tanggal'].min().strftime("%Y%m%d")
+        pred_end_date = forecast_for_excel['Tanggal'].max().strftime("%Y%m%d")
+
+        # Handle R2 dan MAPE klo None
+        r2_str = _metric_text(r2)
+        mape_str = _metric_text(mape)
+
+        # Construct filename
+        filename = f"{category}_{pred_start_date}_{pred_end_date}_R2 = {r2_str}_MAPE = {mape_str}.xlsx"
+        file_path = os.path.join(output_folder, filename)
+
+        # Save to Excel (layout lama: satu sheet default; mode interval dicatat di results_<run_id>.json)
+        forecast_for_excel.to_excel(file_path, index=False)
+        return filename
+
+    def close_branch(self, output_folder):
+        pass
+
+    def close(self):
+        return []
+
+
+class BranchWorkbookExporter:
+    '''
+        WORKBOOK forecast_<run_id>.xlsx DI TIAP FOLDER BRANCH, DITUTUP SAAT SEMUA KATEGORI BRANCH SELESAI
+    '''
+
+    INFO_COLUMNS = ['Kategori', 'Sheet', 'R2', 'MAPE', 'RMSE', 'Mode Interval', 'Sampel Interval']
+
+    def __init__(self, run_dir, run_id, interval_mode, interval_samples):
+        self.run_id = run_id
+        self.interval_mode = interval_mode
+        self.interval_samples = interval_samples
+        self.workbooks = {}
+        self.written = []
+
+    def _open(self, output_folder):
+        import xlsxwriter
+        if output_folder not in self.workbooks:
+            filename = f"forecast_{self.run_id}.xlsx"
+            workbook = xlsxwriter.Workbook(os.path.join(output_folder, filename), {"constant_memory": True})
+            info = workbook.add_worksheet("Info")
+            bold = workbook.add_format({"bold": True})
+            info.write_row(0, 0, self.INFO_COLUMNS, bold)
+            self.workbooks[output_folder] = {
+                "filename": filename, "workbook": workbook, "info": info, "info_row": 1, "sheets": set(),
+                "date_format": workbook.add_format({"num_format": "yyyy-mm-dd"}), "bold": bold,
+            }
+        return self.workbooks[output_folder]
+
+    @staticmethod
+    def _sheet_name(category, used):
+        base = re.sub(r"[\[\]:*?/\\]", "_", str(category))[:31] or "Kategori"
+        name, i = base, 1
+        while name.lower() in used:
+            suffix = f"~{i}"
+            name, i = base[:31 - len(suffix)] + suffix, i + 1
+        used.add(name.lower())
+        return name
+
+    def write(self, output_folder, branch, category, forecast_for_excel, r2, mape, rmse=None):
+        book = self._open(output_folder)
+        sheet_name = self._sheet_name(category, book["sheets"])
+        sheet = book["workbook"].add_worksheet(sheet_name)
+        columns = list(forecast_for_excel.columns)
+        sheet.write_row(0, 0, columns, book["bold"])
+        sheet.set_column(0, 0, 12)
+        dates = forecast_for_excel['Tanggal'].dt.to_pydatetime()
+        values = forecast_for_excel[columns[1:]].to_numpy()
+        # constant_memory: baris harus ditulis berurutan
+        for row, (date, row_values) in enumerate(zip(dates, values), start=1):
+            sheet.write_datetime(row, 0, date, book["date_format"])
+            sheet.write_row(row, 1, row_values.tolist())
+        book["info"].write_row(book["info_row"], 0, [
+            str(category), sheet_name, _metric_text(r2), _metric_text(mape), _metric_text(rmse), self.interval_mode, self.interval_samples,
+        ])
+        book["info_row"] += 1
+        return f"{book['filename']}#{sheet_name}"
+
+    def close_branch(self, output_folder):
+        book = self.workbooks.pop(output_folder, None)
+        if book is not None:
+            book["workbook"].close()
+            self.written.append(os.path.join(output_folder, book["filename"]))
+
+    def close(self):
+        for output_folder in list(self.workbooks):
+            self.close_branch(output_folder)
+        return self.written
+
+
+class RunTableExporter:
+    '''
+        SATU TABEL UNTUK SELURUH RUN DI run_dir: forecast_<run_id>.parquet (ROW GROUP PER SERI) ATAU .csv
+    '''
+
+    def __init__(self, run_dir, run_id, interval_mode, interval_samples, fmt="parquet"):
+        self.fmt = fmt
+        self.path = os.path.join(run_dir, f"forecast_{run_id}.{fmt}")
+        self.columns = VALUE_COLUMNS if interval_samples else VALUE_COLUMNS[:1]
+        self._writer = None
+        self.rows = 0
+
+    def _frame(self, branch, category, forecast_for_excel):
+        frame = pd.DataFrame({
+            'Branch': str(branch),
+            'Kategori': str(category),
+            'Tanggal': forecast_for_excel['Tanggal'].to_numpy(),
+        })
+        for col in self.columns:
+            frame[col] = forecast_for_excel[col].to_numpy() if col in forecast_for_excel else None
+        return frame
+
+    def write(self, output_folder, branch, category, forecast_for_excel, r2, mape, rmse=None):
+        frame = self._frame(branch, category, forecast_for_excel)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            frame.to_csv(self.path, mode="a", header=self.rows == 0, index=False, date_format="%Y-%m-%d")
+        self.rows += len(frame)
+        return os.path.relpath(self.path, output_folder)
+
+    def close_branch(self, output_folder):
+        pass
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        return [self.path] if self.rows else []
+
+
+class CombinedExporter:
+    '''
+        EXPORTER UTAMA (OUTPUT DICATAT DI MANIFEST) + TUJUAN TAMBAHAN, MISAL forecast_sink.DatabaseSink
+    '''
+
+    def __init__(self, primary, *extra):
+        self.primary = primary
+        self.extra = extra
+
+    def write(self, output_folder, branch, category, forecast_for_excel, r2, mape, rmse=None):
+        output = self.primary.write(output_folder, branch, category, forecast_for_excel, r2, mape, rmse)
+        for target in self.extra:
+            target.write(output_folder, branch, category, forecast_for_excel, r2, mape, rmse)
+        return output
+
+    def close_branch(self, output_folder):
+        self.primary.close_branch(output_folder)
+        for target in self.extra:
+            target.close_branch(output_folder)
+
+    def close(self):
+        # Disimpan dulu agar daftar file tetap ada walau tujuan tambahan gagal ditutup
+        self.files = self.primary.close()
+        for target in self.extra:
+            self.files = self.files + target.close()
+        return self.files
+
+
+def create_exporter(kind, run_dir, run_id, interval_mode, interval_samples):
+    if kind == "file":
+        return PerFileExporter(run_dir, run_id, interval_mode, interval_samples)
+    if kind == "branch-workbook":
+        return BranchWorkbookExporter(run_dir, run_id, interval_mode, interval_samples)
+    if kind in ("parquet", "csv"):
+        return RunTableExporter(run_dir, run_id, interval_mode, interval_samples, fmt=kind)
+    raise ValueError(f"Exporter '{kind}' tidak dikenal, pilih salah satu dari {EXPORTERS}")
+
+
+def new_run_id():
+    return datetime.datetime.now().strftime("%Y%m%dT%H%M%S") + "-" + os.urandom(3).hex()
+
+
+def write_results_manifest(run_dir, run_id, metadata, series):
+    '''
+        results_<run_id>.json: METADATA RUN + SATU ENTRI PER SERI (branch, kategori, status, output, metrik)
+    '''
+    os.makedirs(run_dir, exist_ok=True)
+    path = os.path.join(run_dir, f"results_{run_id}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"run_id": run_id, **metadata, "series": series}, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,176 @@
+import io
+import os
+import re
+import csv
+from . import db_utils
+
+'''
+    MENULIS HASIL PREDIKSI BATCH KE TABEL DATABASE (UNTUK JOB REPLENISHMENT):
+    BARIS DIKUMPULKAN PER BRANCH LALU DIMUAT SEKALIGUS (SSMS: fast_executemany + MERGE, POSTGRES: COPY + ON CONFLICT)
+    DENGAN KUNCI UNIK (branch_id, category, ds, run_id) SEHINGGA RUN ULANG DENGAN run_id SAMA TIDAK MENGGANDAKAN BARIS
+'''
+
+FORECAST_TABLE = os.environ.get("FORECAST_SINK_TABLE", "forecast_penjualan")
+
+COLUMNS = ["run_id", "branch_id", "category", "ds", "yhat", "yhat_lower", "yhat_upper", "r2", "mape", "interval_mode"]
+KEY_COLUMNS = ["branch_id", "category", "ds", "run_id"]
+VALUE_COLUMNS = [col for col in COLUMNS if col not in KEY_COLUMNS]
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$")
+
+
+class SinkError(Exception):
+    '''
+        GAGAL MEMUAT BARIS KE DATABASE; series = [(output_folder, branch, category), ...] YANG TERDAMPAK
+    '''
+
+    def __init__(self, message, series):
+        super().__init__(message)
+        self.series = series
+
+
+def check_table(table):
+    if not _IDENTIFIER.match(table):
+        raise ValueError(f"Nama tabel sink tidak valid: '{table}'")
+    return table
+
+
+def _ssms_ddl(table):
+    return f"""
+        IF OBJECT_ID(N'{table}', N'U') IS NULL
+        CREATE TABLE {table} (
+            run_id VARCHAR(64) NOT NULL,
+            branch_id VARCHAR(50) NOT NULL,
+            category NVARCHAR(200) NOT NULL,
+            ds DATE NOT NULL,
+            yhat FLOAT NOT NULL,
+            yhat_lower FLOAT NULL,
+            yhat_upper FLOAT NULL,
+            r2 FLOAT NULL,
+            mape FLOAT NULL,
+            interval_mode VARCHAR(10) NULL,
+            created_at DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME(),
+            PRIMARY KEY (branch_id, category, ds, run_id)
+        );
+    """
+
+
+def _postgres_ddl(table):
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            run_id VARCHAR(64) NOT NULL,
+            branch_id VARCHAR(50) NOT NULL,
+            category TEXT NOT NULL,
+            ds DATE NOT NULL,
+            yhat DOUBLE PRECISION NOT NULL,
+            yhat_lower DOUBLE PRECISION NULL,
+            yhat_upper DOUBLE PRECISION NULL,
+            r2 DOUBLE PRECISION NULL,
+            mape DOUBLE PRECISION NULL,
+            interval_mode VARCHAR(10) NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (branch_id, category, ds, run_id)
+        );
+    """
+
+
+def upsert_ssms(db_name, table, rows):
+    '''
+        rows DIMUAT KE #forecast_stage DENGAN fast_executemany, LALU 1x MERGE KE TABEL TUJUAN
+    '''
+    columns = ", ".join(COLUMNS)
+    on = " AND ".join(f"t.{col} = s.{col}" for col in KEY_COLUMNS)
+    update = ", ".join(f"{col} = s.{col}" for col in VALUE_COLUMNS)
+    with db_utils.ssms_connection(db_name) as conn:
+        if not conn:
+            raise RuntimeError(f"Tidak ada koneksi ke database {db_name}")
+        cur = conn.cursor()
+        cur.execute(_ssms_ddl(table))
+        cur.execute(f"SELECT TOP 0 {columns} INTO #forecast_stage FROM {table};")
+        cur.fast_executemany = True
+        cur.executemany(f"INSERT INTO #forecast_stage ({columns}) VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+        cur.execute(f"""
+            MERGE {table} WITH (HOLDLOCK) AS t
+            USING #forecast_stage AS s ON {on}
+            WHEN MATCHED THEN UPDATE SET {update}, created_at = SYSUTCDATETIME()
+            WHEN NOT MATCHED THEN INSERT ({columns}) VALUES ({", ".join(f"s.{col}" for col in COLUMNS)});
+        """)
+        cur.execute("DROP TABLE #forecast_stage;")
+        conn.commit()
+
+
+def upsert_postgres(table, rows):
+    '''
+        rows DIMUAT KE TEMP TABLE DENGAN COPY FROM STDIN, LALU 1x INSERT ... ON CONFLICT KE TABEL TUJUAN
+    '''
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    columns = ", ".join(COLUMNS)
+    update = ", ".join(f"{col} = EXCLUDED.{col}" for col in VALUE_COLUMNS)
+    with db_utils.postgres_connection() as conn:
+        if not conn:
+            raise RuntimeError("Tidak ada koneksi ke PostgreSQL")
+        cur = conn.cursor()
+        cur.execute(_postgres_ddl(table))
+        cur.execute(f"CREATE TEMP TABLE forecast_stage ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA;")
+        cur.copy_expert(f"COPY forecast_stage ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cur.execute(f"""
+            INSERT INTO {table} ({columns})
+            SELECT {columns} FROM forecast_stage
+            ON CONFLICT ({", ".join(KEY_COLUMNS)}) DO UPDATE SET {update}, created_at = now();
+        """)
+        conn.commit()
+
+
+class DatabaseSink:
+    '''
+        DIPAKAI BERSAMA EXPORTER FILE DI THREAD PENULIS: write() HANYA MENGUMPULKAN BARIS,
+        close_branch() / close() MEMUAT BARIS SATU BRANCH SEKALIGUS
+    '''
+
+    def __init__(self, dbms, db_name, run_id, interval_mode, table=None):
+        self.dbms = dbms
+        self.db_name = db_name
+        self.run_id = run_id
+        self.interval_mode = interval_mode
+        self.table = check_table(table or FORECAST_TABLE)
+        self.pending = {}
+        self.rows_written = 0
+
+    def write(self, output_folder, branch, category, forecast_for_excel, r2, mape, rmse=None):
+        lower = forecast_for_excel['Batas Bawah'] if 'Batas Bawah' in forecast_for_excel else [None] * len(forecast_for_excel)
+        upper = forecast_for_excel['Batas Atas'] if 'Batas Atas' in forecast_for_excel else [None] * len(forecast_for_excel)
+        rows = [
+            (self.run_id, str(branch), str(category), ds.date(), float(yhat),
+             None if low is None else float(low), None if high is None else float(high),
+             None if r2 is None else float(r2), None if mape is None else float(mape), self.interval_mode)
+            for ds, yhat, low, high in zip(forecast_for_excel['Tanggal'], forecast_for_excel['Prediksi'], lower, upper)
+        ]
+        batch = self.pending.setdefault(output_folder, {"rows": [], "series": []})
+        batch["rows"].extend(rows)
+        batch["series"].append((output_folder, branch, category))
+
+    def close_branch(self, output_folder):
+        batch = self.pending.pop(output_folder, None)
+        if not batch or not batch["rows"]:
+            return
+        try:
+            if self.dbms == "SSMS":
+                upsert_ssms(self.db_name, self.table, batch["rows"])
+            else:
+                upsert_postgres(self.table, batch["rows"])
+        except Exception as e:
+            raise SinkError(f"Gagal menulis {len(batch['rows'])} baris prediksi ke tabel {self.table}: {e}", batch["series"])
+        self.rows_written += len(batch["rows"])
+
+    def close(self):
+        errors = []
+        for output_folder in list(self.pending):
+            try:
+                self.close_branch(output_folder)
+            except SinkError as e:
+                errors.append(e)
+        if errors:
+            raise SinkError("; ".join(str(e) for e in errors), [series for e in errors for series in e.series])
+        return []
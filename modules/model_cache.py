@@ -0,0 +1,134 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+'''
+    CACHE MODEL PROPHET YANG SUDAH DI-FIT (JSON DI DISK), DIKUNCI DENGAN HASH DATA LATIH + KONFIGURASI
+    JUMLAH ENTRI DIBATASI, ENTRI YANG PALING LAMA TIDAK DIPAKAI DIHAPUS DULUAN (LRU VIA mtime)
+'''
+
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", os.path.join(".cache", "models"))
+MODEL_CACHE_MAX_ENTRIES = int(os.environ.get("MODEL_CACHE_MAX_ENTRIES", 200))
+
+
+def _frame_digest(df):
+    if df is None or df.empty:
+        return "empty"
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha256(hashed.tobytes() + ",".join(map(str, df.columns)).encode("utf-8")).hexdigest()
+
+
+def model_key(train_df, holidays_df, regressors, settings):
+    '''
+        HASH DARI DATA LATIH, HOLIDAYS, REGRESSOR & PENGATURAN train_and_evaluate
+    '''
+    # prophet diimpor di dalam fungsi agar modul ini ringan dimuat
+    from prophet import __version__ as prophet_version
+    payload = json.dumps({
+        "train": _frame_digest(train_df),
+        "holidays": _frame_digest(holidays_df),
+        "regressors": list(regressors),
+        "settings": settings,
+        "prophet": prophet_version,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _path(key):
+    return os.path.join(MODEL_CACHE_DIR, f"{key}.json")
+
+
+def load(key):
+    '''
+        MODEL DARI CACHE ATAU None; mtime DIPERBARUI SEBAGAI PENANDA TERAKHIR DIPAKAI
+    '''
+    from prophet.serialize import model_from_json
+    path = _path(key)
+    try:
+        with open(path, encoding="utf-8") as f:
+            model = model_from_json(f.read())
+        os.utime(path)
+        return model
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save(key, model):
+    from prophet.serialize import model_to_json
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+    path = _path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(model_to_json(model))
+    os.replace(tmp_path, path)
+    _evict()
+
+
+def _evict():
+    try:
+        entries = [os.path.join(MODEL_CACHE_DIR, name) for name in os.listdir(MODEL_CACHE_DIR) if name.endswith(".json")]
+        entries.sort(key=os.path.getmtime)
+    except OSError:
+        return
+    for path in entries[:max(len(entries) - MODEL_CACHE_MAX_ENTRIES, 0)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def clear():
+    shutil.rmtree(MODEL_CACHE_DIR, ignore_errors=True)
+
+
+'''
+    PARAMETER TERAKHIR PER SERI (DATABASE, BRANCH, KATEGORI) UNTUK WARM START REFIT HARIAN
+'''
+
+WARM_PARAMS = ['k', 'm', 'sigma_obs', 'delta', 'beta']
+
+
+def series_key(*parts):
+    return hashlib.sha256(json.dumps([str(p) for p in parts]).encode("utf-8")).hexdigest()
+
+
+def _warm_path(key):
+    return os.path.join(MODEL_CACHE_DIR, "warm", f"{key}.json")
+
+
+def save_warm_params(key, model):
+    '''
+        MENYIMPAN k, m, sigma_obs, delta, beta DARI MODEL YANG BARU DI-FIT
+    '''
+    params = {
+        'k': float(model.params['k'][0][0]),
+        'm': float(model.params['m'][0][0]),
+        'sigma_obs': float(model.params['sigma_obs'][0][0]),
+        'delta': model.params['delta'][0].tolist(),
+        'beta': model.params['beta'][0].tolist(),
+    }
+    path = _warm_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+    os.replace(tmp_path, path)
+
+
+def load_warm_params(key):
+    '''
+        INIT STAN DARI FIT SEBELUMNYA UNTUK SERI YANG SAMA (None JIKA BELUM ADA)
+    '''
+    try:
+        with open(_warm_path(key), encoding="utf-8") as f:
+            params = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if any(name not in params for name in WARM_PARAMS):
+        return None
+    params['delta'] = np.asarray(params['delta'], dtype=float)
+    params['beta'] = np.asarray(params['beta'], dtype=float)
+    return params
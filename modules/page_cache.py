@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+'''
+    CACHE HALAMAN WEB DI DISK UNTUK SCRAPPING: BODY + ETag / Last-Modified PER URL,
+    DIVALIDASI ULANG DENGAN If-None-Match / If-Modified-Since (304 = PAKAI BODY DI DISK).
+    SATU requests.Session (KEEP-ALIVE, POOL KONEKSI SEUKURAN JUMLAH WORKER) DIPAKAI BERSAMA SEMUA THREAD
+'''
+
+CACHE_DIR = os.environ.get("PAGE_CACHE_DIR", os.path.join(".cache", "pages"))
+# Batas waktu koneksi & baca per request (detik)
+REQUEST_TIMEOUT = (float(os.environ.get("SCRAPE_CONNECT_TIMEOUT", 5)), float(os.environ.get("SCRAPE_READ_TIMEOUT", 20)))
+# Jumlah request bersamaan
+MAX_WORKERS = int(os.environ.get("SCRAPE_WORKERS", 6))
+USER_AGENT = "forecast-prophet-kp/1.0 (+events scraper)"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    '''
+        SESSION BERSAMA DENGAN RETRY UNTUK 429/5xx
+    '''
+    global _session
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            retry = Retry(total=2, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS, max_retries=retry)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+        return _session
+
+
+def _paths(url):
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{digest}.json"), os.path.join(CACHE_DIR, f"{digest}.body")
+
+
+def _read(url):
+    meta_path, body_path = _paths(url)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            return meta, f.read()
+    except (OSError, ValueError):
+        return None, None
+
+
+def _write(url, meta, body):
+    # Body ditulis dulu, meta terakhir: meta yang terbaca selalu punya body yang lengkap
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    meta_path, body_path = _paths(url)
+    for path, data, mode in ((body_path, body, "wb"), (meta_path, json.dumps(meta), "w")):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+def fetch(url, max_age=0, session=None):
+    '''
+        I.S. max_age = DETIK SETELAH DIAMBIL DI MANA BODY DI DISK DIPAKAI TANPA REQUEST
+        O.S. (BODY bytes, STATUS) DENGAN STATUS "cache" / "revalidated" / "downloaded" / "stale";
+             "stale" = SERVER GAGAL DIHUBUNGI, BODY LAMA DIPAKAI. MELEMPAR EXCEPTION JIKA TIDAK ADA SALINAN SAMA SEKALI
+    '''
+    import requests
+    meta, body = _read(url)
+    if meta is not None and time.time() - meta.get("fetched_at", 0) < max_age:
+        return body, "cache"
+    headers = {}
+    if meta is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    try:
+        response = (session or get_session()).get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304 and meta is not None:
+            meta["fetched_at"] = time.time()
+            _write(url, meta, body)
+            return body, "revalidated"
+        response.raise_for_status()
+    except requests.RequestException:
+        if meta is None:
+            raise
+        return body, "stale"
+    meta = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "fetched_at": time.time(),
+    }
+    _write(url, meta, response.content)
+    return response.content, "downloaded"
+
+
+def fetch_many(urls, max_age=None, workers=None):
+    '''
+        MENGAMBIL BANYAK URL BERSAMAAN LEWAT SESSION BERSAMA
+        I.S. max_age = FUNGSI url -> max_age (DEFAULT 0)
+        O.S. {url: (BODY, STATUS)} DAN {url: EXCEPTION} UNTUK URL YANG GAGAL
+    '''
+    session = get_session()
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers or MAX_WORKERS, len(urls) or 1))) as pool:
+        futures = {url: pool.submit(fetch, url, max_age(url) if max_age else 0, session) for url in urls}
+        for url, future in futures.items():
+            try:
+                results[url] = future.result()
+            except Exception as e:
+                errors[url] = e
+    return results, errors
+
+
+def clear():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
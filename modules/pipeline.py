@@ -0,0 +1,418 @@
+import os
+import time
+import queue
+import threading
+import collections
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from . import runtime
+from . import run_manifest
+from . import forecast_sink
+
+'''
+    BAGIAN PIPELINE BATCH: STATISTIK SIBUK / MENGANGGUR PER TAHAP (fetch -> fit -> write),
+    ANTREAN PREFETCH TERBATAS (fetch -> fit), THREAD PENULIS DENGAN ANTREAN TERBATAS
+    DAN PENJADWAL YANG MENGHUBUNGKAN KETIGA TAHAP (BatchScheduler)
+'''
+
+
+class StageStats:
+    '''
+        AKUMULASI WAKTU SIBUK PER TAHAP (AMAN DIPAKAI BANYAK THREAD)
+        WAKTU MENGANGGUR = JUMLAH WORKER x WAKTU TOTAL - WAKTU SIBUK
+    '''
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.workers = {}
+        self.busy_seconds = {}
+        self.items = {}
+        self._lock = threading.Lock()
+
+    def register(self, stage, workers):
+        with self._lock:
+            self.workers[stage] = workers
+            self.busy_seconds.setdefault(stage, 0.0)
+            self.items.setdefault(stage, 0)
+
+    def add(self, stage, seconds, items=1):
+        with self._lock:
+            self.busy_seconds[stage] = self.busy_seconds.get(stage, 0.0) + seconds
+            self.items[stage] = self.items.get(stage, 0) + items
+
+    @contextmanager
+    def busy(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def summary(self):
+        '''
+            O.S. {stage: {"workers", "items", "busy", "idle", "utilization"}} SEJAK OBJEK DIBUAT
+        '''
+        wall = time.perf_counter() - self.started
+        result = {}
+        with self._lock:
+            for stage, workers in self.workers.items():
+                busy = self.busy_seconds.get(stage, 0.0)
+                capacity = workers * wall
+                result[stage] = {
+                    "workers": workers,
+                    "items": self.items.get(stage, 0),
+                    "busy": round(busy, 2),
+                    "idle": round(max(capacity - busy, 0.0), 2),
+                    "utilization": round(busy / capacity, 3) if capacity else 0.0,
+                }
+        return result
+
+    def describe(self):
+        return "; ".join(
+            f"{stage}: sibuk {s['busy']:.1f} dtk, menganggur {s['idle']:.1f} dtk ({s['workers']} worker, {s['items']} item)"
+            for stage, s in self.summary().items()
+        )
+
+
+class BackgroundWriter:
+    '''
+        SATU THREAD PENULIS FILE; submit() MENUNGGU JIKA ANTREAN PENUH (BACKPRESSURE KE TAHAP FIT)
+    '''
+
+    _STOP = object()
+
+    def __init__(self, maxsize, stats=None, stage="write", initializer=None, initargs=()):
+        self.stats = stats
+        self.stage = stage
+        self._queue = queue.Queue(maxsize=max(int(maxsize), 1))
+        self._thread = threading.Thread(target=self._run, args=(initializer, initargs), name="batch-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self, initializer, initargs):
+        if initializer is not None:
+            initializer(*initargs)
+        while True:
+            job = self._queue.get()
+            if job is self._STOP:
+                return
+            future, fn, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            start = time.perf_counter()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                if self.stats is not None:
+                    self.stats.add(self.stage, time.perf_counter() - start)
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def close(self):
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class Prefetch:
+    '''
+        ANTREAN TERBATAS ANTARA SATU THREAD PRODUSEN DAN LOOP UTAMA BERBASIS FUTURE:
+        put() MENUNGGU SELAMA SUDAH ADA maxsize ITEM YANG BELUM DIAMBIL (BACKPRESSURE KE TAHAP fetch),
+        next() MENGEMBALIKAN Future ITEM BERIKUTNYA (Prefetch.END SETELAH finish()) SEHINGGA BISA DITUNGGU
+        BERSAMA FUTURE LAIN DENGAN concurrent.futures.wait. HANYA SATU next() YANG BOLEH MENUNGGU SEKALIGUS
+    '''
+
+    END = object()
+
+    def __init__(self, maxsize):
+        self.maxsize = max(int(maxsize), 1)
+        self._items = collections.deque()
+        self._waiter = None
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        '''
+            O.S. False JIKA PREFETCH SUDAH DITUTUP (PRODUSEN BERHENTI)
+        '''
+        with self._cond:
+            while len(self._items) >= self.maxsize and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return False
+            waiter, self._waiter = self._waiter, None
+            if waiter is None:
+                self._items.append(item)
+        if waiter is not None:
+            waiter.set_result(item)
+        return True
+
+    def finish(self):
+        # END tidak dihitung ke maxsize agar produsen tidak tertahan setelah item terakhir
+        with self._cond:
+            if self._closed:
+                return
+            waiter, self._waiter = self._waiter, None
+            if waiter is None:
+                self._items.append(self.END)
+        if waiter is not None:
+            waiter.set_result(self.END)
+
+    def next(self):
+        future = Future()
+        with self._cond:
+            if not self._items:
+                self._waiter = future
+                return future
+            item = self._items.popleft()
+            self._cond.notify_all()
+        future.set_result(item)
+        return future
+
+    def close(self):
+        '''
+            DIPANGGIL LOOP UTAMA SAAT BERHENTI: ITEM YANG TERSISA DIBUANG, put() YANG MENUNGGU DILEPAS
+        '''
+        with self._cond:
+            self._closed = True
+            self._items.clear()
+            self._cond.notify_all()
+
+
+def _series_entry(entry, output_folder, run_dir):
+    '''
+        ENTRI results_<run_id>.json UNTUK SATU SERI; PATH OUTPUT RELATIF KE FOLDER RUN
+    '''
+    output = entry.get("output")
+    if output:
+        output = os.path.relpath(os.path.join(output_folder, output), run_dir).replace(os.sep, "/")
+    result = {key: entry.get(key) for key in ["branch", "category", "status", "r2", "mape", "rmse", "message", "finished_at"]}
+    result["output"] = output
+    return result
+
+
+class BatchScheduler:
+    '''
+        PENJADWAL BATCH UNTUK WORK SET work = [(branch_id, branch_name, [kategori, ...]), ...]:
+        fetch: produce(prefetch, stats, branch_id, branch_name, [kategori, ...]) DIJALANKAN DI THREAD POOL (fetch_workers BRANCH
+               SEKALIGUS) DAN MENGIRIM ITEM ("empty" / "folder" / "skipped" / "unit" / "error") KE Prefetch MILIK BRANCH TERSEBUT
+        fit:   fit(prepared, kategori, series_key=...) DI executor, MAKS. 2 x fit_workers UNIT MENGANTRE
+        write: export.write / close_branch / close OLEH SATU BackgroundWriter
+        UNIT TIDAK DIAMBIL DARI ANTREAN PREFETCH SELAMA ANTREAN FIT MASIH PANJANG, DAN BRANCH BERIKUTNYA BARU DIAMBIL
+        SETELAH SALAH SATU BRANCH SELESAI. STATUS TIAP UNIT DICATAT DI MANIFEST FOLDER BRANCH DAN DI series
+    '''
+
+    def __init__(self, work, produce, fit, executor, export, config_hash, run_dir, fetch_workers=1, fit_workers=1, prefetch_units=2, shard=None):
+        self.work = work
+        self.produce = produce
+        self.fit = fit
+        self.executor = executor
+        self.export = export
+        self.config_hash = config_hash
+        self.run_dir = run_dir
+        self.fetch_workers = max(int(fetch_workers), 1)
+        self.fit_workers = max(int(fit_workers), 1)
+        self.parallel = self.fit_workers > 1
+        self.max_queued = 2 * self.fit_workers if self.parallel else 1
+        self.prefetch_units = prefetch_units
+        self.shard = shard
+        self.total_units = sum(len(categories) for _, _, categories in work)
+
+        self.stats = StageStats()
+        self.stats.register("fetch", self.fetch_workers)
+        self.stats.register("fit", self.fit_workers)
+        self.stats.register("write", 1)
+
+        self.counts = {"success": 0, "warning": 0, "error": 0, "skipped": 0}
+        # Unit yang sudah diambil dari antrean prefetch; counts baru bertambah setelah unit selesai ditulis
+        self.dispatched = 0
+        self.series = []
+        self.files = []
+        self._series_index = {}
+        # Folder branch -> jumlah unit yang belum selesai (+1 selama item branch masih datang)
+        self._remaining = {}
+        self._pending = iter(work)
+        self._branches = []
+        self._parked = []
+        self._fetching = {}
+        self._fitting = {}
+        self._writing = {}
+        self._fetcher = None
+        self._writer = None
+        self.progress_bar = runtime.progress_bar()
+        self.status_text = runtime.status_text()
+
+    def run(self):
+        '''
+            O.S. counts {"success", "warning", "error", "skipped"}; series DAN files (FILE OUTPUT exporter) TERISI
+        '''
+        if self.parallel:
+            self.status_text.text(f"Memproses {self.total_units} unit (branch x kategori) dengan {self.fit_workers} worker...")
+        self._fetcher = ThreadPoolExecutor(max_workers=self.fetch_workers, initializer=runtime.attach_thread_context, initargs=(runtime.thread_context(),))
+        self._writer = BackgroundWriter(max(2 * self.fit_workers, 4), self.stats)
+        with self._fetcher, self.executor, self._writer:
+            try:
+                self._top_up()
+                while self._fetching or self._fitting or self._writing:
+                    done, _ = wait(list(self._fetching) + list(self._fitting) + list(self._writing), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in self._fetching:
+                            self._fetched(self._fetching.pop(future), future.result())
+                        elif future in self._fitting:
+                            self._fitted(future, self._fitting.pop(future))
+                        else:
+                            self._written(future, *self._writing.pop(future))
+                    self._top_up()
+            finally:
+                # Thread fetch yang masih menunggu tempat di antrean dilepas sebelum thread pool ditutup
+                for branch in self._branches:
+                    branch["prefetch"].close()
+            try:
+                self.files = self._writer.submit(self.export.close).result()
+            except forecast_sink.SinkError as e:
+                self._sink_failed(e)
+                self.files = self.export.files
+        self.status_text.empty()
+        return self.counts
+
+    def _advance(self, text):
+        done = sum(self.counts.values())
+        self.status_text.text(f"{text} ({done}/{self.total_units})")
+        self.progress_bar.progress(min(done / self.total_units, 1.0) if self.total_units else 1.0)
+
+    def _unit_done(self, output_folder):
+        # Workbook / batch database per branch ditutup setelah unit terakhir branch tersebut selesai
+        self._remaining[output_folder] -= 1
+        if not self._remaining[output_folder]:
+            self._writing[self._writer.submit(self.export.close_branch, output_folder)] = (None, output_folder)
+
+    def _finish(self, unit, status, message, details):
+        getattr(runtime, status)(message, branch=unit["branch"], category=unit["category"], status=status)
+        entry = run_manifest.record(unit["output_folder"], unit["branch"], unit["category"], unit["fingerprint"], self.config_hash, status,
+                                    message=message, shard=self.shard, **details)
+        self._series_index[(unit["branch"], unit["category"])] = len(self.series)
+        self.series.append(_series_entry(entry, unit["output_folder"], self.run_dir))
+        self.counts[status] += 1
+        self._advance(f"Selesai kategori: {unit['category']}")
+        self._unit_done(unit["output_folder"])
+
+    def _sink_failed(self, error):
+        # Seri yang sudah dicatat sukses ditandai gagal lagi di manifest supaya dihitung ulang saat run diulang
+        runtime.error(f"❌ {error}", status="error")
+        for output_folder, branch, category in error.series:
+            run_manifest.record(output_folder, branch, category, None, self.config_hash, "error", message=str(error), shard=self.shard)
+            index = self._series_index.get((branch, category))
+            if index is not None and self.series[index]["status"] == "success":
+                self.series[index].update(status="error", message=str(error))
+                self.counts["success"] -= 1
+                self.counts["error"] += 1
+
+    def _fitted(self, future, unit):
+        try:
+            status, message, result, seconds = future.result()
+        except Exception as e:
+            status, message, result, seconds = "error", f"❌ Error saat memproses kategori '{unit['category']}': {e}", None, 0.0
+        self.stats.add("fit", seconds)
+        if status != "success":
+            self._finish(unit, status, message, {})
+            return
+        write_future = self._writer.submit(self.export.write, unit["output_folder"], unit["branch"], unit["category"],
+                                           result["forecast"], result["r2"], result["mape"], result["rmse"])
+        self._writing[write_future] = (unit, result)
+
+    def _written(self, future, unit, result):
+        if unit is None:
+            # Penutupan output satu branch (close_branch)
+            try:
+                future.result()
+            except forecast_sink.SinkError as e:
+                self._sink_failed(e)
+            except Exception as e:
+                runtime.error(f"❌ Error saat menutup output branch: {e}", status="error")
+            return
+        try:
+            filename = future.result()
+        except Exception as e:
+            self._finish(unit, "error", f"❌ Error saat menyimpan kategori '{unit['category']}': {e}", {})
+            return
+        self._finish(unit, "success", f"✅ Berhasil menyimpan '{filename}'{result['fit_summary']}",
+                     {"output": filename, "r2": result["r2"], "mape": result["mape"], "rmse": result["rmse"]})
+
+    def _request(self, branch):
+        # Unit berikutnya baru diambil jika antrean fit masih ada tempat; selama itu thread fetch terus menyiapkan
+        # sampai prefetch_units unit
+        if len(self._fitting) < self.max_queued:
+            self._fetching[branch["prefetch"].next()] = branch
+        else:
+            self._parked.append(branch)
+
+    def _top_up(self):
+        while self._parked and len(self._fitting) < self.max_queued:
+            self._request(self._parked.pop(0))
+        while len(self._branches) < self.fetch_workers and len(self._fitting) < self.max_queued:
+            item = next(self._pending, None)
+            if item is None:
+                return
+            branchid, branch_name, branch_categories = item
+            prefetch = Prefetch(self.prefetch_units)
+            self._fetcher.submit(self.produce, prefetch, self.stats, branchid, branch_name, branch_categories)
+            branch = {"branch": branchid, "categories": len(branch_categories), "prefetch": prefetch, "output_folder": None, "emitted": 0, "skipped": 0}
+            self._branches.append(branch)
+            self._request(branch)
+
+    def _fetched(self, branch, item):
+        branchid, output_folder = branch["branch"], branch["output_folder"]
+        if item is Prefetch.END:
+            self._branches.remove(branch)
+            if branch["skipped"]:
+                runtime.info(f"{branch['skipped']} kategori sudah selesai di run sebelumnya dan dilewati.", branch=branchid, skipped=branch["skipped"])
+            if output_folder is not None:
+                # Melepas penanda "masih ada unit yang akan datang" dari item folder
+                self._unit_done(output_folder)
+            return
+        kind, value = item
+        if kind == "error":
+            self.dispatched += branch["categories"] - branch["emitted"]
+            self.counts["error"] += branch["categories"] - branch["emitted"]
+            runtime.error(f"❌ Error saat mengambil data branch '{branchid}': {value}", branch=branchid, status="error")
+        elif kind == "empty":
+            self.dispatched += branch["categories"]
+            self.counts["warning"] += branch["categories"]
+            runtime.warning(f"Tidak ada data penjualan untuk branch '{branchid}'. Melanjutkan ke branch berikutnya.", branch=branchid, status="warning")
+            self._advance(f"Branch {branchid} dilewati")
+        elif kind == "folder":
+            branch["output_folder"] = value
+            self._remaining[value] = self._remaining.get(value, 0) + 1
+            runtime.write(f"Menyimpan file ke folder: `{value}`")
+        elif kind == "skipped":
+            branch["emitted"] += 1
+            branch["skipped"] += 1
+            self.dispatched += 1
+            self.counts["skipped"] += 1
+            self.series.append(dict(_series_entry(value, output_folder, self.run_dir), status="skipped"))
+        else:
+            unit = value
+            branch["emitted"] += 1
+            self.dispatched += 1
+            self._remaining[output_folder] += 1
+            if unit["warning"]:
+                self._finish(unit, "warning", unit["warning"], {})
+            else:
+                if not self.parallel:
+                    self.status_text.text(f"Memproses kategori: {unit['category']} ({self.dispatched}/{self.total_units})")
+                fit_future = self.executor.submit(self.fit, unit.pop("prepared"), unit["category"], series_key=unit["series_key"])
+                if self.parallel:
+                    self._fitting[fit_future] = unit
+                else:
+                    self._fitted(fit_future, unit)
+        self._request(branch)
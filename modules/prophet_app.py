@@ -1,8 +1,35 @@
 import streamlit as st
 import pandas as pd
+import os
 from datetime import datetime
 from . import db_utils
 from . import prophet_model
+from . import sales_cache
+from . import model_cache
+from . import exporters
+from . import forecast_sink
+from . import app_cache
+
+def show_model_source(model):
+    if getattr(model, "from_cache", False):
+        st.caption("♻️ Model diambil dari cache (data latih & konfigurasi tidak berubah, fit dilewati).")
+    else:
+        st.caption("🆕 Model baru dilatih dan disimpan ke cache.")
+
+def batch_branch_scope(branch_list):
+    '''
+        CAKUPAN PREDIKSI BATCH: None = BRANCH TERPILIH, SELAIN ITU [(BRANCH_ID, BRANCH_NAME), ...]
+    '''
+    options = ["Branch Terpilih"] + (["Semua Branch", "Pilih Beberapa Branch"] if branch_list else [])
+    scope = st.radio("Cakupan Batch", options, horizontal=True)
+    if scope == "Branch Terpilih":
+        return None
+    branches = [(item[0], item[-1]) for item in branch_list]
+    if scope == "Pilih Beberapa Branch":
+        chosen = st.multiselect("Pilih Branch", range(len(branches)), format_func=lambda i: " | ".join(dict.fromkeys(branches[i])))
+        branches = [branches[i] for i in chosen]
+    st.caption(f"{len(branches)} branch akan diproses.")
+    return branches
 
 def run():
     option_map = ["SSMS","POSTGRES"]
@@ -14,6 +41,15 @@ def run():
         default="SSMS"
     )
     st.title("Aplikasi Prediksi Penjualan dengan Prophet")
+
+    if st.sidebar.button("Hapus Cache Data Penjualan"):
+        sales_cache.invalidate()
+        app_cache.invalidate("categories", "sales")
+        st.sidebar.success("Cache data penjualan dihapus.")
+    if st.sidebar.button("Hapus Cache Model"):
+        model_cache.clear()
+        app_cache.invalidate("models")
+        st.sidebar.success("Cache model dihapus.")
     
     # UI elements for user inputs
     if selection == "SSMS":
@@ -53,8 +89,9 @@ def run():
             end_date = st.date_input("Tanggal Akhir Data Aktual:", pd.to_datetime("2025-07-31"))
         start_date_str = start_date.strftime("%Y-%m-%d")
         end_date_str = end_date.strftime("%Y-%m-%d")
+        app_cache.track_date_range(start_date_str, end_date_str)
 
-        kategori_options = db_utils.get_unique_categories_ssms(DB_NAME, start_date_str, end_date_str)
+        kategori_options = db_utils.get_unique_categories_ssms(DB_NAME, start_date_str, end_date_str, branch_option)
         if kategori_options:
             try:
                 default_index = kategori_options.index('CIGARETTE')
@@ -92,13 +129,25 @@ def run():
                         # Tidak perlu 'return' jika ingin melanjutkan kode di bawah
                         pass
                     else:
+                        show_model_source(model)
                         forecast_display_table = prophet_model.predict_table(model, periods_to_forecast, all_holiday_dates_set, all_ramadan_dates, all_ujian_dates, pisah_tanggal, verbose)
                         prophet_model.display_charts(test_df, forecast_display_table)
 
         st.write("---")
         st.header("Prediksi Batch untuk Semua Kategori")
+        n_workers = st.number_input("Jumlah Worker Paralel", min_value=1, max_value=os.cpu_count() or 1, value=prophet_model.BATCH_WORKERS_DEFAULT)
+        warm_start = st.toggle("Warm start dari parameter fit sebelumnya (refit harian)")
+        interval_mode = st.selectbox("Mode Interval Prediksi", list(prophet_model.INTERVAL_MODES), format_func=prophet_model.INTERVAL_MODE_LABELS.get)
+        force = st.checkbox("Hitung ulang semua kategori (abaikan hasil run sebelumnya)")
+        exporter = st.selectbox("Format Ekspor", exporters.EXPORTERS, format_func=exporters.EXPORTER_LABELS.get)
+        sink_table = st.text_input("Tabel Database untuk Hasil Prediksi", forecast_sink.FORECAST_TABLE) if st.toggle("Tulis juga hasil prediksi ke tabel database") else None
+        batch_branches = batch_branch_scope(raw_branch_list)
+        db_concurrency = st.number_input("Maks. Query Database Bersamaan", min_value=1, max_value=16, value=db_utils.DB_QUERY_CONCURRENCY)
         if st.button("Mulai Prediksi Batch (Export ke Excel)"):
-            prophet_model.batch_predict_and_export_all_categories(DB_NAME, branch_option, branch_name, kategori_input, start_date_str, end_date_str, periods_to_forecast, pisah_tanggal, selection)
+            if batch_branches is None:
+                prophet_model.batch_predict_and_export_all_categories(DB_NAME, branch_option, branch_name, kategori_input, start_date_str, end_date_str, periods_to_forecast, pisah_tanggal, selection, n_workers=n_workers, warm_start=warm_start, interval_mode=interval_mode, force=force, db_concurrency=db_concurrency, exporter=exporter, sink_table=sink_table)
+            else:
+                prophet_model.batch_predict_all_branches(DB_NAME, batch_branches, start_date_str, end_date_str, periods_to_forecast, pisah_tanggal, selection, n_workers=n_workers, warm_start=warm_start, interval_mode=interval_mode, force=force, db_concurrency=db_concurrency, exporter=exporter, sink_table=sink_table)
             
 
     elif selection == "POSTGRES":
@@ -137,8 +186,9 @@ def run():
             end_date = st.date_input("Tanggal Akhir Data Aktual:", pd.to_datetime("2025-07-31"))
         start_date_str = start_date.strftime("%Y-%m-%d")
         end_date_str = end_date.strftime("%Y-%m-%d")
+        app_cache.track_date_range(start_date_str, end_date_str)
 
-        kategori_options = db_utils.get_unique_categories_postgres(start_date_str, end_date_str)
+        kategori_options = db_utils.get_unique_categories_postgres(start_date_str, end_date_str, branch_option)
         if kategori_options:
             try:
                 default_index = kategori_options.index('CIGARETTE')
@@ -172,14 +222,26 @@ def run():
 
             model, test_df, _, _, _ = prophet_model.train_and_evaluate(prophet_df, holidays_df, pisah_tanggal,verbose)
             if model is None: return
+            show_model_source(model)
 
             forecast_display_table = prophet_model.predict_table(model, periods_to_forecast, all_holiday_dates_set, all_ramadan_dates, all_ujian_dates, pisah_tanggal,verbose)
             prophet_model.display_charts(test_df, forecast_display_table)
 
         st.write("---")
         st.header("Prediksi Batch untuk Semua Kategori")
+        n_workers = st.number_input("Jumlah Worker Paralel", min_value=1, max_value=os.cpu_count() or 1, value=prophet_model.BATCH_WORKERS_DEFAULT)
+        warm_start = st.toggle("Warm start dari parameter fit sebelumnya (refit harian)")
+        interval_mode = st.selectbox("Mode Interval Prediksi", list(prophet_model.INTERVAL_MODES), format_func=prophet_model.INTERVAL_MODE_LABELS.get)
+        force = st.checkbox("Hitung ulang semua kategori (abaikan hasil run sebelumnya)")
+        exporter = st.selectbox("Format Ekspor", exporters.EXPORTERS, format_func=exporters.EXPORTER_LABELS.get)
+        sink_table = st.text_input("Tabel Database untuk Hasil Prediksi", forecast_sink.FORECAST_TABLE) if st.toggle("Tulis juga hasil prediksi ke tabel database") else None
+        batch_branches = batch_branch_scope(branch_list)
+        db_concurrency = st.number_input("Maks. Query Database Bersamaan", min_value=1, max_value=16, value=db_utils.DB_QUERY_CONCURRENCY)
         if st.button("Mulai Prediksi Batch (Export ke Excel)"):
-            # Panggilan fungsi tanpa parameter DB_NAME, menambahkan branch_name
-            prophet_model.batch_predict_and_export_all_categories(DB_NAME, branch_option, branch_name, kategori_input, start_date_str, end_date_str, periods_to_forecast, pisah_tanggal, selection)
+            if batch_branches is None:
+                # Panggilan fungsi tanpa parameter DB_NAME, menambahkan branch_name
+                prophet_model.batch_predict_and_export_all_categories(DB_NAME, branch_option, branch_name, kategori_input, start_date_str, end_date_str, periods_to_forecast, pisah_tanggal, selection, n_workers=n_workers, warm_start=warm_start, interval_mode=interval_mode, force=force, db_concurrency=db_concurrency, exporter=exporter, sink_table=sink_table)
+            else:
+                prophet_model.batch_predict_all_branches(DB_NAME, batch_branches, start_date_str, end_date_str, periods_to_forecast, pisah_tanggal, selection, n_workers=n_workers, warm_start=warm_start, interval_mode=interval_mode, force=force, db_concurrency=db_concurrency, exporter=exporter, sink_table=sink_table)
     else:
         st.warning("Harap pilih salah satu pillbox di sidebar")
\ No newline at end of file
@@ -1,99 +1,168 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from prophet import Prophet
-from sklearn.metrics import mean_squared_error, r2_score
 from math import sqrt
 import warnings
 # from modules import EVENTS_EXCEL_FILE
-from . import event_utils
+from . import runtime
+from . import event_calendar
 from . import db_utils
+from . import model_cache
+from . import run_manifest
+from . import sharding
+from . import pipeline
+from . import exporters
+from . import forecast_sink
+from . import query_stats
+from . import app_cache
 import os
+import time
+import datetime
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
 
 warnings.filterwarnings("ignore")
-# @st.cache_data
-def prepare_events_prophet(file):
-    '''I.S. AMBIL EVENT DARI FILE (EXCEL)
-        O.S DATAFRAME EVENT DENGAN LOWER & UPPER WINDOW
+
+# Jumlah proses paralel default untuk prediksi batch (1 = berurutan seperti semula)
+BATCH_WORKERS_DEFAULT = 1
+# Jumlah unit (kategori) siap fit yang boleh disiapkan lebih dulu per branch selagi kategori sebelumnya di-fit
+BATCH_PREFETCH_UNITS = int(os.environ.get("BATCH_PREFETCH_UNITS", 2))
+# Batas thread Stan/BLAS per proses agar core tidak oversubscribed
+STAN_THREADS_PER_WORKER = 1
+# Konfigurasi model (ikut menentukan kunci cache model)
+PROPHET_SETTINGS = dict(yearly_seasonality=True, weekly_seasonality=True, daily_seasonality=False)
+REGRESSORS = ['IsRamadan', 'IsUjian', 'day_of_week', 'month', 'year', 'weekend', 'libur']
+# Mode interval ketidakpastian -> jumlah sampel predict (0 = tanpa interval, hanya yhat)
+INTERVAL_MODES = {"full": 1000, "reduced": 100, "none": 0}
+INTERVAL_MODE_LABELS = {"full": "Penuh (1000 sampel)", "reduced": "Dikurangi (100 sampel)", "none": "Tanpa interval (hanya prediksi)"}
+INTERVAL_MODE_DEFAULT = "full"
+
+def prepare_events_prophet(store=None):
+    '''I.S. AMBIL EVENT DARI STORE EVENT (DEFAULT event_store.get_store()), LEWAT KALENDER TERKOMPILASI (DIBACA ULANG HANYA JIKA DATA BERUBAH)
+        O.S DATAFRAME EVENT DENGAN LOWER & UPPER WINDOW + ARRAY TANGGAL HOLIDAY, RAMADAN, UJIAN (datetime64[D])
     '''
-    try:
-        holidays_df = pd.read_excel(file, sheet_name='Holidays')
-        holidays_df = holidays_df.rename(columns={"Date": "ds", "Holiday Name": "holiday"})
-        holidays_df["ds"] = pd.to_datetime(holidays_df["ds"])
-        all_holiday_dates_set = set(holidays_df['ds'].dt.date)
-    except Exception as e:
-        st.error(f"Gagal memuat sheet 'Holidays': {e}")
-        holidays_df = pd.DataFrame(columns=["ds", "holiday"])
-        all_holiday_dates_set = set()
-    all_ramadan_dates = set()
-    try:
-        ramadan_df = pd.read_excel(file, sheet_name='Ramadan')
-        ramadan_df['Start Date'] = pd.to_datetime(ramadan_df['Start Date'])
-        ramadan_df['End Date'] = pd.to_datetime(ramadan_df['End Date'])
-        for _, row in ramadan_df.iterrows():
-            if pd.notna(row['Start Date']) and pd.notna(row['End Date']):
-                current_ramadan_range = pd.date_range(start=row['Start Date'], end=row['End Date'], freq='D')
-                all_ramadan_dates.update(d.date() for d in current_ramadan_range)
-    except Exception as e: st.error(f"Gagal memuat sheet 'Ramadan': {e}")
-    all_ujian_dates = set()
-    try:
-        ujian_df = pd.read_excel(file, sheet_name='Ujian')
-        ujian_df['Start Date'] = pd.to_datetime(ujian_df['Start Date'])
-        ujian_df['End Date'] = pd.to_datetime(ujian_df['End Date'])
-        for _, row in ujian_df.iterrows():
-            if pd.notna(row['Start Date']) and pd.notna(row['End Date']):
-                current_ujian_range = pd.date_range(start=row['Start Date'], end=row['End Date'], freq='D')
-                all_ujian_dates.update(d.date() for d in current_ujian_range)
-    except Exception as e: st.error(f"Gagal memuat sheet 'Ujian': {e}")
-    holidays_df['lower_window'] = 0
-    holidays_df['upper_window'] = 0
-
-    return holidays_df, all_holiday_dates_set, all_ramadan_dates, all_ujian_dates
+    calendar = event_calendar.get_event_calendar(store)
+    return calendar.holidays_df.copy(), calendar.holiday_dates, calendar.ramadan_dates, calendar.ujian_dates
+
+def _day_array(dates):
+    '''
+        SET / LIST TANGGAL -> ARRAY numpy datetime64[D] TERURUT (UNTUK np.isin)
+    '''
+    if isinstance(dates, np.ndarray) and dates.dtype == 'datetime64[D]':
+        return dates
+    return np.array(sorted(dates), dtype='datetime64[D]')
+
+def build_features(ds, all_holiday_dates_set, all_ramadan_dates, all_ujian_dates):
+    '''
+    I.S. TANGGAL (DatetimeIndex / KOLOM ds) & TANGGAL EVENT
+    O.S. DATAFRAME FITUR KALENDER (VEKTORISASI, DIPAKAI prepare_data & predict_table)
+    '''
+    ds = pd.DatetimeIndex(ds)
+    days = ds.values.astype('datetime64[D]')
+    features = pd.DataFrame({
+        'IsHoliday': np.isin(days, _day_array(all_holiday_dates_set)).astype(int),
+        'IsRamadan': np.isin(days, _day_array(all_ramadan_dates)).astype(int),
+        'IsUjian': np.isin(days, _day_array(all_ujian_dates)).astype(int),
+        'day_of_week': ds.dayofweek,
+        'month': ds.month,
+        'year': ds.year,
+    })
+    features['weekend'] = (features['day_of_week'] >= 5).astype(int)
+    features['libur'] = features['IsHoliday'] | features['weekend']
+    return features
+
+def round_forecast(values, clip_zero=False):
+    '''
+        PEMBULATAN HASIL PREDIKSI KE BILANGAN BULAT (NaN TETAP NaN), OPSIONAL DIBATASI >= 0
+    '''
+    rounded = np.round(np.asarray(values, dtype=float))
+    if clip_zero:
+        rounded = np.where(np.isnan(rounded), rounded, np.maximum(rounded, 0))
+    if np.isnan(rounded).any():
+        return rounded
+    return rounded.astype(np.int64)
 
 # @st.cache_data
 def prepare_data(df):
     '''
     FEATURE ENGINEERING UNTUK MODEL PROPHET
     '''
-    holidays_df, all_holiday_dates_set, all_ramadan_dates, all_ujian_dates = prepare_events_prophet(event_utils.EVENTS_EXCEL_FILE)
-    df['IsHoliday'] = df.index.map(lambda x: 1 if x.date() in all_holiday_dates_set else 0)
-    df['IsRamadan'] = df.index.map(lambda x: 1 if x.date() in all_ramadan_dates else 0)
-    df['IsUjian'] = df.index.map(lambda x: 1 if x.date() in all_ujian_dates else 0)
-    df['day_of_week'] = df.index.dayofweek
-    df['month'] = df.index.month
-    df['year'] = df.index.year
-    df['weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
-    df['libur'] = df['IsHoliday'] | df['weekend']
+    holidays_df, all_holiday_dates_set, all_ramadan_dates, all_ujian_dates = prepare_events_prophet()
+    features = build_features(df.index, all_holiday_dates_set, all_ramadan_dates, all_ujian_dates)
+    for col in features.columns:
+        df[col] = features[col].to_numpy()
     df['Sales'] = pd.to_numeric(df['Sales'], errors='coerce')
     df.dropna(subset=['Sales'], inplace=True)
     if not df['Sales'].empty:
-        df['y'] = df['Sales'].apply(lambda x: np.clip(x, df['Sales'].quantile(0.01), df['Sales'].quantile(0.99)))
+        df['y'] = df['Sales'].clip(df['Sales'].quantile(0.01), df['Sales'].quantile(0.99))
     else:
-        st.warning("Kolom 'Sales' kosong setelah pembersihan data. Tidak dapat melanjutkan.")
+        runtime.warning("Kolom 'Sales' kosong setelah pembersihan data. Tidak dapat melanjutkan.")
         return None, None, None, None, None
     prophet_df = df.reset_index().rename(columns={'Date': 'ds', 'y': 'y'})
     prophet_df = prophet_df[['ds', 'y', 'IsHoliday', 'IsRamadan', 'IsUjian', 'day_of_week', 'month', 'year', 'weekend', 'libur']]
     return prophet_df, holidays_df, all_holiday_dates_set, all_ramadan_dates, all_ujian_dates
 
-def train_and_evaluate(prophet_df, holidays_df, pisah_tanggal, verbose):
+def _fit_model(model, train_df, init=None, report_iterations=False):
+    '''
+        FIT PROPHET, MENCATAT LAMA FIT DI model.fit_stats;
+        report_iterations: JUGA JUMLAH ITERASI OPTIMIZER (save_iterations MEMPERLAMBAT FIT, HANYA UNTUK DIAGNOSTIK / BENCHMARK)
+    '''
+    fit_kwargs = {'save_iterations': True} if report_iterations else {}
+    if init is not None:
+        fit_kwargs['init'] = init
+    start = time.perf_counter()
+    model.fit(train_df, **fit_kwargs)
+    iterations = None
+    if report_iterations:
+        try:
+            iterations = int(model.stan_backend.stan_fit.optimized_iterations_np.shape[0])
+        except Exception:
+            pass
+    model.fit_stats = {'seconds': time.perf_counter() - start, 'iterations': iterations, 'warm_start': init is not None}
+    return model
+
+def train_and_evaluate(prophet_df, holidays_df, pisah_tanggal, verbose, use_cache=True, series_key=None, warm_start=False, interval_mode=INTERVAL_MODE_DEFAULT, report_iterations=False):
+    '''
+    FIT PROPHET PADA DATA SEBELUM pisah_tanggal & EVALUASI PADA SISANYA
+    use_cache: MODEL DENGAN DATA LATIH & KONFIGURASI SAMA DIAMBIL DARI CACHE (model.from_cache = True)
+    series_key + warm_start: STAN DIMULAI DARI PARAMETER FIT TERAKHIR SERI YANG SAMA (REFIT HARIAN)
+    interval_mode selain "full": PREDIKSI DATA UJI TANPA SAMPLING (METRIK HANYA BUTUH yhat)
+    report_iterations: JUMLAH ITERASI OPTIMIZER IKUT DICATAT DI model.fit_stats (LEBIH LAMBAT, UNTUK BENCHMARK)
+    '''
     split_date = pd.to_datetime(pisah_tanggal)
     train_df = prophet_df[prophet_df['ds'] < split_date]
     test_df = prophet_df[prophet_df['ds'] >= split_date]
     if train_df.empty:
         if verbose: st.error("Data pelatihan kosong. Pastikan rentang tanggal data mencakup periode sebelum tanggal batas.")
         return None, None, None, None, None
-    model = Prophet(holidays=holidays_df, yearly_seasonality=True, weekly_seasonality=True, daily_seasonality=False)
-    for regressor in ['IsRamadan', 'IsUjian', 'day_of_week', 'month', 'year', 'weekend', 'libur']:
-        model.add_regressor(regressor)
-    model.fit(train_df)
+    cache_key = model_cache.model_key(train_df, holidays_df, REGRESSORS, PROPHET_SETTINGS) if use_cache else None
+    model = app_cache.load_model(cache_key) if use_cache else None
+    from_cache = model is not None
+    if not from_cache:
+        # prophet (cmdstanpy) & sklearn dimuat saat model pertama dilatih, bukan saat aplikasi start
+        from prophet import Prophet
+        model = Prophet(holidays=holidays_df, **PROPHET_SETTINGS)
+        for regressor in REGRESSORS:
+            model.add_regressor(regressor)
+        init = model_cache.load_warm_params(series_key) if (warm_start and series_key) else None
+        _fit_model(model, train_df, init=init, report_iterations=report_iterations)
+        if use_cache: model_cache.save(cache_key, model)
+        if series_key: model_cache.save_warm_params(series_key, model)
+    model.from_cache = from_cache
+    model.eval_forecast = None
     rmse, r2, mape = None, None, None
     if verbose: st.subheader("Evaluasi Model")
     if not test_df.empty:
         future_test = test_df[['ds', 'IsHoliday', 'IsRamadan', 'IsUjian', 'day_of_week', 'month', 'year', 'weekend', 'libur']].copy()
+        model.uncertainty_samples = INTERVAL_MODES["full"] if interval_mode == "full" else 0
         forecast_test = model.predict(future_test)
+        # Disimpan agar predict_table tidak memprediksi ulang jendela uji
+        model.eval_forecast = forecast_test
         test_with_forecast = pd.merge(test_df, forecast_test, on='ds')
         y_true = test_with_forecast['y']
         y_pred = test_with_forecast['yhat']
+        from sklearn.metrics import mean_squared_error, r2_score
         rmse = sqrt(mean_squared_error(y_true, y_pred))
         r2 = r2_score(y_true, y_pred)
         mape = np.mean(np.abs((y_true - y_pred) / y_true).replace([np.inf, -np.inf], np.nan).dropna()) * 100 
@@ -110,20 +179,53 @@ def train_and_evaluate(prophet_df, holidays_df, pisah_tanggal, verbose):
         if verbose: st.warning("Data pengujian kosong. Tidak dapat melakukan evaluasi.")
     return model, test_df, rmse, r2, mape
 
-def predict_table(model, periods_to_forecast, all_holiday_dates_set, all_ramadan_dates, all_ujian_dates, pisah_tanggal,verbose):
+def _horizon_dates(model, periods_to_forecast, pisah_tanggal):
+    '''
+        TANGGAL YANG SAMA DENGAN make_future_dataframe(include_history=True) SETELAH DIFILTER >= pisah_tanggal
+    '''
+    last_date = model.history['ds'].max()
+    dates = pd.date_range(start=last_date, periods=periods_to_forecast + 1, freq='D')
+    dates = dates[dates > last_date][:periods_to_forecast]
+    history_dates = model.history['ds'][model.history['ds'] >= pd.to_datetime(pisah_tanggal)]
+    return pd.DataFrame({'ds': pd.concat([history_dates, pd.Series(dates[dates >= pd.to_datetime(pisah_tanggal)])], ignore_index=True)})
+
+def _reusable_forecast(model, interval_mode):
+    '''
+        HASIL PREDIKSI JENDELA UJI DARI train_and_evaluate JIKA KOLOMNYA CUKUP UNTUK interval_mode
+    '''
+    eval_forecast = getattr(model, 'eval_forecast', None)
+    if eval_forecast is None or eval_forecast.empty:
+        return None
+    needed = ['yhat', 'yhat_lower', 'yhat_upper'] if INTERVAL_MODES[interval_mode] else ['yhat']
+    if not all(col in eval_forecast.columns for col in needed):
+        return None
+    return eval_forecast
+
+def predict_table(model, periods_to_forecast, all_holiday_dates_set, all_ramadan_dates, all_ujian_dates, pisah_tanggal,verbose, interval_mode=INTERVAL_MODE_DEFAULT):
+    '''
+    PREDIKSI MULAI pisah_tanggal; interval_mode MENENTUKAN JUMLAH SAMPEL INTERVAL ("none" -> HANYA ds & yhat)
+    TANPA verbose HANYA TANGGAL YANG DITAMPILKAN/DIEKSPOR YANG DIPREDIKSI, JENDELA UJI DIAMBIL DARI train_and_evaluate
+    '''
     if verbose: st.subheader("Prediksi Masa Depan")
-    with st.spinner(f"Membuat prediksi untuk {periods_to_forecast} hari..."):
-        future = model.make_future_dataframe(periods=periods_to_forecast, freq='D', include_history=True)
-        future['IsHoliday'] = future['ds'].map(lambda x: 1 if x.date() in all_holiday_dates_set else 0).astype(int)
-        future['IsRamadan'] = future['ds'].map(lambda x: 1 if x.date() in all_ramadan_dates else 0).astype(int)
-        future['IsUjian'] = future['ds'].map(lambda x: 1 if x.date() in all_ujian_dates else 0).astype(int)
-        future['day_of_week'] = future['ds'].dt.dayofweek
-        future['month'] = future['ds'].dt.month
-        future['year'] = future['ds'].dt.year
-        future['weekend'] = future['day_of_week'].isin([5, 6]).astype(int)
-        future['libur'] = future['IsHoliday'] | future['weekend']
+    with runtime.spinner(f"Membuat prediksi untuk {periods_to_forecast} hari..."):
+        reused = None
+        if verbose:
+            # Plot komponen butuh prediksi atas seluruh histori
+            future = model.make_future_dataframe(periods=periods_to_forecast, freq='D', include_history=True)
+        else:
+            future = _horizon_dates(model, periods_to_forecast, pisah_tanggal)
+            reused = _reusable_forecast(model, interval_mode)
+            if reused is not None:
+                reused = reused[reused['ds'].isin(future['ds'])]
+                future = future[~future['ds'].isin(reused['ds'])].reset_index(drop=True)
+        features = build_features(future['ds'], all_holiday_dates_set, all_ramadan_dates, all_ujian_dates)
+        for col in features.columns:
+            future[col] = features[col].to_numpy()
         future.replace([np.inf, -np.inf], np.nan, inplace=True)
-        forecast = model.predict(future)
+        model.uncertainty_samples = INTERVAL_MODES[interval_mode]
+        forecast = model.predict(future) if not future.empty else pd.DataFrame({'ds': pd.to_datetime([]), 'yhat': []})
+        if reused is not None and not reused.empty:
+            forecast = pd.concat([reused, forecast] if not future.empty else [reused], ignore_index=True).sort_values('ds', ignore_index=True)
         if verbose:
             fig1 = model.plot(forecast) 
             st.pyplot(fig1)
@@ -135,11 +237,10 @@ def predict_table(model, periods_to_forecast, all_holiday_dates_set, all_ramadan
 
             
         forecast_display_table = forecast[forecast['ds'] >= pisah_tanggal].copy()
-        forecast_display_table = forecast_display_table[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].copy()
-        for col in ['yhat', 'yhat_lower', 'yhat_upper']:
-            forecast_display_table[col] = forecast_display_table[col].apply(lambda x: int(round(x)) if pd.notna(x) else np.nan)
-        forecast_display_table['yhat'] = forecast_display_table['yhat'].apply(lambda x: max(x, 0))
-        forecast_display_table['yhat_lower'] = forecast_display_table['yhat_lower'].apply(lambda x: max(x, 0))
+        forecast_columns = [col for col in ['yhat', 'yhat_lower', 'yhat_upper'] if col in forecast_display_table.columns]
+        forecast_display_table = forecast_display_table[['ds'] + forecast_columns].copy()
+        for col in forecast_columns:
+            forecast_display_table[col] = round_forecast(forecast_display_table[col], clip_zero=(col != 'yhat_upper'))
     return forecast_display_table
 
 def display_charts(test_df, forecast_display_table):
@@ -184,105 +285,284 @@ def display_charts(test_df, forecast_display_table):
     st.line_chart(chart_df, color=["#0000FF"])
 
 
-def batch_predict_and_export_all_categories(db_name, branchid, branch_name, kategori_input, start_date_str, end_date_str, periods_to_forecast, pisah_tanggal, dbms):
-    """
-    Melakukan prediksi batch untuk semua kategori dan mengekspor hasilnya ke file Excel.
-    """
-    st.subheader("Proses Prediksi Batch")
-    
-    # 1. Menentukan nama folder baru berdasarkan Branch ID dan Branch Name
-    if dbms == "SSMS":
-        branch_folder_name = f"{branchid}-{branch_name}"
-    elif dbms == "POSTGRES":
-        branch_folder_name = f"{branchid}"
-    # 2. Membuat path lengkap untuk folder output
-    # Path: current_directory/db_name/branchid|branch_name
-    output_folder = os.path.join(os.getcwd(), db_name, branch_folder_name)
-    
-    # 3. Membuat folder jika belum ada
-    os.makedirs(output_folder, exist_ok=True)
-    st.write(f"Menyimpan file ke folder: `{output_folder}`")
-    
-    if dbms == "SSMS":
-        all_categories = db_utils.get_unique_categories_ssms(db_name, start_date_str, end_date_str)
-    elif dbms == "POSTGRES":
-        all_categories = db_utils.get_unique_categories_postgres(start_date_str, end_date_str)
+def _init_batch_worker(stan_threads):
+    '''
+        MEMBATASI THREAD STAN & BLAS DI SETIAP PROSES WORKER
+    '''
+    for var in ["STAN_NUM_THREADS", "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"]:
+        os.environ[var] = str(stan_threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(stan_threads)
+    except ImportError:
+        pass
 
-    if not all_categories:
-        st.info(f"Tidak ada kategori yang ditemukan yang memiliki data dari rentang {start_date_str} - {end_date_str} dari database. Menggunakan kategori input: '{kategori_input}' sebagai gantinya.")
+def _fit_summary(model):
+    '''
+        KETERANGAN SINGKAT SUMBER MODEL / LAMA FIT UNTUK PESAN BATCH
+    '''
+    if getattr(model, 'from_cache', False):
+        return " (model dari cache)"
+    stats = getattr(model, 'fit_stats', None)
+    if not stats:
+        return ""
+    mode = "warm start" if stats['warm_start'] else "cold start"
+    iterations = f", {stats['iterations']} iterasi" if stats['iterations'] is not None else ""
+    return f" ({mode}: {stats['seconds']:.2f} dtk{iterations})"
 
-        all_categories = [kategori_input]      
+def _prepare_category(df, category):
+    '''
+        DIJALANKAN DI THREAD PENGAMBIL DATA (PREFETCH), SELAGI SERI SEBELUMNYA DI-FIT
+        O.S. (None, HASIL prepare_data) ATAU (PESAN PERINGATAN, None)
+    '''
+    if df.empty:
+        return f"Tidak ada data untuk kategori '{category}'. Melanjutkan ke kategori berikutnya.", None
+    prepared = prepare_data(df)
+    if prepared[0] is None:
+        return f"Gagal mempersiapkan data untuk kategori '{category}'. Melanjutkan ke kategori berikutnya.", None
+    return None, prepared
+
+def _fit_category(prepared, category, periods_to_forecast, pisah_tanggal, series_key=None, warm_start=False, interval_mode=INTERVAL_MODE_DEFAULT):
+    '''
+        DIJALANKAN DI WORKER: TRAIN -> PREDICT
+        O.S. (STATUS, PESAN, HASIL {forecast, r2, mape, rmse, fit_summary} UNTUK THREAD PENULIS, LAMA DETIK)
+    '''
+    start = time.perf_counter()
+    try:
+        prophet_df, holidays_df, all_holiday_dates_set, all_ramadan_dates, all_ujian_dates = prepared
+
+        # 3. Train Model 
+        model, _, rmse, r2, mape = train_and_evaluate(prophet_df, holidays_df,pisah_tanggal, verbose=False, series_key=series_key, warm_start=warm_start, interval_mode=interval_mode)
+
+        if model is None:
+            return "warning", f"Gagal melatih model untuk kategori '{category}'. Melanjutkan ke kategori berikutnya.", None, time.perf_counter() - start
+
+        # 4. Future Predict
+        forecast_full = predict_table(model, periods_to_forecast, all_holiday_dates_set, all_ramadan_dates, all_ujian_dates,pisah_tanggal,verbose=False, interval_mode=interval_mode)
+        forecast_for_excel = (
+            forecast_full[[col for col in ['ds', 'yhat', 'yhat_lower', 'yhat_upper'] if col in forecast_full.columns]]
+            .copy()
+            .reset_index(drop=True)
+            .rename(columns={
+                'ds': 'Tanggal',
+                'yhat': 'Prediksi',
+                'yhat_lower': 'Batas Bawah',
+                'yhat_upper': 'Batas Atas'
+            }) 
+        )     
+        for col in forecast_for_excel.columns.drop('Tanggal'):
+            forecast_for_excel[col] = round_forecast(forecast_for_excel[col])
 
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    total_categories = len(all_categories)
-    for i, category in enumerate(all_categories):
-        status_text.text(f"Memproses kategori: {category} ({i+1}/{total_categories})")
-        progress_bar.progress((i + 1) / total_categories)
+        if forecast_for_excel.empty:
+            return "warning", f"Tidak ada prediksi untuk tahun 2025 atau lebih untuk kategori '{category}'. Melewatkan ekspor.", None, time.perf_counter() - start
+
+        result = {"forecast": forecast_for_excel, "r2": r2, "mape": mape, "rmse": rmse, "fit_summary": _fit_summary(model)}
+        return "success", None, result, time.perf_counter() - start
+
+    except Exception as e:
+        return "error", f"❌ Error saat memproses kategori '{category}': {e}", None, time.perf_counter() - start
 
+class _InlineExecutor:
+    '''
+        PENGGANTI PROCESS POOL UNTUK n_workers = 1: UNIT DIJALANKAN LANGSUNG DI PROSES UTAMA
+    '''
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
         try:
-            if dbms== "SSMS": 
-                df = db_utils.load_data_ssms(db_name, branchid, category, start_date_str, end_date_str)
-            elif dbms == "POSTGRES":
-                df = db_utils.load_data_postgres(branchid, category, start_date_str, end_date_str)
-            
-            if df.empty:
-                st.warning(f"Tidak ada data untuk kategori '{category}'. Melanjutkan ke kategori berikutnya.")
-                continue
-            
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
 
-            # 2. Prepare Prophet Data
-            prophet_df, holidays_df, all_holiday_dates_set, all_ramadan_dates, all_ujian_dates = prepare_data(df)
-            if prophet_df is None:
-                st.warning(f"Gagal mempersiapkan data untuk kategori '{category}'. Melanjutkan ke kategori berikutnya.")
-                continue
+    def __enter__(self):
+        return self
 
-            # 3. Train Model 
-            model, _, rmse, r2, mape = train_and_evaluate(prophet_df, holidays_df,pisah_tanggal, verbose=False)
+    def __exit__(self, *exc):
+        return False
 
-            if model is None:
-                st.warning(f"Gagal melatih model untuk kategori '{category}'. Melanjutkan ke kategori berikutnya.")
-                continue
+def _branch_output_folder(output_root, db_name, branchid, branch_name, dbms):
+    '''
+        Path: output_root/db_name/branchid-branch_name (SSMS) atau output_root/db_name/branchid (POSTGRES)
+    '''
+    branch_folder_name = f"{branchid}-{branch_name}" if dbms == "SSMS" else f"{branchid}"
+    return os.path.join(output_root or os.getcwd(), db_name, branch_folder_name)
 
-            # 4. Future Predict
-            forecast_full = predict_table(model, periods_to_forecast, all_holiday_dates_set, all_ramadan_dates, all_ujian_dates,pisah_tanggal,verbose=False)
-            # Export
-            forecast_for_excel = (
-                forecast_full[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
-                .copy()
-                .reset_index(drop=True)
-                .rename(columns={
-                    'ds': 'Tanggal',
-                    'yhat': 'Prediksi',
-                    'yhat_lower': 'Batas Bawah',
-                    'yhat_upper': 'Batas Atas'
-                }) 
-            )     
-            for col in ['Prediksi', 'Batas Bawah', 'Batas Atas']:
-                forecast_for_excel[col] = forecast_for_excel[col].apply(lambda x: int(round(x)) if pd.notna(x) else np.nan)
+def _load_branch_data(db_name, branchid, start_date_str, end_date_str, dbms, categories):
+    # 1x querry untuk semua kategori, lalu dipotong per kategori di memori
+    if dbms == "SSMS":
+        return db_utils.load_data_bulk_ssms(db_name, branchid, start_date_str, end_date_str, categories=categories)
+    return db_utils.load_data_bulk_postgres(branchid, start_date_str, end_date_str, categories=categories)
 
-            if forecast_for_excel.empty:
-                st.warning(f"Tidak ada prediksi untuk tahun 2025 atau lebih untuk kategori '{category}'. Melewatkan ekspor.")
-                continue
+def _produce_branch_units(prefetch, stats, branchid, branch_name, branch_categories, **kwargs):
+    '''
+        DIJALANKAN DI THREAD PENGAMBIL DATA (TAHAP fetch): ITEM _branch_units DIKIRIM SATU PER SATU KE prefetch,
+        THREAD MENUNGGU (TIDAK DIHITUNG SIBUK) SELAMA SUDAH ADA BATCH_PREFETCH_UNITS UNIT SIAP YANG BELUM DI-FIT
+    '''
+    try:
+        items = _branch_units(branchid=branchid, branch_name=branch_name, branch_categories=branch_categories, **kwargs)
+        while True:
+            with stats.busy("fetch"):
+                item = next(items, None)
+            if item is None or not prefetch.put(item):
+                return
+    except Exception as e:
+        prefetch.put(("error", e))
+    finally:
+        prefetch.finish()
 
-            # Get prediction start dan end dates untuk nama file 
-            pred_start_date = forecast_for_excel['Tanggal'].min().strftime("%Y%m%d")
-            pred_end_date = forecast_for_excel['Tanggal'].max().strftime("%Y%m%d")
+def _branch_units(db_name, branchid, branch_name, branch_categories, start_date_str, end_date_str, dbms, output_root, config_hash, events_version, force):
+    '''
+        I.S. SATU BRANCH; DATA SEMUA KATEGORI DIAMBIL DENGAN 1 QUERRY BULK
+        O.S. GENERATOR ("empty", None) JIKA TIDAK ADA DATA, ATAU ("folder", FOLDER OUTPUT) LALU PER KATEGORI
+             ("skipped", ENTRI MANIFEST) UNTUK UNIT YANG SUDAH SELESAI / ("unit", UNIT SIAP FIT);
+             POTONG KATEGORI + prepare_data BARU DIKERJAKAN SAAT ITEM BERIKUTNYA DIMINTA
+    '''
+    output_folder = _branch_output_folder(output_root, db_name, branchid, branch_name, dbms)
+    os.makedirs(output_folder, exist_ok=True)
+    bulk_df = _load_branch_data(db_name, branchid, start_date_str, end_date_str, dbms, branch_categories)
+    if bulk_df.empty:
+        yield "empty", None
+        return
+    yield "folder", output_folder
+    manifest = {} if force else run_manifest.load(output_folder)
+    for category in branch_categories:
+        category_df = db_utils.slice_category(bulk_df, category)
+        fingerprint = run_manifest.data_fingerprint(category_df, events_version)
+        # Unit yang sudah selesai di run sebelumnya (data & konfigurasi sama) tidak dihitung ulang
+        if not force and run_manifest.is_complete(manifest.get((branchid, category)), fingerprint, config_hash, output_folder):
+            yield "skipped", manifest[(branchid, category)]
+            continue
+        warning, prepared = _prepare_category(category_df, category)
+        yield "unit", {"branch": branchid, "category": category, "prepared": prepared, "warning": warning, "fingerprint": fingerprint,
+                       "output_folder": output_folder, "series_key": model_cache.series_key(dbms, db_name, branchid, category)}
 
-            # Handle R2 dan MAPE klo None
-            r2_str = f"{r2:.2f}" if r2 is not None else "N/A"
-            mape_str = f"{mape:.2f}" if mape is not None else "N/A"
+def _run_batch(db_name, work, start_date_str, end_date_str, periods_to_forecast, pisah_tanggal, dbms, n_workers, stan_threads, warm_start, interval_mode, output_root, force, db_concurrency, shard=None, exporter=exporters.EXPORTER_DEFAULT, sink_table=None, run_id=None):
+    '''
+        MENJALANKAN WORK SET work = [(branch_id, branch_name, [kategori, ...]), ...] DENGAN pipeline.BatchScheduler:
+        fetch: DATA BRANCH DIAMBIL (1 QUERRY BULK) DI THREAD POOL (db_concurrency), LALU DIPOTONG & DISIAPKAN PER KATEGORI
+               KE ANTREAN TERBATAS (BATCH_PREFETCH_UNITS UNIT PER BRANCH) SELAGI KATEGORI SEBELUMNYA DI-FIT
+        fit:   UNIT KATEGORI DI-FIT DI PROCESS POOL (n_workers), MAKS. 2 x n_workers SERI SIAP MENGANTRE
+        write: HASIL DITULIS exporter (file / branch-workbook / parquet / csv) OLEH SATU THREAD PENULIS DENGAN ANTREAN TERBATAS
+        DI AKHIR RUN DITULIS results_<run_id>.json BERISI METRIK SEMUA SERI DI FOLDER output_root/db_name
+        sink_table: JIKA DIISI, PREDIKSI JUGA DI-UPSERT KE TABEL TERSEBUT PER BRANCH (KUNCI branch, kategori, tanggal, run_id)
+        LAMA SIBUK / MENGANGGUR TIAP TAHAP DILAPORKAN DI AKHIR.
+    '''
+    if db_concurrency:
+        db_utils.set_query_concurrency(db_concurrency)
+    fetch_workers = max(int(db_concurrency or db_utils.DB_QUERY_CONCURRENCY), 1)
+    config = {
+        "periods_to_forecast": periods_to_forecast, "pisah_tanggal": pisah_tanggal, "interval_mode": interval_mode,
+        "settings": PROPHET_SETTINGS, "regressors": REGRESSORS,
+    }
+    # Ganti format ekspor = output lama tidak dipakai ulang (kunci hanya ditambahkan selain layout lama)
+    if exporter != exporters.EXPORTER_DEFAULT:
+        config["exporter"] = exporter
+    config_hash = run_manifest.config_fingerprint(config)
+    # run_id bisa diberikan (misal sama untuk semua shard / saat run diulang) agar upsert ke database idempoten;
+    # nama file output selalu unik per proses agar file run sebelumnya tidak tertimpa
+    file_id = exporters.new_run_id()
+    run_id = run_id or file_id
+    run_dir = os.path.join(output_root or os.getcwd(), db_name)
+    started_at = datetime.datetime.now()
+    export = exporters.create_exporter(exporter, run_dir, file_id, interval_mode, INTERVAL_MODES[interval_mode])
+    if sink_table:
+        export = exporters.CombinedExporter(export, forecast_sink.DatabaseSink(dbms, db_name, run_id, interval_mode, table=None if sink_table is True else sink_table))
+    events_version = event_calendar.get_event_calendar().version
 
-            # Construct filename
-            filename = f"{category}_{pred_start_date}_{pred_end_date}_R2 = {r2_str}_MAPE = {mape_str}.xlsx"
-            file_path = os.path.join(output_folder, filename)
+    total_units = sum(len(branch_categories) for _, _, branch_categories in work)
+    parallel = n_workers > 1 and total_units > 1
+    if parallel:
+        # Proses baru (spawn) agar tidak mewarisi thread server Streamlit
+        executor = ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_batch_worker, initargs=(stan_threads,))
+    else:
+        executor = _InlineExecutor()
+    produce = functools.partial(_produce_branch_units, db_name=db_name, start_date_str=start_date_str, end_date_str=end_date_str, dbms=dbms,
+                                output_root=output_root, config_hash=config_hash, events_version=events_version, force=force)
+    fit = functools.partial(_fit_category, periods_to_forecast=periods_to_forecast, pisah_tanggal=pisah_tanggal, warm_start=warm_start, interval_mode=interval_mode)
+    scheduler = pipeline.BatchScheduler(work, produce, fit, executor, export, config_hash, run_dir, fetch_workers=fetch_workers,
+                                        fit_workers=n_workers if parallel else 1, prefetch_units=BATCH_PREFETCH_UNITS, shard=sharding.shard_label(shard))
+    queries_before = query_stats.STATS.summary()
+    counts = scheduler.run()
 
-            # Save to Excel
-            forecast_for_excel.to_excel(file_path, index=False)
-            st.success(f"✅ Berhasil menyimpan '{filename}'")
+    stats = scheduler.stats
+    runtime.info(f"Statistik pipeline: {stats.describe()}", pipeline=stats.summary())
+    runtime.info(f"Statistik querry database: {query_stats.STATS.describe(queries_before)}", queries=query_stats.STATS.summary(queries_before))
+    results_path = exporters.write_results_manifest(run_dir, run_id, {
+        "database": db_name, "dbms": dbms, "exporter": exporter, "shard": sharding.shard_label(shard), "sink_table": export.extra[0].table if sink_table else None,
+        "started_at": started_at.isoformat(timespec="seconds"), "finished_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "data_range": [start_date_str, end_date_str], "config": config,
+        "interval": {"mode": interval_mode, "samples": INTERVAL_MODES[interval_mode]}, "counts": counts,
+        "files": [os.path.relpath(path, run_dir) for path in scheduler.files], "pipeline": stats.summary(),
+        "queries": query_stats.STATS.summary(queries_before),
+    }, scheduler.series)
+    runtime.write(f"Ringkasan hasil run: `{results_path}`")
+    return counts
 
-        except Exception as e:
-            st.error(f"❌ Error saat memproses kategori '{category}': {e}")
-            
-    status_text.empty()
-    st.success("🎉 Prediksi Batch selesai untuk semua kategori!")
+def _batch_categories(db_name, start_date_str, end_date_str, dbms, categories, branchid=None):
+    if categories:
+        return list(categories)
+    if dbms == "SSMS":
+        return db_utils.get_unique_categories_ssms(db_name, start_date_str, end_date_str, branchid)
+    return db_utils.get_unique_categories_postgres(start_date_str, end_date_str, branchid)
+
+def batch_predict_and_export_all_categories(db_name, branchid, branch_name, kategori_input, start_date_str, end_date_str, periods_to_forecast, pisah_tanggal, dbms, n_workers=BATCH_WORKERS_DEFAULT, stan_threads=STAN_THREADS_PER_WORKER, warm_start=False, interval_mode=INTERVAL_MODE_DEFAULT, categories=None, output_root=None, force=False, db_concurrency=None, exporter=exporters.EXPORTER_DEFAULT, sink_table=None, run_id=None):
+    """
+    Melakukan prediksi batch untuk semua kategori dan mengekspor hasilnya ke file Excel.
+    n_workers > 1 menjalankan kategori secara paralel di process pool, masing-masing dibatasi stan_threads thread.
+    warm_start=True memulai fit tiap kategori dari parameter fit sebelumnya (refit harian).
+    interval_mode: "full", "reduced" atau "none" (tanpa batas bawah/atas), dicatat di results_<run_id>.json (dan sheet Info workbook branch).
+    categories: daftar kategori eksplisit (default: semua kategori dengan data penuh), output_root: default folder kerja.
+    Pesan & progress lewat modul runtime, sehingga juga bisa dijalankan tanpa Streamlit (modules.batch).
+    Setiap kategori yang selesai dicatat di manifest.jsonl folder output; kategori yang sudah sukses dengan data &
+    konfigurasi yang sama dilewati saat run diulang, kecuali force=True.
+    db_concurrency: batas query database bersamaan (default db_utils.DB_QUERY_CONCURRENCY).
+    exporter: "file" (default, 1 Excel per kategori), "branch-workbook", "parquet" atau "csv"; metrik semua seri
+    juga ditulis ke results_<run_id>.json di folder database.
+    sink_table: nama tabel (atau True untuk forecast_sink.FORECAST_TABLE) untuk upsert prediksi ke database yang sama,
+    run_id: id run di tabel tersebut (default baru tiap run).
+    Mengembalikan jumlah kategori per status {"success": .., "warning": .., "error": .., "skipped": ..}.
+    """
+    runtime.subheader("Proses Prediksi Batch")
+    all_categories = _batch_categories(db_name, start_date_str, end_date_str, dbms, categories, branchid)
+    if not all_categories:
+        if not kategori_input:
+            runtime.warning(f"Tidak ada kategori dengan data penuh dari rentang {start_date_str} - {end_date_str}. Batch dilewati.", branch=branchid)
+            return {"success": 0, "warning": 0, "error": 0, "skipped": 0}
+        runtime.info(f"Tidak ada kategori yang ditemukan yang memiliki data dari rentang {start_date_str} - {end_date_str} dari database. Menggunakan kategori input: '{kategori_input}' sebagai gantinya.")
+
+        all_categories = [kategori_input]      
+
+    counts = _run_batch(db_name, [(branchid, branch_name, all_categories)], start_date_str, end_date_str, periods_to_forecast, pisah_tanggal, dbms,
+                        n_workers, stan_threads, warm_start, interval_mode, output_root, force, db_concurrency, exporter=exporter, sink_table=sink_table, run_id=run_id)
+    runtime.success("🎉 Prediksi Batch selesai untuk semua kategori!", branch=branchid, **counts)
+    return counts
+
+def batch_predict_all_branches(db_name, branches, start_date_str, end_date_str, periods_to_forecast, pisah_tanggal, dbms, n_workers=BATCH_WORKERS_DEFAULT, stan_threads=STAN_THREADS_PER_WORKER, warm_start=False, interval_mode=INTERVAL_MODE_DEFAULT, categories=None, output_root=None, force=False, db_concurrency=None, shard=None, exporter=exporters.EXPORTER_DEFAULT, sink_table=None, run_id=None):
+    """
+    Prediksi batch untuk banyak branch sekaligus: work set semua pasangan (branch, kategori) dari
+    branches = [(branch_id, branch_name), ...] dijalankan di satu worker pool.
+    Data tiap branch diambil dengan maksimal db_concurrency query bersamaan ke database POS.
+    shard=(k, N): hanya unit dengan sharding.shard_of(branch, kategori, N) == k yang diproses (multi mesin).
+    Parameter lain sama dengan batch_predict_and_export_all_categories.
+    """
+    # Shard di luar 1..N tidak akan cocok dengan unit mana pun: ditolak sebelum apa pun dijalankan
+    shard = sharding.validate_shard(shard)
+    runtime.subheader("Proses Prediksi Batch Multi Branch")
+    all_categories = _batch_categories(db_name, start_date_str, end_date_str, dbms, categories)
+    if not all_categories or not branches:
+        runtime.warning(f"Tidak ada branch / kategori dengan data penuh dari rentang {start_date_str} - {end_date_str}. Batch dilewati.")
+        return {"success": 0, "warning": 0, "error": 0, "skipped": 0}
+    work = []
+    for branchid, branch_name in branches:
+        branch_categories = [category for category in all_categories if sharding.in_shard(branchid, category, shard)]
+        if branch_categories:
+            work.append((branchid, branch_name, branch_categories))
+    total_units = sum(len(branch_categories) for _, _, branch_categories in work)
+    shard_text = f" (shard {sharding.shard_label(shard)})" if shard else ""
+    runtime.info(f"Work set{shard_text}: {total_units} dari {len(branches) * len(all_categories)} unit ({len(branches)} branch x {len(all_categories)} kategori).")
+    counts = _run_batch(db_name, work, start_date_str, end_date_str, periods_to_forecast, pisah_tanggal, dbms,
+                        n_workers, stan_threads, warm_start, interval_mode, output_root, force, db_concurrency, shard=shard, exporter=exporter, sink_table=sink_table, run_id=run_id)
+    runtime.success(f"🎉 Prediksi Batch selesai untuk {len(branches)} branch!", **counts)
+    return counts
@@ -0,0 +1,65 @@
+import time
+import threading
+from contextlib import contextmanager
+
+'''
+    STATISTIK QUERRY DATABASE PER BENTUK QUERRY (shape, MISAL "ssms.sales_bulk"):
+    JUMLAH & WAKTU prepare / execute / fetch, UNTUK MELIHAT EFEK PLAN YANG DIPAKAI ULANG
+'''
+
+PHASES = ["prepare", "execute", "fetch"]
+
+
+class QueryStats:
+    '''
+        AKUMULASI PER PROSES (AMAN DIPAKAI BANYAK THREAD)
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._shapes = {}
+
+    def add(self, shape, phase, seconds):
+        with self._lock:
+            entry = self._shapes.setdefault(shape, {key: 0 for phase_name in PHASES for key in (phase_name, f"{phase_name}_seconds")})
+            entry[phase] += 1
+            entry[f"{phase}_seconds"] += seconds
+
+    @contextmanager
+    def timed(self, shape, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(shape, phase, time.perf_counter() - start)
+
+    def summary(self, since=None):
+        '''
+            O.S. {shape: {"prepare", "prepare_seconds", "execute", "execute_seconds", "fetch", "fetch_seconds"}}
+            since = HASIL summary() SEBELUMNYA -> HANYA SELISIHNYA (MISAL UNTUK 1 RUN BATCH)
+        '''
+        since = since or {}
+        result = {}
+        with self._lock:
+            for shape, entry in self._shapes.items():
+                before = since.get(shape, {})
+                delta = {key: value - before.get(key, 0) for key, value in entry.items()}
+                if any(delta[phase] for phase in PHASES):
+                    result[shape] = {key: round(value, 3) if key.endswith("_seconds") else value for key, value in delta.items()}
+        return result
+
+    def describe(self, since=None):
+        parts = []
+        for shape, s in sorted(self.summary(since).items()):
+            text = f"{shape}: {s['execute']}x execute {s['execute_seconds']:.2f} dtk"
+            if s['prepare']:
+                text += f", {s['prepare']}x prepare {s['prepare_seconds']:.2f} dtk"
+            parts.append(text + f", fetch {s['fetch_seconds']:.2f} dtk")
+        return "; ".join(parts) or "tidak ada querry"
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+
+STATS = QueryStats()
@@ -0,0 +1,96 @@
+import os
+import json
+import hashlib
+import datetime
+import pandas as pd
+
+'''
+    MANIFEST RUN BATCH (JSONL DI FOLDER OUTPUT BRANCH): SATU BARIS PER UNIT (BRANCH, KATEGORI) YANG SELESAI,
+    DIPAKAI UNTUK MELEWATI UNIT YANG SUDAH BERHASIL DENGAN DATA & KONFIGURASI YANG SAMA SAAT RUN DIULANG
+'''
+
+MANIFEST_FILE = "manifest.jsonl"
+
+
+def manifest_path(output_folder):
+    return os.path.join(output_folder, MANIFEST_FILE)
+
+
+def data_fingerprint(df, events_version=None):
+    '''
+        HASH DATA PENJUALAN SATU KATEGORI (TANGGAL + NILAI) DAN VERSI FILE EVENT
+    '''
+    digest = hashlib.sha256(str(events_version).encode("utf-8"))
+    if df is not None and not df.empty:
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def config_fingerprint(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def load(output_folder):
+    '''
+        ENTRI TERAKHIR PER (BRANCH, KATEGORI); BARIS RUSAK (MISAL PROSES MATI SAAT MENULIS) DIABAIKAN
+    '''
+    entries = {}
+    try:
+        with open(manifest_path(output_folder), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    entries[(entry["branch"], entry["category"])] = entry
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except OSError:
+        pass
+    return entries
+
+
+def output_file(output):
+    '''
+        PATH FILE DARI KOLOM output MANIFEST (RELATIF KE FOLDER BRANCH, TANPA "#SHEET")
+    '''
+    return output.split("#", 1)[0] if output else output
+
+
+def is_complete(entry, fingerprint, config_hash, output_folder):
+    '''
+        UNIT DILEWATI HANYA JIKA SUKSES, FINGERPRINT & KONFIGURASI SAMA, DAN FILE OUTPUT MASIH ADA
+    '''
+    if not entry or entry.get("status") != "success":
+        return False
+    if entry.get("fingerprint") != fingerprint or entry.get("config") != config_hash:
+        return False
+    output = output_file(entry.get("output"))
+    return bool(output) and os.path.exists(os.path.join(output_folder, output))
+
+
+def append(output_folder, entry):
+    '''
+        MENAMBAH SATU BARIS KE MANIFEST (flush + fsync AGAR TETAP ADA WALAU PROSES MATI SESUDAHNYA)
+    '''
+    with open(manifest_path(output_folder), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    return entry
+
+
+def record(output_folder, branch, category, fingerprint, config_hash, status, output=None, r2=None, mape=None, rmse=None, message=None, shard=None):
+    entry = {
+        "branch": branch,
+        "category": category,
+        "fingerprint": fingerprint,
+        "config": config_hash,
+        "status": status,
+        "output": output,
+        "r2": r2,
+        "mape": mape,
+        "rmse": rmse,
+        "message": message,
+        "shard": shard,
+        "finished_at": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+    return append(output_folder, entry)
@@ -0,0 +1,190 @@
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+import streamlit as st
+
+'''
+    LAPISAN TIPIS ANTARA LOGIKA FORECAST DAN UI:
+    DI DALAM STREAMLIT PESAN/PROGRESS/SECRETS MEMAKAI st.*, DI LUAR (CLI, CRON, WORKER) MEMAKAI logging & FILE KONFIGURASI
+'''
+
+logger = logging.getLogger("forecast")
+
+# File konfigurasi kredensial untuk mode headless (format sama dengan .streamlit/secrets.toml)
+CONFIG_FILE_ENV = "FORECAST_CONFIG"
+DEFAULT_CONFIG_FILE = os.path.join(".streamlit", "secrets.toml")
+# Override per kunci lewat environment, misal FORECAST_SSMS_SERVER, FORECAST_POSTGRES_PASSWORD
+ENV_PREFIX = "FORECAST_"
+
+
+def in_streamlit():
+    try:
+        from streamlit.runtime import exists
+        return exists()
+    except ImportError:
+        return False
+
+
+def _load_config_file(path):
+    try:
+        import tomllib
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    except ImportError:
+        import toml
+        return toml.load(path)
+
+
+def get_secrets(section):
+    '''
+        KREDENSIAL UNTUK section ("ssms" / "postgres"): st.secrets DI STREAMLIT,
+        SELAIN ITU FILE FORECAST_CONFIG (DEFAULT .streamlit/secrets.toml) + OVERRIDE ENVIRONMENT
+    '''
+    if in_streamlit():
+        return st.secrets[section]
+    path = os.environ.get(CONFIG_FILE_ENV, DEFAULT_CONFIG_FILE)
+    values = {}
+    if os.path.exists(path):
+        values = dict(_load_config_file(path).get(section, {}))
+    prefix = f"{ENV_PREFIX}{section.upper()}_"
+    for name, value in os.environ.items():
+        if name.startswith(prefix):
+            values[name[len(prefix):].lower()] = value
+    if not values:
+        raise KeyError(f"Kredensial '{section}' tidak ditemukan di {path} maupun environment {prefix}*")
+    return values
+
+
+def _log(level, message, fields):
+    logger.log(level, message, extra={"fields": fields})
+
+
+def error(message, **fields):
+    if in_streamlit(): st.error(message)
+    else: _log(logging.ERROR, message, fields)
+
+
+def warning(message, **fields):
+    if in_streamlit(): st.warning(message)
+    else: _log(logging.WARNING, message, fields)
+
+
+def info(message, **fields):
+    if in_streamlit(): st.info(message)
+    else: _log(logging.INFO, message, fields)
+
+
+def success(message, **fields):
+    if in_streamlit(): st.success(message)
+    else: _log(logging.INFO, message, fields)
+
+
+def subheader(text):
+    if in_streamlit(): st.subheader(text)
+    else: _log(logging.INFO, text, {})
+
+
+def write(text):
+    if in_streamlit(): st.write(text)
+    else: _log(logging.INFO, text, {})
+
+
+@contextmanager
+def spinner(text):
+    if in_streamlit():
+        with st.spinner(text):
+            yield
+    else:
+        _log(logging.DEBUG, text, {})
+        yield
+
+
+def thread_context():
+    '''
+        KONTEKS SCRIPT STREAMLIT SESI SEKARANG UNTUK THREAD PEMBANTU (None DI LUAR STREAMLIT)
+    '''
+    if not in_streamlit():
+        return None
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    return get_script_run_ctx()
+
+
+def attach_thread_context(ctx):
+    '''
+        INITIALIZER THREAD POOL: AGAR st.* & st.cache_data DI THREAD PEMBANTU TERHUBUNG KE SESI
+    '''
+    if ctx is not None:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx
+        add_script_run_ctx(threading.current_thread(), ctx)
+
+
+class _LogProgress:
+    '''
+        PENGGANTI st.progress / st.empty DI MODE HEADLESS
+    '''
+
+    def __init__(self):
+        self.last_text = None
+
+    def progress(self, fraction):
+        _log(logging.DEBUG, "progress", {"progress": round(float(fraction), 4)})
+
+    def text(self, message):
+        if message != self.last_text:
+            self.last_text = message
+            _log(logging.INFO, message, {})
+
+    def empty(self):
+        pass
+
+
+def progress_bar():
+    return st.progress(0) if in_streamlit() else _LogProgress()
+
+
+def status_text():
+    return st.empty() if in_streamlit() else _LogProgress()
+
+
+class JsonFormatter(logging.Formatter):
+    '''
+        SATU BARIS JSON PER LOG (UNTUK CRON / NODE KOMPUTASI)
+    '''
+
+    def format(self, record):
+        payload = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class KeyValueFormatter(logging.Formatter):
+    def format(self, record):
+        text = super().format(record)
+        fields = getattr(record, "fields", None) or {}
+        if fields:
+            text += " " + " ".join(f"{key}={value!r}" for key, value in fields.items())
+        return text
+
+
+def setup_logging(level="INFO", fmt="text"):
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(KeyValueFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    # Log internal library yang terlalu ramai
+    noisy = [name for name in logging.root.manager.loggerDict if name.startswith("streamlit")]
+    for name in ["cmdstanpy", "prophet"] + noisy:
+        logging.getLogger(name).setLevel(logging.ERROR)
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import shutil
+import socket
+import hashlib
+import threading
+from datetime import date, timedelta
+import pandas as pd
+
+'''
+    CACHE DISK (PARQUET) PENJUALAN HARIAN PER (DATABASE, BRANCH, KATEGORI)
+    BERTAHAN ANTAR PROSES & RESTART STREAMLIT, DIPERBARUI SECARA INKREMENTAL
+'''
+
+CACHE_DIR = os.environ.get("SALES_CACHE_DIR", os.path.join(".cache", "sales"))
+CACHE_ENABLED = os.environ.get("SALES_CACHE", "1") != "0"
+# Lock yang tidak diperbarui (heartbeat) lebih lama dari ini (detik) dan pemiliknya tidak bisa dicek / sudah mati
+# dianggap sisa proses yang mati. Selama lock dipegang, mtime file lock diperbarui tiap LOCK_STALE_SECONDS / 4
+LOCK_STALE_SECONDS = 300
+
+
+def _safe_name(value):
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in str(value))
+
+
+def _entry_base(database, branchid, kategori):
+    folder = os.path.join(CACHE_DIR, _safe_name(database), _safe_name(branchid))
+    digest = hashlib.sha1(str(kategori).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(folder, f"{_safe_name(kategori)[:40]}-{digest}")
+
+
+def _process_alive(pid):
+    '''
+        True JIKA PROSES pid DI MESIN INI MASIH BERJALAN
+    '''
+    if os.name == "nt":
+        # os.kill(pid, 0) di Windows justru menghentikan proses, jadi dicek lewat OpenProcess
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return kernel32.GetLastError() == 5  # ERROR_ACCESS_DENIED: proses ada, milik user lain
+        try:
+            code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _FileLock:
+    '''
+        LOCK ANTAR PROSES BERBASIS FILE (O_EXCL), BERJALAN DI WINDOWS & LINUX.
+        FILE LOCK BERISI PID & HOST PEMILIK; LOCK HANYA DIAMBIL ALIH JIKA PROSES PEMILIK DI HOST YANG SAMA SUDAH MATI,
+        ATAU (HOST LAIN / PEMILIK TIDAK DIKENAL) JIKA HEARTBEAT-NYA BERHENTI LEBIH DARI LOCK_STALE_SECONDS
+    '''
+
+    def __init__(self, path, timeout=120):
+        self.path = path
+        self.timeout = timeout
+        self._stop = threading.Event()
+        self._heartbeat = None
+        self._record = None
+
+    def _read_record(self, path=None):
+        try:
+            with open(path or self.path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _is_stale(self, record):
+        try:
+            owner = json.loads(record)
+        except ValueError:
+            owner = None
+        if isinstance(owner, dict) and owner.get("host") == socket.gethostname() and isinstance(owner.get("pid"), int):
+            return not _process_alive(owner["pid"])
+        return time.time() - os.path.getmtime(self.path) > LOCK_STALE_SECONDS
+
+    def _remove_if_owned_by(self, record):
+        '''
+            MENGHAPUS FILE LOCK HANYA JIKA ISINYA MASIH record: FILE DI-RENAME DULU KE NAMA UNIK (ATOMIK, HANYA SATU PROSES
+            YANG BERHASIL), LALU ISINYA DIBACA ULANG; LOCK MILIK PEMILIK LAIN DIKEMBALIKAN TANPA MENIMPA LOCK YANG BARU DIBUAT
+        '''
+        claimed = f"{self.path}.{os.getpid()}.{threading.get_ident()}.claimed"
+        try:
+            os.rename(self.path, claimed)
+        except OSError:
+            return
+        try:
+            if self._read_record(claimed) != record:
+                os.link(claimed, self.path)
+        except OSError:
+            pass
+        finally:
+            os.remove(claimed)
+
+    def _beat(self):
+        # Writer yang lama (rewrite parquet besar / querry panjang) tetap terlihat hidup
+        while not self._stop.wait(LOCK_STALE_SECONDS / 4):
+            try:
+                os.utime(self.path)
+            except OSError:
+                return
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        # Isi file unik per pengambilan lock, dipakai untuk memastikan file yang dihapus memang lock yang dimaksud
+        self._record = json.dumps({"pid": os.getpid(), "thread": threading.get_ident(), "host": socket.gethostname(), "created_at": time.time()}).encode()
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, self._record)
+                os.close(fd)
+                break
+            except FileExistsError:
+                record = self._read_record()
+                try:
+                    if record is not None and self._is_stale(record):
+                        self._remove_if_owned_by(record)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Menunggu lock cache terlalu lama: {self.path}")
+                time.sleep(0.05)
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._beat, daemon=True)
+        self._heartbeat.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._heartbeat.join()
+        # Lock yang sudah diambil alih proses lain (dianggap basi) tidak ikut dihapus
+        self._remove_if_owned_by(self._record)
+
+
+def _read_entry(base):
+    try:
+        with open(base + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        df = pd.read_parquet(base + ".parquet")
+        return df, meta
+    except (OSError, ValueError):
+        return None, None
+
+
+def _write_entry(base, df, meta):
+    # Tulis ke file sementara lalu os.replace agar pembaca tidak melihat file setengah jadi
+    tmp_suffix = f".{os.getpid()}.tmp"
+    df.to_parquet(base + ".parquet" + tmp_suffix)
+    with open(base + ".json" + tmp_suffix, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(base + ".parquet" + tmp_suffix, base + ".parquet")
+    os.replace(base + ".json" + tmp_suffix, base + ".json")
+
+
+def _last_complete_day(end_date):
+    '''
+        HARI TERAKHIR YANG DIANGGAP FINAL: HARI TERAKHIR YANG DIMINTA SELALU DIAMBIL ULANG
+        (BISA BELUM LENGKAP JIKA HARI INI / TERPOTONG OLEH FILTER posdate <= end_date)
+    '''
+    return min(pd.to_datetime(end_date).date(), date.today()) - timedelta(days=1)
+
+
+def load(database, branchid, kategori, start_date, end_date, fetch):
+    '''
+        I.S. fetch(start_date, end_date) -> DATAFRAME (INDEX Date, KOLOM Sales), MELEMPAR EXCEPTION JIKA GAGAL
+        O.S. DATA [start_date, end_date]; HANYA TANGGAL SETELAH CAKUPAN CACHE YANG DI-QUERRY
+    '''
+    if not CACHE_ENABLED:
+        return fetch(start_date, end_date)
+
+    base = _entry_base(database, branchid, kategori)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    start = pd.to_datetime(start_date).date()
+    end = pd.to_datetime(end_date).date()
+
+    with _FileLock(base + ".lock"):
+        cached_df, meta = _read_entry(base)
+        if cached_df is not None and pd.to_datetime(meta["start"]).date() <= start:
+            covered_end = pd.to_datetime(meta["end"]).date()
+            if end > covered_end:
+                fetch_start = covered_end + timedelta(days=1)
+                new_df = fetch(fetch_start.strftime("%Y-%m-%d"), end_date)
+                cached_df = cached_df[cached_df.index < pd.Timestamp(fetch_start)]
+                df = pd.concat([cached_df, new_df]).sort_index()
+            else:
+                df = cached_df
+            cache_start = pd.to_datetime(meta["start"]).date()
+        else:
+            df = fetch(start_date, end_date)
+            cache_start = start
+            covered_end = None
+
+        new_end = _last_complete_day(end_date)
+        if covered_end is not None:
+            new_end = max(new_end, covered_end)
+        new_meta = {
+            "database": str(database),
+            "branch": str(branchid),
+            "kategori": str(kategori),
+            "start": cache_start.strftime("%Y-%m-%d"),
+            "end": new_end.strftime("%Y-%m-%d"),
+        }
+        if new_meta != meta or df is not cached_df:
+            _write_entry(base, df, new_meta)
+
+    return df[(df.index >= pd.Timestamp(start)) & (df.index <= pd.Timestamp(end))].copy()
+
+
+def invalidate(database=None, branchid=None, kategori=None):
+    '''
+        MENGHAPUS ENTRI CACHE (SEMUA, PER DATABASE, PER BRANCH, ATAU PER KATEGORI)
+    '''
+    if database is None:
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        return
+    if branchid is None:
+        shutil.rmtree(os.path.join(CACHE_DIR, _safe_name(database)), ignore_errors=True)
+        return
+    if kategori is None:
+        shutil.rmtree(os.path.join(CACHE_DIR, _safe_name(database), _safe_name(branchid)), ignore_errors=True)
+        return
+    base = _entry_base(database, branchid, kategori)
+    for suffix in (".parquet", ".json"):
+        try:
+            os.remove(base + suffix)
+        except OSError:
+            pass
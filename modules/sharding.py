@@ -0,0 +1,170 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+from . import exporters
+from . import run_manifest
+
+'''
+    PEMBAGIAN WORK SET BATCH KE BEBERAPA MESIN TANPA KOORDINATOR:
+    SETIAP UNIT (BRANCH, KATEGORI) MASUK KE SATU SHARD BERDASARKAN HASH YANG SAMA DI SEMUA MESIN,
+    LALU HASIL TIAP SHARD DIGABUNG DENGAN merge()
+'''
+
+_RESULTS_FILE = re.compile(r"^results_(.+)\.json$")
+
+
+def parse_shard(value):
+    '''
+        I.S. "k/N" (1 <= k <= N)
+        O.S. (k, N)
+    '''
+    try:
+        index, count = (int(part) for part in str(value).split("/"))
+    except ValueError:
+        raise ValueError(f"Format shard harus k/N, misal 1/4 (bukan '{value}')")
+    return validate_shard((index, count))
+
+
+def validate_shard(shard):
+    '''
+        I.S. None, (k, N) ATAU TEKS "k/N"
+        O.S. (k, N) SEBAGAI int; ValueError JIKA BUKAN 1 <= k <= N
+    '''
+    if shard is None:
+        return None
+    if isinstance(shard, str):
+        return parse_shard(shard)
+    try:
+        index, count = (int(part) for part in shard)
+    except (TypeError, ValueError):
+        raise ValueError(f"Shard harus pasangan (k, N), bukan {shard!r}")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Shard {index}/{count} tidak valid: k harus antara 1 dan N")
+    return index, count
+
+
+def shard_label(shard):
+    return f"{shard[0]}/{shard[1]}" if shard else None
+
+
+def shard_of(branch, category, count):
+    '''
+        NOMOR SHARD (1..count) UNTUK UNIT; sha1 AGAR HASILNYA SAMA DI SEMUA MESIN & VERSI PYTHON
+    '''
+    digest = hashlib.sha1(f"{branch}\x1f{category}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def in_shard(branch, category, shard):
+    return shard is None or shard_of(branch, category, shard[1]) == shard[0]
+
+
+def _shard_manifests(shard_root):
+    for dirpath, _, filenames in os.walk(shard_root):
+        if run_manifest.MANIFEST_FILE in filenames:
+            yield os.path.relpath(dirpath, shard_root), dirpath
+
+
+def _shard_results(shard_root):
+    '''
+        (FOLDER RELATIF, run_id, ISI results_<run_id>.json) UNTUK SETIAP RINGKASAN RUN DI FOLDER SHARD
+    '''
+    for dirpath, _, filenames in os.walk(shard_root):
+        for filename in sorted(filenames):
+            match = _RESULTS_FILE.match(filename)
+            if not match:
+                continue
+            with open(os.path.join(dirpath, filename), encoding="utf-8") as f:
+                yield os.path.relpath(dirpath, shard_root), match.group(1), json.load(f)
+
+
+def _merge_results(results):
+    '''
+        I.S. ISI results_<run_id>.json DARI BEBERAPA SHARD DENGAN run_id & FOLDER YANG SAMA
+        O.S. (METADATA, SERI) GABUNGAN: counts DIJUMLAH, RENTANG WAKTU DARI YANG PALING AWAL - AKHIR,
+             SERI YANG SAMA (branch, kategori) DIAMBIL DARI YANG PALING AKHIR SELESAI,
+             pipeline & queries PER SHARD DISIMPAN DI "shards"
+    '''
+    merged = {key: value for key, value in results[0].items() if key not in ("run_id", "series", "pipeline", "queries", "shard")}
+    merged["started_at"] = min(result.get("started_at") or "" for result in results) or None
+    merged["finished_at"] = max(result.get("finished_at") or "" for result in results) or None
+    merged["counts"] = {}
+    merged["files"] = []
+    merged["shards"] = []
+    series = {}
+    for result in results:
+        for status, count in (result.get("counts") or {}).items():
+            merged["counts"][status] = merged["counts"].get(status, 0) + count
+        merged["files"] += [path for path in result.get("files", []) if path not in merged["files"]]
+        merged["shards"].append({key: result.get(key) for key in ("shard", "started_at", "finished_at", "counts", "pipeline", "queries")})
+        for entry in result.get("series", []):
+            key = (entry.get("branch"), entry.get("category"))
+            if key not in series or (entry.get("finished_at") or "") >= (series[key].get("finished_at") or ""):
+                series[key] = entry
+    merged["shards"].sort(key=lambda shard: shard.get("shard") or "")
+    return merged, [series[key] for key in sorted(series, key=lambda key: tuple(str(part) for part in key))]
+
+
+def merge(shard_roots, output_root):
+    '''
+        MENGGABUNG OUTPUT & MANIFEST DARI FOLDER HASIL TIAP SHARD KE output_root
+        (STRUKTUR FOLDER database/branch DIPERTAHANKAN). JIKA SATU UNIT ADA DI BEBERAPA SHARD,
+        ENTRI YANG PALING AKHIR SELESAI YANG DIPAKAI. RINGKASAN RUN results_<run_id>.json DENGAN run_id
+        YANG SAMA (--run-id SAMA DI SEMUA SHARD) DIGABUNG JADI SATU, run_id LAIN DISALIN APA ADANYA
+        O.S. RINGKASAN {"units", "copied", "failed", "missing_outputs", "shards", "missing_shards", "results"}
+    '''
+    latest = {}
+    for shard_root in shard_roots:
+        for rel_folder, folder in _shard_manifests(shard_root):
+            for key, entry in run_manifest.load(folder).items():
+                current = latest.get((rel_folder, key))
+                if current is None or entry.get("finished_at", "") >= current[1].get("finished_at", ""):
+                    latest[(rel_folder, key)] = (folder, entry)
+
+    summary = {"units": len(latest), "copied": 0, "failed": 0, "missing_outputs": 0, "shards": set(), "missing_shards": []}
+    counts = set()
+    copied_files = set()
+    for (rel_folder, _), (folder, entry) in sorted(latest.items()):
+        if entry.get("shard"):
+            summary["shards"].add(entry["shard"])
+            counts.add(int(entry["shard"].split("/")[1]))
+        target_folder = os.path.join(output_root, rel_folder)
+        os.makedirs(target_folder, exist_ok=True)
+        if entry.get("status") == "success":
+            # Output bisa berupa file di folder branch, "workbook.xlsx#SHEET", atau file run di folder induk
+            output = run_manifest.output_file(entry.get("output"))
+            source = os.path.normpath(os.path.join(folder, output or ""))
+            if not output or not os.path.exists(source):
+                summary["missing_outputs"] += 1
+                continue
+            target = os.path.normpath(os.path.join(target_folder, output))
+            if source not in copied_files and os.path.abspath(source) != os.path.abspath(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy2(source, target)
+            copied_files.add(source)
+            summary["copied"] += 1
+        else:
+            summary["failed"] += 1
+        run_manifest.append(target_folder, entry)
+
+    # Shard yang tidak meninggalkan entri sama sekali (node gagal / folder belum disalin)
+    for count in counts:
+        expected = {f"{index}/{count}" for index in range(1, count + 1)}
+        summary["missing_shards"] += sorted(expected - summary["shards"])
+    summary["shards"] = sorted(summary["shards"])
+
+    runs = {}
+    for shard_root in shard_roots:
+        for rel_folder, run_id, result in _shard_results(shard_root):
+            runs.setdefault((rel_folder, run_id), []).append(result)
+    summary["results"] = []
+    for (rel_folder, run_id), results in sorted(runs.items()):
+        if len(results) == 1:
+            metadata, series = {key: value for key, value in results[0].items() if key not in ("run_id", "series")}, results[0].get("series", [])
+        else:
+            metadata, series = _merge_results(results)
+        path = exporters.write_results_manifest(os.path.join(output_root, rel_folder), run_id, metadata, series)
+        summary["results"].append(path)
+    return summary
@@ -0,0 +1,155 @@
+import time
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from modules import page_cache
+from modules import event_utils
+
+'''
+    SCRAPPING HARI LIBUR TERHADAP SERVER FIXTURE LOKAL (http.server): HALAMAN PER TAHUN DENGAN ETag & 304,
+    CACHE HALAMAN DI DISK & PENGAMBILAN BERSAMAAN LEWAT page_cache.fetch_many
+'''
+
+
+def fixture_page(year):
+    return f'''<html><body>
+<ul><a href="januari-{year}">Januari</a><a style="color: #f00;">1</a><a style="color: #f00;">2</a>
+<table><tr><td>1</td><td>Tahun Baru</td></tr><tr><td>2</td><td>Cuti Bersama</td></tr></table></ul>
+<ul><a href="maret-{year}">Maret</a><a style="color: #f00;">29</a>
+<table><tr><td>29</td><td>Wafat Isa Al Masih</td></tr></table></ul>
+</body></html>'''.encode("utf-8")
+
+
+class FixtureServer:
+    '''
+        SERVER HALAMAN TAHUN: 200 + ETag, ATAU 304 JIKA If-None-Match SAMA; MENCATAT REQUEST & JUMLAH REQUEST BERSAMAAN
+    '''
+
+    def __init__(self, delay=0.2):
+        self.requests = []
+        self.active = 0
+        self.stopped = False
+        self.peak = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if server.stopped:
+                    # Koneksi keep-alive yang masih terbuka diputus tanpa respons, seperti server yang mati
+                    self.close_connection = True
+                    return
+                with server.lock:
+                    server.active += 1
+                    server.peak = max(server.peak, server.active)
+                    server.requests.append((self.path, self.headers.get("If-None-Match")))
+                try:
+                    time.sleep(delay)
+                    body = fixture_page(int(self.path.strip("/")))
+                    etag = f'"{hashlib.md5(body).hexdigest()}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        return
+                    self.send_response(200)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with server.lock:
+                        server.active -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped = True
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    fixture = FixtureServer()
+    monkeypatch.setattr(page_cache, "CACHE_DIR", str(tmp_path / "pages"))
+    monkeypatch.setattr(event_utils, "BASE_URL", fixture.url)
+    yield fixture
+    fixture.stop()
+
+
+EXPECTED_2024 = [
+    ("2024-01-01", "Monday", "Tahun Baru Masehi"),
+    ("2024-01-02", "Tuesday", "Cuti Bersama"),
+    ("2024-03-29", "Friday", "Wafat Yesus Kristus"),
+    ("2024-03-31", "Sunday", "Kebangkitan Yesus Kristus"),
+]
+
+
+def test_scrape_years_parses_holidays_fetched_concurrently(server):
+    rows = event_utils.scrape_years(2022, 2024)
+
+    assert [row for row in rows if row[0].startswith("2024")] == EXPECTED_2024
+    assert len(rows) == 3 * len(EXPECTED_2024)
+    assert sorted(path for path, _ in server.requests) == ["/2022", "/2023", "/2024"]
+    assert server.peak > 1
+
+
+def test_fetch_revalidates_with_etag_and_reuses_cached_body(server):
+    url = f"{server.url}2024"
+
+    body, status = page_cache.fetch(url)
+    assert status == "downloaded"
+    assert server.requests[-1][1] is None
+
+    cached_body, status = page_cache.fetch(url)
+    assert status == "revalidated"
+    assert cached_body == body
+    assert server.requests[-1][1] is not None
+
+    requests_before = len(server.requests)
+    cached_body, status = page_cache.fetch(url, max_age=3600)
+    assert status == "cache"
+    assert cached_body == body
+    assert len(server.requests) == requests_before
+
+
+def test_scrape_years_second_run_uses_cache(server, monkeypatch):
+    # Semua tahun dianggap tahun berjalan (max_age 0): setiap tahun divalidasi ulang dengan If-None-Match -> 304
+    monkeypatch.setattr(event_utils, "PAST_YEAR_MAX_AGE", 0)
+    first = event_utils.scrape_years(2023, 2024)
+    server.requests.clear()
+
+    second = event_utils.scrape_years(2023, 2024)
+
+    assert second == first
+    assert len(server.requests) == 2
+    assert all(etag is not None for _, etag in server.requests)
+
+
+def test_past_years_are_served_from_disk_without_request(server, monkeypatch):
+    monkeypatch.setattr(event_utils, "PAST_YEAR_MAX_AGE", 3600)
+    first = event_utils.scrape_years(2023, 2024)
+    server.requests.clear()
+
+    assert event_utils.scrape_years(2023, 2024) == first
+    assert server.requests == []
+
+
+def test_stale_copy_is_used_when_server_is_down(server):
+    first = event_utils.scrape_years(2024, 2024)
+    server.stop()
+
+    results, errors = page_cache.fetch_many([f"{server.url}2024"])
+    assert errors == {}
+    assert results[f"{server.url}2024"][1] == "stale"
+    assert event_utils.scrape_years(2024, 2024) == first